@@ -1,153 +1,108 @@
-from tree_sitter import Language, Parser
-import tree_sitter_javascript as tsj
-import tree_sitter_typescript as tts 
 import os
 import json
+from importresolver import ImportResolver
+from depgraph import DependencyGraph
+from symbolindex import build_symbol_index
+from graphrender import build_file_graph, aggregate_by_directory, focus_subgraph, render_graph, LAYOUT_CACHE_NAME
+from viewerexport import export_viewer
+from instrumentation import timed_stage, profile_option, stage, add_hook, MetricsCollector
+from metadatastream import JsonlWriter, JsonlReader, iter_jsonl, COMBINED_JSONL_NAME, GRAPH_FIELDS
+from packedstore import PackedStoreWriter, PACK_NAME
+from extractor import extract_metadata, iter_extracted_metadata, walk_source_files, metadata_json_options, DEFAULT_CHUNKSIZE
 
 
-JAVASCRIPT_LANGUAGE = Language(tsj.language())
-TYPESCRIPT_LANGUAGE = Language(tts.language_typescript())
-
-# Initialize parser
-parser = Parser(JAVASCRIPT_LANGUAGE)
-
 def parse_file(filepath):
     """Parse a JavaScript/TypeScript file and extract metadata with more comprehensive details."""
-    with open(filepath, 'r') as f:
-        code = f.read()
-
-    tree = parser.parse(bytes(code, "utf8"))
-    root_node = tree.root_node
-
-    # Lists to hold the individual items with their content
-    imports = []
-    exports = []
-    functions = []
-    function_calls = []
-    arrow_functions = []
-    jsx_elements = []
-
-    # Separate lists to hold the code content
-    imports_content = []
-    exports_content = []
-    functions_content = []
-    function_calls_content = []
-    arrow_functions_content = []
-    jsx_content = []
-
-    def traverse(node):
-        """Recursive function to traverse the AST and extract details."""
-        if node.type == 'import_statement':
-            import_path = node.child_by_field_name('source').text.decode('utf-8')
-            imports.append({"module": import_path, "content": code[node.start_byte:node.end_byte]})
-        
-        if node.type == 'export_statement':
-            export_content = code[node.start_byte:node.end_byte]
-            exports_content.append(export_content)
-
-            # Identify exported names
-            declaration = node.child_by_field_name('declaration')
-            if declaration:
-                # Named export or default export
-                export_name = declaration.text.decode('utf-8')
-                exports.append({"export": export_name, "content": export_content})
-            else:
-                # Handle cases like "export { foo, bar };"
-                named_exports = [
-                    child.text.decode('utf-8')
-                    for child in node.children
-                    if child.type == 'identifier'
-                ]
-                for named_export in named_exports:
-                    exports.append({"export": named_export, "content": export_content})
-
-        if node.type == 'function_declaration':
-            function_name = node.child_by_field_name('name').text.decode('utf-8')
-            functions.append({"function": function_name, "content": code[node.start_byte:node.end_byte]})
-        
-        if node.type == 'call_expression':
-            function_call = node.child_by_field_name('function')
-            if function_call:
-                function_name = function_call.text.decode('utf-8')
-                function_calls.append({"function": function_name, "content": code[node.start_byte:node.end_byte]})
-
-        if node.type == 'arrow_function':
-            arrow_function_content = code[node.start_byte:node.end_byte]
-            arrow_functions.append({"function": "arrow_function", "content": arrow_function_content})
-        
-        if node.type == 'jsx_element':
-            jsx_element_content = code[node.start_byte:node.end_byte]
-            jsx_elements.append({"element": "jsx_element", "content": jsx_element_content})
-
-        for child in node.children:
-            traverse(child)
-
-    traverse(root_node)
-
-    # Return metadata with separated content for each item
-    return {
-        "file": filepath,
-        "imports": imports,
-        "exports": exports,
-        "functions": functions,
-        "function_calls": function_calls,
-        "arrow_functions": arrow_functions,
-        "jsx_elements": jsx_elements,
-        "imports_content": [entry['content'] for entry in imports],
-        "exports_content": [entry['content'] for entry in exports],
-        "functions_content": [entry['content'] for entry in functions],
-        "function_calls_content": [entry['content'] for entry in function_calls],
-        "arrow_functions_content": [entry['content'] for entry in arrow_functions],
-        "jsx_content": [entry['content'] for entry in jsx_elements],
-        "code_content": code
-    }
+    return extract_metadata(filepath)
 
 
-def process_codebase(root_dir):
-    """Process all JavaScript/TypeScript files in the codebase and save project structure."""
+@profile_option
+def process_codebase(root_dir, workers=1, chunksize=DEFAULT_CHUNKSIZE, compact=False, stream=False, resume=False, per_file_output="json"):
+    """Process all JavaScript/TypeScript files in the codebase and save project structure.
+
+    workers > 1 parses files in a process pool; the output is the same for any worker count.
+    compact=True stores entity spans instead of text (see extractor.SourceSpans).
+    stream=True appends each file's record to combined_metadata.jsonl as it finishes and
+    returns a generator over that file; resume=True continues an interrupted streaming run.
+    per_file_output="packed" writes per-file records into metadata/metadata.pack (see packedstore).
+    profile="<dir>" runs it under instrumentation.profiling() (cProfile + tracemalloc, this process only).
+    """
     metadata = []
     project_structure = {}
     a = 0
 
-    for subdir, _, files in os.walk(root_dir):
-        # Get relative directory path from root
-        relative_dir = os.path.relpath(subdir, root_dir)
-        if relative_dir == ".":
-            relative_dir = "/"
-
+    stream_path = os.path.join('metadata', COMBINED_JSONL_NAME)
+    partial_path = stream_path + '.partial'
+    done = {}
+    if stream:
+        if resume and os.path.exists(partial_path):
+            done = JsonlReader(partial_path)
+        stream_writer = JsonlWriter(partial_path, append=bool(done))
+
+    pack_writer = None
+    if per_file_output == 'packed':
+        # Earlier records stay valid for files this run does not rewrite
+        pack_writer = PackedStoreWriter(os.path.join('metadata', PACK_NAME), append=resume)
+        if done:
+            # The pack index is only saved by close(), so an interrupted run loses the pack
+            # records of the files it finished; the partial JSONL still has every one of them
+            for record in iter_jsonl(partial_path):
+                pack_writer.add(record["file"], record)
+
+    source_dirs = walk_source_files(root_dir)
+    source_files = []
+    for relative_dir, files in source_dirs:
         # Initialize the directory in the project structure
         if relative_dir not in project_structure:
             project_structure[relative_dir] = []
-
-        for file in files:
-            if file.endswith(('.js', '.jsx', '.ts', '.tsx')):
-                filepath = os.path.join(subdir, file)
-                file_metadata = parse_file(filepath)
-                metadata.append(file_metadata)
-
-                # Add file to the project structure
-                project_structure[relative_dir].append({
-                    "file_name": file,
-                    "file_path": filepath
-                })
-
-                # Save individual file metadata
-                a += 1
-                output_path = os.path.join('metadata', f"{file}{a}.json")
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                with open(output_path, 'w') as f:
-                    json.dump(file_metadata, f, indent=4)
-
-    # Save combined metadata
-    combined_metadata_path = os.path.join('metadata', 'combined_metadata.json')
-    with open(combined_metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=4)
+        source_files.extend((relative_dir, file, filepath) for file, filepath in files)
+
+    filepaths = [filepath for _, _, filepath in source_files if filepath not in done]
+    results = iter_extracted_metadata(filepaths, workers=workers, chunksize=chunksize, compact=compact)
+    for relative_dir, file, filepath in source_files:
+        a += 1
+        # Add file to the project structure
+        project_structure[relative_dir].append({
+            "file_name": file,
+            "file_path": filepath
+        })
+        if filepath in done:
+            continue
+
+        file_metadata = next(results)
+        if stream:
+            stream_writer.write(file_metadata)
+        else:
+            metadata.append(file_metadata)
+
+        # Save individual file metadata
+        if pack_writer:
+            pack_writer.add(filepath, file_metadata)
+        else:
+            output_path = os.path.join('metadata', f"{file}{a}.json")
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, 'w') as f:
+                json.dump(file_metadata, f, **metadata_json_options(compact))
+
+    if pack_writer:
+        pack_writer.close()
 
     # Save project structure
     project_structure_path = os.path.join('metadata', 'project_structure.json')
+    os.makedirs(os.path.dirname(project_structure_path), exist_ok=True)
     with open(project_structure_path, 'w') as f:
         json.dump(project_structure, f, indent=4)
 
+    if stream:
+        stream_writer.close()
+        os.replace(partial_path, stream_path)
+        return iter_jsonl(stream_path)
+
+    # Save combined metadata
+    combined_metadata_path = os.path.join('metadata', 'combined_metadata.json')
+    with stage("json_output"), open(combined_metadata_path, 'w') as f:
+        json.dump(metadata, f, **metadata_json_options(compact))
+
     return metadata
 
 
@@ -156,14 +111,10 @@ import os
 
 
 import networkx as nx
-import matplotlib.pyplot as plt
-def get_file_for_function(function_name):
-        # Search through metadata to find the file containing the function
-        for file in metadata:
-            for func in file["function_calls"]:
-                if func["function"] == function_name:
-                    return file["file"]
-        return None
+def get_file_for_function(function_name, symbol_index, caller_file=None):
+    """Return the file that defines function_name, or None; see SymbolIndex.resolve."""
+    definition = symbol_index.resolve(function_name, caller_file)
+    return definition["file"] if definition else None
 
 # Normalize file paths for accurate resolution
 # Helper function to normalize paths
@@ -180,7 +131,14 @@ def normalize_path(base_path, import_path):
     return os.path.normpath(os.path.join(base_path, import_path))
 
 # Function to find all dependencies of a file recursively
-def find_dependencies(file_path, file_mapping, visited_files):
+def find_dependencies(file_path, file_mapping, visited_files, resolver=None):
+    """Return the files file_path imports, directly or transitively.
+
+    resolver is an ImportResolver over file_mapping; build it once and pass it in,
+    otherwise every call has to index all files again.
+    """
+    if resolver is None:
+        resolver = ImportResolver(file_mapping)
     if file_path in visited_files:
         return []  # Avoid circular dependencies or reprocessing the same file
 
@@ -195,51 +153,56 @@ def find_dependencies(file_path, file_mapping, visited_files):
     imports = file_data.get("imports", [])
     for imp in imports:
         module_name = imp['module']
-        dependent_file = None
-
-        # Normalize the import path
-        normalized_path = normalize_path(os.path.dirname(file_path), module_name)
-        if normalized_path:
-            # Check if the normalized path exists in the file mapping
-            for path in file_mapping:
-                # Ensure the file path is normalized and matches the import
-                if os.path.normpath(path) == normalized_path:
-                    dependent_file = path
-                    break
-        
+
+        # Resolve the import to an indexed file (relative paths, extensions, index files, tsconfig aliases)
+        dependent_file = resolver.resolve(file_path, module_name)
+
         if dependent_file:
             # Add the dependent file to the dependencies list
             dependencies.append(dependent_file)
             # Recursively find the dependencies of this dependent file
-            dependencies.extend(find_dependencies(dependent_file, file_mapping, visited_files))
+            dependencies.extend(find_dependencies(dependent_file, file_mapping, visited_files, resolver))
 
     return dependencies
 
 # Generate the hierarchical dependency structure
-def generate_dependency_hierarchy(metadata):
-    # Create a mapping of file paths to file metadata for easy lookup
+@timed_stage("dependency_hierarchy")
+def generate_dependency_hierarchy(metadata, root_dir=None):
+    # Create a mapping of file paths to file metadata for easy lookup.
+    # metadata is read once, so a generator such as iter_jsonl(path, GRAPH_FIELDS) works too.
     file_mapping = {file_data['file']: file_data for file_data in metadata}
+    # Built once per run; root_dir lets it pick up tsconfig/jsconfig path aliases
+    resolver = ImportResolver(file_mapping, root_dir=root_dir)
     
+    # Direct import edges, resolved once per file
+    edges = {
+        filepath: [dep for dep in (resolver.resolve(filepath, imp['module']) for imp in file_data.get("imports", [])) if dep]
+        for filepath, file_data in file_mapping.items()
+    }
+    # Transitive closure for every file at once; cycles are condensed, nothing recurses
+    graph = DependencyGraph(file_mapping, edges)
+    # Names of the calls made in each file, so the per-dependency check is a set lookup
+    call_names = {
+        filepath: {fc['function'] for fc in file_data.get('function_calls', [])}
+        for filepath, file_data in file_mapping.items()
+    }
+
     hierarchy = {}
 
     # Process each file's metadata to find its dependencies
-    for file_data in metadata:
+    for file_data in file_mapping.values():
         current_file = file_data['file']
-        visited_files = set()  # Set to keep track of files we've already processed
+        calls = [call['function'] for call in file_data.get('function_calls', [])]
 
-        # Find all dependencies recursively
-        all_dependencies = find_dependencies(current_file, file_mapping, visited_files)
+        # Every file reachable through imports, each listed once, in metadata order
+        all_dependencies = graph.transitive_dependencies(current_file)
         
         # For each dependency, find the functions used in that file (if any)
         dependencies_info = []
         for dep_file in all_dependencies:
-            functions_used = []
-            dep_file_data = file_mapping.get(dep_file)
-            if dep_file_data:
-                # Look for functions used from this dependency
-                for func_call in file_data.get('function_calls', []):
-                    if func_call['function'] in [fc['function'] for fc in dep_file_data.get('function_calls', [])]:
-                        functions_used.append(func_call['function'])
+            dep_calls = call_names[dep_file]
+            # Look for functions used from this dependency
+            functions_used = [name for name in calls if name in dep_calls]
             
             dependencies_info.append({
                 "dependent_file": dep_file,
@@ -249,14 +212,17 @@ def generate_dependency_hierarchy(metadata):
         # Add the dependencies and function calls info to the hierarchy
         hierarchy[current_file] = {
             "imports": [imp['module'] for imp in file_data.get("imports", [])],
-            "function_calls": [call['function'] for call in file_data.get("function_calls", [])],
+            "function_calls": calls,
             "dependent_files": dependencies_info
         }
 
     return hierarchy
 if __name__ == "__main__":
     root_dir = "./testcodebases/react-weather-forecast-master"
-    metadata = process_codebase(root_dir)
+    metrics = add_hook(MetricsCollector())
+    process_codebase(root_dir, workers=os.cpu_count(), stream=True)
+    # The graph code below only needs file names, imports and call names, not the entity text
+    metadata = list(iter_jsonl(os.path.join('metadata', COMBINED_JSONL_NAME), fields=GRAPH_FIELDS))
     #dependency_tree = build_dependency_tree(metadata)
 
     # Save the dependency tree
@@ -270,24 +236,10 @@ if __name__ == "__main__":
     # json_output = json.dumps(dependency_tree_json, indent=4)
     # print(json_output)
     root_file = "./testcodebases/react-weather-forecast-master\\src\\index.js"
-    G = nx.DiGraph()
-
-        # Process each file and extract its dependencies
-    for file in metadata:
-        file_name = file["file"]
-        G.add_node(file_name)  # Add the file as a node
-
-        # Add dependencies based on imports
-        for imp in file["imports"]:
-            module = imp["module"]
-            G.add_edge(file_name, module)  # Add a directed edge from the file to the imported module
-
-        # Add dependencies based on function calls
-        for func_call in file["function_calls"]:
-            function = func_call["function"]
-            called_file = get_file_for_function(function)  # You would need a way to map function calls to files
-            if called_file:
-                G.add_edge(file_name, called_file)
+    # Declared/exported names -> defining files, so each call site is one lookup
+    symbol_index = build_symbol_index(metadata)
+    # Files only: imports resolved to indexed files plus calls into functions defined elsewhere
+    G = build_file_graph(metadata, root_dir, symbol_index)
 
     # Function to map function names to files (you need to implement this based on your metadata)
     file_dependencies = {}
@@ -307,7 +259,7 @@ if __name__ == "__main__":
     # Convert the dependency structure to a JSON string
     dependency_json = json.dumps(file_dependencies, indent=4)
     # Generate hierarchy
-    hierarchy = generate_dependency_hierarchy(metadata)
+    hierarchy = generate_dependency_hierarchy(metadata, root_dir)
 
     # Print or save the hierarchy to a JSON file
     output_file = "dependency_hierarchy_tree.json"
@@ -318,11 +270,20 @@ if __name__ == "__main__":
     with open("file_dependencies.json", "w") as json_file:
         json_file.write(dependency_json)
 
-    # Visualize the dependency graph
-    plt.figure(figsize=(12, 12))
-    nx.draw(G, with_labels=True, node_size=2000, node_color="skyblue", font_size=10, font_weight="bold")
-    plt.title("File Dependency Hierarchy")
-    plt.show()
+    # Visualize the dependency graph headlessly: one node per directory, plus the
+    # 2-hop neighbourhood of root_file; layouts are cached between runs
+    with open(os.path.join('metadata', 'project_structure.json'), 'r') as f:
+        project_structure = json.load(f)
+    layout_cache = os.path.join('metadata', LAYOUT_CACHE_NAME)
+    render_graph(aggregate_by_directory(G, project_structure), os.path.join('metadata', 'dependency_graph_dirs.svg'),
+                 title="Directory Dependency Graph", cache_path=layout_cache)
+    if root_file in G:
+        render_graph(focus_subgraph(G, root_file, hops=2), os.path.join('metadata', 'dependency_graph_focus.svg'),
+                     title=f"Dependencies around {root_file}", cache_path=layout_cache, highlight=root_file)
+    # Interactive offline viewer: open metadata/viewer/index.html, no network needed
+    export_viewer(G, os.path.join('metadata', 'viewer'), project_structure)
+    metrics.write(os.path.join('metadata', 'metrics.json'))
+    metrics.write(os.path.join('metadata', 'metrics.prom'))
 
 # Step 2: Generate the unified dependency tree
     #combined_dependency_tree = generate_combined_dependency_tree(metadata, root_file)
@@ -332,102 +293,3 @@ if __name__ == "__main__":
     #     json.dump(dependency_tree_json, json_file, indent=4)
     # with open("combined_dependency_tree.json", "w") as json_file:
     #     json.dump(combined_dependency_tree, json_file, indent=4)
-
----------------------------------------------------------------------------------------------------------
-import json
-from collections import defaultdict
-
-# Example JSON input
-input_json = {
-    "src\\modules\\CurrentWeatherDetails.js": [
-        {
-            "code_file": "src\\utils\\getTempType.js",
-            "type": "function",
-            "name": "getTempType",
-            "code_content": "export default function getTempType(value) {\n if (value) setToLocalStorage('tempTyp",
-            "description": "The 'getTempType` function is exported as the default function from the getTempType.j",
-            "vulnerability": "The function relies on local storage, which can be manipulated by the client, potent"
-        },
-        {
-            "code_file": "src\\utils\\getTempType.js",
-            "type": "function",
-            "name": "getLocalStorage",
-            "code_content": "import getLocalStorage from './getLocalStorage';",
-            "description": "The 'getLocalStorage function is imported from the 'getLocalStorage.js' file. It is u",
-            "vulnerability": "The function's implementati"
-        }
-    ],
-    "src\\index.js": [
-        {
-            "code_file": "src\\App.js",
-            "type": "class",
-            "name": "App",
-            "code_content": "class App { constructor() { this.header = new Header(); this.footer = new Footer();",
-            "description": "The `App' class is the main class imported and instantiated in the 'src\\index.js f",
-            "vulnerability": "No direct vulnerabilities identified in the App` class instantiation."
-        },
-        {
-            "code_file": "src\\App.js",
-            "type": "method",
-            "name": "renderApp",
-            "code_content": "renderApp() { this.header.renderPageLoadHeader(\"#app\"); this.renderMain('#app'); t",
-            "description": "The 'renderApp' method is responsible for rendering the initial structure of the ap",
-            "vulnerability": "No direct vulnerabilities identified in the renderApp method."
-        }
-    ]
-}
-
-# Step 1: Build a mapping of file dependencies and functions
-dependency_map = defaultdict(list)
-file_functions = defaultdict(list)
-
-# Store functions for each file
-for file, entries in input_json.items():
-    for entry in entries:
-        dependency_map[file].append({
-            "dependency_file": entry["code_file"],
-            "function_name": entry["name"]
-        })
-        file_functions[file].append(entry["name"])
-
-# Step 2: Function to build the hierarchical JSON data for each file
-def build_tree(file, visited):
-    if file in visited:
-        return {"functions": []}  # Prevent circular references
-
-    visited.add(file)
-    children = {}
-    used_functions = set(file_functions[file])  # Start with functions from the current file
-
-    for dep in dependency_map.get(file, []):
-        child_tree = build_tree(dep["dependency_file"], visited)
-
-        # Ensure the functions from the child file are included in the parent file's function list
-        used_functions.update(child_tree.get("functions", []))
-
-        children[dep["dependency_file"]] = child_tree
-
-    visited.remove(file)
-
-    # If there are no children (leaf node), return the list of functions in the current file
-    if not children:
-        return {
-            "functions": list(used_functions)  # All functions from this leaf file
-        }
-
-    return {
-        "dependencies": children,
-        "functions": list(used_functions)  # All functions used in this file, including dependencies
-    }
-
-# Step 3: Create separate hierarchical JSON for each file
-visited = set()
-separate_hierarchies = {}
-
-# Create the hierarchical JSON for each file separately
-for file in input_json.keys():
-    separate_hierarchies[file] = build_tree(file, visited)
-
-# Step 4: Print the hierarchical JSON for each file
-print(json.dumps(separate_hierarchies, indent=4))
-
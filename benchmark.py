@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from db.createdb import setUpDataBase, connect_db, BulkWriter
+from startapp import store_file_metadata
+from appmain import generate_dependency_hierarchy
+from extractor import iter_extracted_metadata, metadata_json_options, get_parse_stats, reset_parse_stats
+from importgraph import build_import_graph
+from deptree import build_dependency_hierarchy
+from eachindexdiagram import split_mermaid_diagrams
+from synthcodebase import generate_codebase
+
+# Stages in the order they run; each one is timed on its own
+STAGES = ("extract", "db_write", "json_output", "dependency_hierarchy", "import_graph", "hierarchy_tree", "diagrams")
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _diagram_data(hierarchy):
+    # generate_dependency_hierarchy output in the {file: {"dependencies": {dep: {"functions"}}}} shape eachindexdiagram reads
+    return {
+        file: {"dependencies": {
+            dep["dependent_file"]: {"functions": dep["functions_used_from_this_file"]}
+            for dep in details["dependent_files"]
+        }}
+        for file, details in hierarchy.items()
+    }
+
+
+def run_stages(root_dir, work_dir, workers=1, compact=False):
+    """Run the pipeline once over root_dir; returns ({stage: seconds}, counts)."""
+    filepaths = sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(root_dir)
+        for name in names if name.endswith(('.js', '.jsx', '.ts', '.tsx'))
+    )
+    timings = {}
+
+    def timed(stage, function):
+        started = time.perf_counter()
+        result = function()
+        timings[stage] = time.perf_counter() - started
+        return result
+
+    reset_parse_stats()
+    metadata = timed("extract", lambda: list(iter_extracted_metadata(filepaths, workers=workers, compact=compact)))
+
+    db_path = os.path.join(work_dir, 'benchmark.db')
+    setUpDataBase(db_path)
+    conn = connect_db(db_path, bulk_load=True)
+
+    def write_db():
+        with BulkWriter(conn) as writer:
+            for file_metadata in metadata:
+                store_file_metadata(writer, file_metadata)
+    timed("db_write", write_db)
+    rows = conn.execute('SELECT COUNT(*) FROM metadata').fetchone()[0]
+    conn.close()
+
+    def write_json():
+        output_dir = os.path.join(work_dir, 'metadata')
+        os.makedirs(output_dir, exist_ok=True)
+        options = metadata_json_options(compact)
+        for n, file_metadata in enumerate(metadata):
+            with open(os.path.join(output_dir, f"{os.path.basename(file_metadata['file'])}{n}.json"), 'w') as f:
+                json.dump(file_metadata, f, **options)
+        with open(os.path.join(output_dir, 'combined_metadata.json'), 'w') as f:
+            json.dump(metadata, f, **options)
+    timed("json_output", write_json)
+
+    hierarchy = timed("dependency_hierarchy", lambda: generate_dependency_hierarchy(metadata, root_dir))
+    graph = timed("import_graph", lambda: build_import_graph(metadata, root_dir))
+    timed("hierarchy_tree", lambda: build_dependency_hierarchy(graph))
+    diagrams = timed("diagrams", lambda: split_mermaid_diagrams(_diagram_data(hierarchy)))
+
+    parse_stats = get_parse_stats()
+    counts = {
+        "files": len(metadata),
+        "bytes": sum(stats["bytes"] for stats in parse_stats.values()),
+        "metadata_rows": rows,
+        "import_edges": sum(len(deps) for deps in graph.values()),
+        "transitive_dependencies": sum(len(details["dependent_files"]) for details in hierarchy.values()),
+        "diagrams": len(diagrams),
+    }
+    return timings, counts
+
+
+def run_benchmark(files=500, depth=3, branching=3, fanout=3, cycle_ratio=0.05, jsx_ratio=0.3, ts_ratio=0.3,
+                  repeat=3, workers=1, compact=False, seed=0):
+    """Generate a synthetic codebase, run every stage repeat times and return the results record.
+
+    Each stage reports the best of its runs (the least disturbed by other load)
+    and keeps every run for reference.
+    """
+    config = {
+        "files": files, "depth": depth, "branching": branching, "fanout": fanout, "cycle_ratio": cycle_ratio,
+        "jsx_ratio": jsx_ratio, "ts_ratio": ts_ratio, "repeat": repeat, "workers": workers,
+        "compact": compact, "seed": seed,
+    }
+    work_dir = tempfile.mkdtemp(prefix='treesitter-bench-')
+    try:
+        root_dir = os.path.join(work_dir, 'codebase')
+        generate_codebase(root_dir, files=files, depth=depth, branching=branching, fanout=fanout,
+                          cycle_ratio=cycle_ratio, jsx_ratio=jsx_ratio, ts_ratio=ts_ratio, seed=seed)
+        runs = {stage: [] for stage in STAGES}
+        counts = None
+        for n in range(repeat):
+            run_dir = os.path.join(work_dir, f'run{n}')
+            os.makedirs(run_dir)
+            timings, counts = run_stages(root_dir, run_dir, workers=workers, compact=compact)
+            for stage in STAGES:
+                runs[stage].append(timings[stage])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "counts": counts,
+        "stages": {stage: {"seconds": min(runs[stage]), "runs": runs[stage]} for stage in STAGES},
+    }
+
+
+def format_results(results):
+    lines = [f"{'stage':<22}{'best s':>10}"]
+    for stage, timing in results["stages"].items():
+        lines.append(f"{stage:<22}{timing['seconds']:>10.4f}")
+    return "\n".join(lines)
+
+
+def compare_results(baseline, current):
+    """Render a per-stage comparison of two results files (ratio < 1 means current is faster)."""
+    lines = [f"{'stage':<22}{'baseline s':>12}{'current s':>12}{'ratio':>8}"]
+    for stage in STAGES:
+        if stage not in baseline["stages"] or stage not in current["stages"]:
+            continue
+        before = baseline["stages"][stage]["seconds"]
+        after = current["stages"][stage]["seconds"]
+        ratio = after / before if before else float('inf')
+        lines.append(f"{stage:<22}{before:>12.4f}{after:>12.4f}{ratio:>8.2f}")
+    if baseline["config"] != current["config"]:
+        lines.append("warning: the two runs used different configurations")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each stage of the indexing pipeline on a synthetic codebase.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run")
+    run.add_argument("--files", type=int, default=500)
+    run.add_argument("--depth", type=int, default=3)
+    run.add_argument("--branching", type=int, default=3)
+    run.add_argument("--fanout", type=int, default=3)
+    run.add_argument("--cycle-ratio", type=float, default=0.05)
+    run.add_argument("--jsx-ratio", type=float, default=0.3)
+    run.add_argument("--ts-ratio", type=float, default=0.3)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--compact", action="store_true")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output", help="results file (default: benchmarks/<commit>-<files>.json)")
+    compare = subparsers.add_parser("compare")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r') as f:
+            current = json.load(f)
+        print(compare_results(baseline, current))
+        sys.exit(0)
+
+    results = run_benchmark(files=args.files, depth=args.depth, branching=args.branching, fanout=args.fanout,
+                            cycle_ratio=args.cycle_ratio, jsx_ratio=args.jsx_ratio, ts_ratio=args.ts_ratio,
+                            repeat=args.repeat, workers=args.workers, compact=args.compact, seed=args.seed)
+    output = args.output or os.path.join('benchmarks', f"{results['commit'] or 'local'}-{args.files}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(format_results(results))
+    print(f"Results written to {output}")
@@ -0,0 +1,94 @@
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; blobs can always use zlib
+    zstandard = None
+
+# Compression for new blobs: None, "zlib" or "zstd". Each blob records its own,
+# so a DB can mix them and the setting can change between runs.
+DEFAULT_COMPRESSION = 'zlib'
+
+# Smaller texts are stored as-is; compressing them saves next to nothing
+MIN_COMPRESS_SIZE = 128
+
+
+def blob_hash(text):
+    """Content address of a source text: hex sha256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress(data, compression):
+    """Return (stored bytes, compression actually used) for data."""
+    if compression is None or len(data) < MIN_COMPRESS_SIZE:
+        return data, None
+    if compression == 'zlib':
+        return zlib.compress(data, 6), 'zlib'
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor(level=9).compress(data), 'zstd'
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def decompress(data, compression):
+    if compression is None:
+        return data
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("this blob is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def store_blob(cursor, text, compression=DEFAULT_COMPRESSION):
+    """Add text to the blobs table unless an identical text is already there; returns its hash.
+
+    A text that is already stored costs one primary-key lookup: it is neither
+    compressed nor written again.
+    """
+    blobhash = blob_hash(text)
+    if cursor.execute('SELECT 1 FROM blobs WHERE hash = ?', (blobhash,)).fetchone() is None:
+        raw = text.encode('utf-8')
+        data, used = compress(raw, compression)
+        cursor.execute('INSERT INTO blobs (hash, size, compression, data) VALUES (?, ?, ?, ?)',
+                       (blobhash, len(raw), used, data))
+    return blobhash
+
+
+def load_blob(conn, blobhash):
+    """Return the text stored under blobhash, or None if there is no such blob."""
+    row = conn.execute('SELECT compression, data FROM blobs WHERE hash = ?', (blobhash,)).fetchone()
+    if row is None:
+        return None
+    return decompress(row[1], row[0]).decode('utf-8')
+
+
+def delete_unreferenced_blobs(cursor, hashes):
+    """Delete the blobs among hashes that no files row points at any more; returns how many went."""
+    deleted = 0
+    for blobhash in set(hashes):
+        if blobhash is None:
+            continue
+        cursor.execute('''
+            DELETE FROM blobs WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM files WHERE blobhash = ?)
+        ''', (blobhash, blobhash))
+        deleted += cursor.rowcount
+    return deleted
+
+
+def detach_code(file_metadata):
+    """Return a full file record with its "code_content" replaced by the blob hash ("code_hash").
+
+    The source text then lives only in the blobs table; read it back with
+    load_blob(conn, record["code_hash"]). Compact records carry no text and are
+    returned unchanged.
+    """
+    if "code_content" not in file_metadata:
+        return file_metadata
+    record = {key: value for key, value in file_metadata.items() if key != "code_content"}
+    record["code_hash"] = blob_hash(file_metadata["code_content"])
+    return record
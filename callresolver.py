@@ -0,0 +1,166 @@
+import sys
+
+from db.createdb import connect_db, get_file_manifest, DB_PATH
+from importgraph import module_specifiers
+from instrumentation import timed_stage
+
+# Calls of a file as resolve_references() joins them. A member call "x.fn()" has receiver x
+# and callee fn; longer member chains keep a dot in the callee and match no declaration.
+# A bare call has no receiver and its name as callee.
+_CALLS = '''
+    SELECT m.id, m.fileId, m.name,
+           CASE WHEN instr(m.name, '.') THEN substr(m.name, 1, instr(m.name, '.') - 1) END AS receiver,
+           CASE WHEN instr(m.name, '.') THEN substr(m.name, instr(m.name, '.') + 1) ELSE m.name END AS callee
+    FROM {source}
+    WHERE m.type = 'function_call'
+'''
+
+# A scoped run reads the calls of each scope file through idx_metadata_file_type
+# rather than filtering every call of the DB
+_SCOPED_SOURCE = ('temp.reference_scope s '
+                  'CROSS JOIN metadata m INDEXED BY idx_metadata_file_type ON m.fileId = s.fileId')
+
+# Tried in order; each tier only links the calls no earlier tier resolved. Outside its own
+# file a call only resolves through a name the file binds (see modulebindings), so a call
+# to a function of another file the calling file never imported is not linked, and a
+# member call on anything but a module (arr.map(), res.get()) never is. CROSS JOIN pins
+# the join order (calls, then their file's bindings, then declarations by name and file):
+# without ANALYZE statistics SQLite may otherwise scan every declaration for each call.
+_RESOLUTION_TIERS = (
+    # a function declared in the calling file
+    '''
+    INSERT OR IGNORE INTO referencesTable (id1, id2)
+    SELECT c.id, d.id
+    FROM ({calls}) c
+    CROSS JOIN metadata d ON d.type = 'function_declaration' AND d.fileId = c.fileId AND d.name = c.name
+    ''',
+    # fn() where the file binds fn to a function of a module (import { fn as alias } /
+    # const { fn } = require()): that function, under the name the module gives it
+    '''
+    INSERT OR IGNORE INTO referencesTable (id1, id2)
+    SELECT c.id, d.id
+    FROM ({calls}) c
+    CROSS JOIN modulebindings b ON b.fileId = c.fileId AND b.name = c.name
+    CROSS JOIN metadata d ON d.type = 'function_declaration' AND d.fileId = b.importedFileId AND d.name = b.importedName
+    WHERE NOT EXISTS (SELECT 1 FROM referencesTable r WHERE r.id1 = c.id)
+    ''',
+    # fn() where fn is a default import: the function of that name the module exports
+    # (export default function fn / module.exports = fn)
+    '''
+    INSERT OR IGNORE INTO referencesTable (id1, id2)
+    SELECT c.id, d.id
+    FROM ({calls}) c
+    CROSS JOIN modulebindings b ON b.fileId = c.fileId AND b.name = c.name
+    CROSS JOIN metadata d ON d.type = 'function_declaration' AND d.fileId = b.importedFileId AND d.name = c.name
+    WHERE NOT EXISTS (SELECT 1 FROM referencesTable r WHERE r.id1 = c.id)
+      AND b.importedName = 'default'
+      AND EXISTS (SELECT 1 FROM symbols s WHERE s.fileId = d.fileId AND s.name = d.name AND s.exported)
+    ''',
+    # ns.fn() where ns is bound to a module object (import * as ns / const ns = require() /
+    # a default import, which is module.exports for a CommonJS module): fn of that module
+    '''
+    INSERT OR IGNORE INTO referencesTable (id1, id2)
+    SELECT c.id, d.id
+    FROM ({calls}) c
+    CROSS JOIN modulebindings b ON b.fileId = c.fileId AND b.name = c.receiver
+    CROSS JOIN metadata d ON d.type = 'function_declaration' AND d.fileId = b.importedFileId AND d.name = c.callee
+    WHERE NOT EXISTS (SELECT 1 FROM referencesTable r WHERE r.id1 = c.id)
+      AND (b.importedName IS NULL OR b.importedName = 'default')
+    ''',
+)
+
+
+def store_file_imports(conn, metadata, resolver, file_ids=None):
+    """Replace the fileimports and modulebindings rows of the given file records with their resolved imports.
+
+    metadata is an iterable of file records (a generator such as iter_jsonl
+    works), resolver an ImportResolver over the indexed files and file_ids
+    {filepath: files.id}, read from the files table when omitted. Returns the
+    number of import edges written.
+    """
+    if file_ids is None:
+        file_ids = {filepath: row[0] for filepath, row in get_file_manifest(conn).items()}
+    importers = []
+    edges = set()
+    bindings = {}  # (fileId, name, importedFileId) -> importedName
+    for file_metadata in metadata:
+        filepath = file_metadata["file"]
+        importer = file_ids.get(filepath)
+        if importer is None:
+            continue
+        importers.append((importer,))
+        for module in module_specifiers(file_metadata):
+            target = file_ids.get(resolver.resolve(filepath, module))
+            if target is not None and target != importer:
+                edges.add((importer, target))
+        # Records of runs before bindings were extracted have none
+        for binding in file_metadata.get("bindings", []):
+            target = file_ids.get(resolver.resolve(filepath, binding["module"]))
+            if target is not None and target != importer:
+                bindings[importer, binding["name"], target] = binding.get("imported")
+    cursor = conn.cursor()
+    cursor.executemany('DELETE FROM fileimports WHERE fileId = ?', importers)
+    cursor.executemany('DELETE FROM modulebindings WHERE fileId = ?', importers)
+    cursor.executemany('INSERT INTO fileimports (fileId, importedFileId) VALUES (?, ?)', sorted(edges))
+    cursor.executemany('INSERT INTO modulebindings (fileId, name, importedFileId, importedName) VALUES (?, ?, ?, ?)',
+                       [key + (imported,) for key, imported in sorted(bindings.items())])
+    conn.commit()
+    return len(edges)
+
+
+@timed_stage("references")
+def resolve_references(conn, file_ids=None):
+    """Link every function_call row to the function_declaration rows it calls, in referencesTable.
+
+    Runs after extraction, once the metadata, symbols, fileimports and
+    modulebindings rows are written. A call resolves to a function of the same
+    name in its own file; failing that, through the names the file binds to
+    other modules: fn() bound by import { fn } / const { fn } = require()
+    resolves to that function, fn() bound by a default import to the exported
+    function fn of that module, and ns.fn() whose receiver is bound to a module
+    object (import * as ns / const ns = require() / a default import) to fn in
+    that module. Other calls, including member calls on anything but a module
+    (arr.map(), res.get()), are not linked. Functions bound to variables
+    (const fn = () => ...) and CommonJS exports (exports.fn = function () {...})
+    have function_declaration rows like declared functions. Each tier is one
+    INSERT ... SELECT over all calls, and the whole resolution is one
+    transaction.
+
+    With file_ids, only the calls of those files and of the files importing
+    them are re-resolved, which is what a change to those files can affect.
+    Returns the number of references written.
+    """
+    cursor = conn.cursor()
+    try:
+        if file_ids is None:
+            source = 'metadata m'
+        else:
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS reference_scope (fileId INTEGER PRIMARY KEY)')
+            cursor.execute('DELETE FROM temp.reference_scope')
+            cursor.executemany('INSERT OR IGNORE INTO temp.reference_scope (fileId) VALUES (?)',
+                               [(file_id,) for file_id in file_ids])
+            cursor.execute('''
+                INSERT OR IGNORE INTO temp.reference_scope (fileId)
+                SELECT fileId FROM fileimports WHERE importedFileId IN (SELECT fileId FROM temp.reference_scope)
+            ''')
+            source = _SCOPED_SOURCE
+        calls = _CALLS.format(source=source)
+        # Other kinds of references (id1 not a call) are left alone
+        cursor.execute(f'DELETE FROM referencesTable WHERE id1 IN (SELECT id FROM ({calls}))')
+        written = 0
+        for statement in _RESOLUTION_TIERS:
+            cursor.execute(statement.format(calls=calls))
+            written += cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return written
+
+
+if __name__ == "__main__":
+    # python callresolver.py [db_path]
+    # Re-resolves every call of an existing index (fileimports and modulebindings must already be populated).
+    conn = connect_db(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    print(f"{resolve_references(conn)} references")
+    conn.close()
@@ -0,0 +1,417 @@
+import sqlite3
+import time
+from instrumentation import emit
+from blobstore import store_blob, delete_unreferenced_blobs, DEFAULT_COMPRESSION
+
+DB_PATH="codebaseschema.db"
+
+# Per-file manifest used by incremental re-indexing to detect changed files
+FILE_MANIFEST_COLUMNS = {
+    "filesize": "integer",
+    "mtime": "real",
+    "contenthash": "text",
+}
+
+def setUpDataBase(dbpath):
+    conn=sqlite3.connect(dbpath)
+    cursor=conn.cursor()
+    fileQuery="""
+                create table if not exists files(
+                id integer primary key autoincrement,
+                filename text,
+                filepath text,
+                filetype text,
+                filesize integer,
+                mtime real,
+                contenthash text
+                )        
+"""
+
+    metadataQuery="""
+        create table if not exists metadata(
+        id integer primary key autoincrement,
+        fileId integer,
+        name text,
+        type text,
+        codecontent text,
+        docstatus integer,
+        docContent text,
+        foreign key (fileId) references files(id)
+        )        
+"""
+
+    referencesQuery="""
+            create table if not exists referencesTable(
+            id1 integer,
+            id2 integer,
+            primary key (id1,id2),
+            foreign key (id1) references metadata(id),
+            foreign key (id2) references metadata(id)
+            )        
+"""
+    cursor.execute(fileQuery)
+    cursor.execute(metadataQuery)
+    cursor.execute(referencesQuery)
+    # Databases created before the manifest columns existed get them added in place
+    add_missing_columns(cursor, "files", FILE_MANIFEST_COLUMNS)
+    conn.commit()
+    migrate_schema(conn)
+    conn.close()
+
+def _move_code_content_to_blobs(conn):
+    """Move the file text of code_content rows written before the blobs table into it."""
+    cursor = conn.cursor()
+    rows = cursor.execute(
+        "SELECT id, fileId FROM metadata WHERE type = 'code_content' AND codecontent IS NOT NULL"
+    ).fetchall()
+    for metadata_id, file_id in rows:
+        # One text in memory at a time, whatever the size of the DB
+        code = cursor.execute('SELECT codecontent FROM metadata WHERE id = ?', (metadata_id,)).fetchone()[0]
+        blobhash = store_blob(cursor, code)
+        _unindex_metadata_rows(cursor, 'id = ?', (metadata_id,))
+        cursor.execute('UPDATE metadata SET codecontent = NULL, blobhash = ? WHERE id = ?', (blobhash, metadata_id))
+        _index_metadata_rows(cursor, 'id = ?', (metadata_id,))
+        cursor.execute('UPDATE files SET blobhash = ? WHERE id = ?', (blobhash, file_id))
+    # The freed pages are reused by later runs; VACUUM returns them to the filesystem
+
+# Schema changes applied in order by migrate_schema(); PRAGMA user_version counts how many have run.
+# Only ever append to this list.
+SCHEMA_MIGRATIONS = [
+    # get_file_id / manifest lookups by path
+    "create index if not exists idx_files_filepath on files(filepath)",
+    # all entities of a file, optionally of one type
+    "create index if not exists idx_metadata_file_type on metadata(fileId, type)",
+    # symbol lookups such as all function_declarations named X
+    "create index if not exists idx_metadata_name_type on metadata(name, type)",
+    # callers of an entity; (id1, id2) is already covered by the primary key
+    "create index if not exists idx_references_id2 on referencesTable(id2)",
+    # symbol index: names a file declares or exports, with the span of the definition
+    """create table if not exists symbols(
+        id integer primary key autoincrement,
+        fileId integer,
+        name text,
+        kind text,
+        exported integer,
+        start_byte integer,
+        end_byte integer,
+        start_row integer,
+        start_col integer,
+        end_row integer,
+        end_col integer,
+        foreign key (fileId) references files(id)
+    )""",
+    "create index if not exists idx_symbols_name on symbols(name)",
+    "create index if not exists idx_symbols_file on symbols(fileId)",
+    # full-text search over entity names and code (querydb.search_code); the text stays in
+    # metadata and the write helpers below keep the index in step (see _index_metadata_rows).
+    # Trigrams match any substring of 3+ characters.
+    """create virtual table if not exists metadata_fts using fts5(
+        name, codecontent, content='metadata', content_rowid='id', tokenize='trigram'
+    )""",
+    # index the rows of databases created before the table existed
+    "insert into metadata_fts(metadata_fts) values ('rebuild')",
+    # content-addressed source text (see blobstore): each distinct file body is stored once,
+    # files and their code_content metadata row point at it by hash
+    """create table if not exists blobs(
+        hash text primary key,
+        size integer,
+        compression text,
+        data blob
+    ) without rowid""",
+    "alter table files add column blobhash text references blobs(hash)",
+    "alter table metadata add column blobhash text references blobs(hash)",
+    # finding whether a blob is still referenced
+    "create index if not exists idx_files_blobhash on files(blobhash)",
+    _move_code_content_to_blobs,
+    # resolved import edges between indexed files, written by callresolver.store_file_imports
+    """create table if not exists fileimports(
+        fileId integer,
+        importedFileId integer,
+        primary key (fileId, importedFileId),
+        foreign key (fileId) references files(id),
+        foreign key (importedFileId) references files(id)
+    ) without rowid""",
+    # files importing a changed file, whose calls may now resolve differently
+    "create index if not exists idx_fileimports_imported on fileimports(importedFileId)",
+    # call resolution: all calls, and the declarations of a file by name, without touching the table
+    "create index if not exists idx_metadata_type_file_name on metadata(type, fileId, name)",
+    # Led by (type, fileId), the index above was also chosen for name + type lookups
+    # (querydb.find_symbol) and scanned every row of the type; (type, name, fileId)
+    # serves those and call resolution alike
+    "drop index if exists idx_metadata_type_file_name",
+    "create index if not exists idx_metadata_type_name_file on metadata(type, name, fileId)",
+    # names a file binds to a whole indexed module (import * as ns / const m = require()),
+    # so callresolver matches ns.fn() against that module only
+    """create table if not exists modulebindings(
+        fileId integer,
+        name text,
+        importedFileId integer,
+        primary key (fileId, name, importedFileId),
+        foreign key (fileId) references files(id),
+        foreign key (importedFileId) references files(id)
+    ) without rowid""",
+    "create index if not exists idx_modulebindings_imported on modulebindings(importedFileId)",
+    # the function a name is bound to (import { fn as name }), NULL when bound to the module object
+    "alter table modulebindings add column importedName text",
+]
+
+def migrate_schema(conn):
+    """Apply any SCHEMA_MIGRATIONS the database has not seen yet.
+
+    A migration is a SQL statement, or a function taking the connection for
+    changes SQL alone cannot make.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, statement in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        if callable(statement):
+            statement(conn)
+        else:
+            conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+    return len(SCHEMA_MIGRATIONS)
+
+def rebuild_search_index(conn):
+    """Rebuild metadata_fts from the metadata table, e.g. after metadata was written without these helpers."""
+    conn.execute("insert into metadata_fts(metadata_fts) values ('rebuild')")
+    conn.commit()
+
+def optimize_search_index(conn):
+    """Merge metadata_fts into one b-tree; worth running after a large index run."""
+    conn.execute("insert into metadata_fts(metadata_fts) values ('optimize')")
+    conn.commit()
+
+def add_missing_columns(cursor, table, columns):
+    existing = {row[1] for row in cursor.execute(f"pragma table_info({table})")}
+    for name, coltype in columns.items():
+        if name not in existing:
+            cursor.execute(f"alter table {table} add column {name} {coltype}")
+
+def connect_db(db_name='codebaseschema.db', bulk_load=False):
+    conn = sqlite3.connect(db_name)
+    if bulk_load:
+        configure_bulk_load(conn)
+    return conn
+
+def configure_bulk_load(conn):
+    """Tune a connection for large index runs: WAL journal, relaxed fsync, bigger page cache."""
+    conn.execute('PRAGMA journal_mode=WAL')
+    # With WAL, NORMAL only syncs at checkpoints; a crash can lose the last batch but not corrupt the DB
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')  # 64 MiB
+    conn.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+
+def insert_file(conn, filename, filepath, filetype, filesize=None, mtime=None, contenthash=None):
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO files (filename, filepath, filetype, filesize, mtime, contenthash)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (filename, filepath, filetype, filesize, mtime, contenthash))
+    conn.commit()
+    return cursor.lastrowid  # Return the ID of the newly inserted file
+
+def get_file_manifest(conn):
+    """Return {filepath: (id, filesize, mtime, contenthash)} for every indexed file."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT filepath, id, filesize, mtime, contenthash FROM files ORDER BY id')
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def update_file_stat(conn, file_id, filesize, mtime):
+    cursor = conn.cursor()
+    cursor.execute('UPDATE files SET filesize = ?, mtime = ? WHERE id = ?', (filesize, mtime, file_id))
+    conn.commit()
+
+def delete_file(conn, filepath):
+    """Delete every row for filepath together with its metadata and references to that metadata."""
+    cursor = conn.cursor()
+    delete_unreferenced_blobs(cursor, _delete_file_rows(cursor, filepath))
+    conn.commit()
+
+def _delete_file_rows(cursor, filepath):
+    """Delete filepath's rows; returns the blob hashes they referenced, which may now be unused."""
+    blobhashes = [row[0] for row in cursor.execute('SELECT blobhash FROM files WHERE filepath = ?', (filepath,))]
+    cursor.execute('''
+        DELETE FROM referencesTable
+        WHERE id1 IN (SELECT m.id FROM metadata m JOIN files f ON m.fileId = f.id WHERE f.filepath = ?)
+           OR id2 IN (SELECT m.id FROM metadata m JOIN files f ON m.fileId = f.id WHERE f.filepath = ?)
+    ''', (filepath, filepath))
+    _unindex_metadata_rows(cursor, 'fileId IN (SELECT id FROM files WHERE filepath = ?)', (filepath,))
+    cursor.execute('DELETE FROM metadata WHERE fileId IN (SELECT id FROM files WHERE filepath = ?)', (filepath,))
+    cursor.execute('DELETE FROM symbols WHERE fileId IN (SELECT id FROM files WHERE filepath = ?)', (filepath,))
+    for table in ('fileimports', 'modulebindings'):
+        cursor.execute(f'''
+            DELETE FROM {table}
+            WHERE fileId IN (SELECT id FROM files WHERE filepath = ?)
+               OR importedFileId IN (SELECT id FROM files WHERE filepath = ?)
+        ''', (filepath, filepath))
+    cursor.execute('DELETE FROM files WHERE filepath = ?', (filepath,))
+    return blobhashes
+
+# metadata_fts is kept in sync here rather than with triggers: FTS5 flushes its pending
+# terms at every statement savepoint, so a trigger firing once per executemany row writes
+# one tiny segment per row (several times slower than the whole load without it). One
+# INSERT ... SELECT per batch indexes or unindexes all of its rows in a single pass.
+def _index_metadata_rows(cursor, where, params=()):
+    cursor.execute(f'''
+        INSERT INTO metadata_fts (rowid, name, codecontent)
+        SELECT id, name, codecontent FROM metadata WHERE {where}
+    ''', params)
+
+def _unindex_metadata_rows(cursor, where, params=()):
+    # External-content deletes must repeat the indexed values, so run this before the DELETE/UPDATE
+    cursor.execute(f'''
+        INSERT INTO metadata_fts (metadata_fts, rowid, name, codecontent)
+        SELECT 'delete', id, name, codecontent FROM metadata WHERE {where}
+    ''', params)
+
+def insert_metadata(conn, fileId, name, type, codecontent, docstatus, docContent):
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO metadata (fileId, name, type, codecontent, docstatus, docContent)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (fileId, name, type, codecontent, docstatus, docContent))
+    _index_metadata_rows(cursor, 'id = ?', (cursor.lastrowid,))
+    conn.commit()
+    return cursor.lastrowid  # Return the ID of the newly inserted metadata
+
+def insert_reference(conn, id1, id2):
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO referencesTable (id1, id2)
+        VALUES (?, ?)
+    ''', (id1, id2))
+    conn.commit()
+
+def get_file_id(conn, filepath):
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM files WHERE filepath = ?', (filepath,))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+class BulkWriter:
+    """Buffered writer for index runs.
+
+    Metadata and reference rows are queued and written with executemany, and each
+    batch is committed as a single transaction instead of one commit per row.
+    Use it as a context manager so the last batch is flushed (or rolled back on error).
+    File text goes to the blobs table (see blobstore), compressed with blob_compression.
+    """
+
+    def __init__(self, conn, batch_size=5000, on_commit=None, blob_compression=DEFAULT_COMPRESSION):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.blob_compression = blob_compression
+        # Called after every commit, e.g. to write outputs only once their rows are durable
+        self.on_commit = on_commit
+        self.cursor = conn.cursor()
+        self.metadata_rows = []
+        self.reference_rows = []
+        self.symbol_rows = []
+        # Blobs of deleted or rewritten files; dropped at the next flush if nothing uses them by then
+        self.released_blobs = []
+
+    def add_file(self, filename, filepath, filetype, filesize=None, mtime=None, contenthash=None, blobhash=None):
+        """Insert a files row right away (its id is needed for the metadata rows) without committing."""
+        self.cursor.execute('''
+            INSERT INTO files (filename, filepath, filetype, filesize, mtime, contenthash, blobhash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (filename, filepath, filetype, filesize, mtime, contenthash, blobhash))
+        return self.cursor.lastrowid
+
+    def add_blob(self, text):
+        """Store text in the blobs table right away (unless it is there already); returns its hash."""
+        return store_blob(self.cursor, text, self.blob_compression)
+
+    def add_metadata(self, fileId, name, type, codecontent, docstatus=0, docContent=None, blobhash=None):
+        self.metadata_rows.append((fileId, name, type, codecontent, docstatus, docContent, blobhash))
+        self._maybe_flush()
+
+    def add_reference(self, id1, id2):
+        self.reference_rows.append((id1, id2))
+        self._maybe_flush()
+
+    def add_symbol(self, fileId, name, kind, exported, span):
+        self.symbol_rows.append((fileId, name, kind, int(exported), *span))
+        self._maybe_flush()
+
+    def delete_file(self, filepath):
+        """Same as delete_file(), but inside the current batch transaction."""
+        self.released_blobs.extend(_delete_file_rows(self.cursor, filepath))
+
+    def delete_metadata(self, fileId, name, type, codecontent, count=1):
+        """Delete up to count metadata rows of a file with exactly these values, and their references."""
+        ids = [row[0] for row in self.cursor.execute('''
+            SELECT id FROM metadata WHERE fileId = ? AND type = ? AND name = ? AND codecontent = ? LIMIT ?
+        ''', (fileId, type, name, codecontent, count))]
+        for metadata_id in ids:
+            self.cursor.execute('DELETE FROM referencesTable WHERE id1 = ? OR id2 = ?', (metadata_id, metadata_id))
+            _unindex_metadata_rows(self.cursor, 'id = ?', (metadata_id,))
+            self.cursor.execute('DELETE FROM metadata WHERE id = ?', (metadata_id,))
+        return len(ids)
+
+    def delete_symbols(self, fileId):
+        self.cursor.execute('DELETE FROM symbols WHERE fileId = ?', (fileId,))
+
+    def update_file_content(self, fileId, codecontent, filesize=None, mtime=None, contenthash=None):
+        """Point an existing files row and its code_content row at a new version of the file."""
+        self.released_blobs.extend(
+            row[0] for row in self.cursor.execute('SELECT blobhash FROM files WHERE id = ?', (fileId,)))
+        blobhash = self.add_blob(codecontent)
+        self.cursor.execute('UPDATE files SET filesize = ?, mtime = ?, contenthash = ?, blobhash = ? WHERE id = ?',
+                            (filesize, mtime, contenthash, blobhash, fileId))
+        self.cursor.execute("UPDATE metadata SET blobhash = ? WHERE fileId = ? AND type = 'code_content'",
+                            (blobhash, fileId))
+
+    def _maybe_flush(self):
+        if len(self.metadata_rows) + len(self.reference_rows) + len(self.symbol_rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write all queued rows and commit the batch."""
+        started = time.perf_counter()
+        rows = len(self.metadata_rows) + len(self.reference_rows) + len(self.symbol_rows)
+        if self.metadata_rows:
+            # New rows get ids above the current maximum, which is how they are found for indexing
+            last_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM metadata').fetchone()[0]
+            self.cursor.executemany('''
+                INSERT INTO metadata (fileId, name, type, codecontent, docstatus, docContent, blobhash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', self.metadata_rows)
+            _index_metadata_rows(self.cursor, 'id > ?', (last_id,))
+            self.metadata_rows = []
+        if self.reference_rows:
+            self.cursor.executemany('''
+                INSERT OR IGNORE INTO referencesTable (id1, id2)
+                VALUES (?, ?)
+            ''', self.reference_rows)
+            self.reference_rows = []
+        if self.symbol_rows:
+            self.cursor.executemany('''
+                INSERT INTO symbols (fileId, name, kind, exported, start_byte, end_byte,
+                                     start_row, start_col, end_row, end_col)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', self.symbol_rows)
+            self.symbol_rows = []
+        if self.released_blobs:
+            # After the inserts, so a file deleted and re-added with the same text keeps its blob
+            delete_unreferenced_blobs(self.cursor, self.released_blobs)
+            self.released_blobs = []
+        self.conn.commit()
+        emit("on_db_flush", rows, time.perf_counter() - started)
+        if self.on_commit:
+            self.on_commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.metadata_rows = []
+            self.reference_rows = []
+            self.symbol_rows = []
+            self.released_blobs = []
+            self.conn.rollback()
+        return False
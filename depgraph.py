@@ -0,0 +1,137 @@
+def strongly_connected_components(successors):
+    """Tarjan's algorithm without recursion.
+
+    successors[v] lists the node indices v points to. Returns the components as
+    lists of node indices, in reverse topological order: every component comes
+    after all the components it can reach.
+    """
+    n = len(successors)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        # Explicit DFS stack of (node, position in its successor list)
+        work = [(root, 0)]
+        while work:
+            v, i = work[-1]
+            succ = successors[v]
+            if i < len(succ):
+                work[-1] = (v, i + 1)
+                w = succ[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+    return components
+
+
+def _bits(mask):
+    """Yield the set bit positions of mask in increasing order."""
+    # One pass over the binary digits; peeling off the lowest bit instead would
+    # copy the whole (possibly many-thousand-bit) int once per set bit
+    digits = bin(mask)[:1:-1]
+    position = digits.find('1')
+    while position != -1:
+        yield position
+        position = digits.find('1', position + 1)
+
+
+class DependencyGraph:
+    """Transitive dependencies of every node, computed once for the whole graph.
+
+    Import cycles are collapsed into strongly connected components, which turns
+    the graph into a DAG. Each component's reachable set is then computed once,
+    in reverse topological order, as a bitset over node positions built from
+    its successors' (already finished) bitsets. Every file of a component shares
+    that one bitset, so the whole pass is close to linear in nodes + edges plus
+    the size of the bitset unions.
+    """
+
+    def __init__(self, nodes, edges):
+        """nodes is the node order used for results; edges maps node -> nodes it depends on."""
+        self.nodes = list(nodes)
+        self.position = {node: i for i, node in enumerate(self.nodes)}
+        successors = [[] for _ in self.nodes]
+        for node, targets in edges.items():
+            source = self.position.get(node)
+            if source is None:
+                continue
+            seen = set()
+            for target in targets:
+                target_position = self.position.get(target)
+                if target_position is not None and target_position not in seen:
+                    seen.add(target_position)
+                    successors[source].append(target_position)
+
+        self.components = strongly_connected_components(successors)
+        self.component_of = [0] * len(self.nodes)
+        for component_id, members in enumerate(self.components):
+            for member in members:
+                self.component_of[member] = component_id
+
+        # reach[c]: bitset of every node reachable from component c through at least one edge
+        self.reach = [0] * len(self.components)
+        member_mask = [0] * len(self.components)
+        for component_id, members in enumerate(self.components):
+            mask = 0
+            for member in members:
+                mask |= 1 << member
+            member_mask[component_id] = mask
+
+            reach = 0
+            cyclic = len(members) > 1
+            for member in members:
+                for target in successors[member]:
+                    target_component = self.component_of[target]
+                    if target_component == component_id:
+                        cyclic = True
+                    else:
+                        reach |= member_mask[target_component] | self.reach[target_component]
+            if cyclic:
+                reach |= mask
+            self.reach[component_id] = reach
+
+    def dependencies_mask(self, node):
+        """Bitset over node positions of everything node depends on, excluding node itself."""
+        position = self.position[node]
+        return self.reach[self.component_of[position]] & ~(1 << position)
+
+    def transitive_dependencies(self, node):
+        """Every node that node depends on directly or transitively, in node order."""
+        if node not in self.position:
+            return []
+        return [self.nodes[i] for i in _bits(self.dependencies_mask(node))]
+
+    def in_cycle(self, node):
+        position = self.position[node]
+        return bool(self.reach[self.component_of[position]] >> position & 1)
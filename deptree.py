@@ -0,0 +1,77 @@
+from typing import Dict, List, Optional
+from instrumentation import timed_stage
+
+
+def _dependency_names(dependencies) -> List[str]:
+    # Accepts madge's ["dep", ...] as well as the [{"name": "dep"}, ...] lists saved by create_proj_dep_metadata
+    return [dep["name"] if isinstance(dep, dict) else dep for dep in dependencies]
+
+
+def find_root_files(metadata: Dict[str, list]) -> List[str]:
+    """Find files that are not dependencies of any other file, sorted."""
+    dependent_files = {dep for deps in metadata.values() for dep in _dependency_names(deps)}
+    return sorted(set(metadata) - dependent_files)
+
+
+@timed_stage("hierarchy_tree")
+def build_dependency_hierarchy(metadata: Dict[str, list], roots: Optional[List[str]] = None,
+                               max_depth: Optional[int] = None) -> Dict[str, Dict]:
+    """Build the dependency tree of every root file, expanding each file only once.
+
+    Returns {root: node}. A node is one of:
+      {"name": file, "$id": n, "dependencies": [node, ...]}  first time file is reached
+      {"name": file, "$ref": n}                              file was expanded elsewhere
+      {"name": file, "$ref": n, "cycle": True}               file is an ancestor (import cycle)
+      {"name": file, "truncated": True}                      below max_depth, not expanded here
+    so the output grows with files + edges, not with the number of paths.
+
+    roots defaults to find_root_files(); files that are only reachable through a
+    cycle get their own root afterwards, so every file appears somewhere.
+    max_depth counts edges from the root; None means unlimited. Set it when the
+    tree is going to be serialized: json.dump() cannot nest arbitrarily deep.
+    """
+    def dependencies(file):
+        # Normalized when a file is expanded, so a single root costs only the part of the graph below it
+        return iter(_dependency_names(metadata.get(file, [])))
+
+    ids = {}
+    truncated = set()
+    on_path = set()
+    tree = {}
+
+    def expand(root):
+        ids[root] = len(ids)
+        top = {"name": root, "$id": ids[root], "dependencies": []}
+        on_path.add(root)
+        # Explicit stack of (file, node being filled, remaining dependencies, depth)
+        stack = [(root, top, dependencies(root), 0)]
+        while stack:
+            file, node, remaining, depth = stack[-1]
+            dep = next(remaining, None)
+            if dep is None:
+                stack.pop()
+                on_path.discard(file)
+                continue
+            if dep in on_path:
+                node["dependencies"].append({"name": dep, "$ref": ids[dep], "cycle": True})
+            elif dep in ids:
+                node["dependencies"].append({"name": dep, "$ref": ids[dep]})
+            elif max_depth is not None and depth + 1 > max_depth:
+                node["dependencies"].append({"name": dep, "truncated": True})
+                truncated.add(dep)
+            else:
+                ids[dep] = len(ids)
+                child = {"name": dep, "$id": ids[dep], "dependencies": []}
+                node["dependencies"].append(child)
+                on_path.add(dep)
+                stack.append((dep, child, dependencies(dep), depth + 1))
+        return top
+
+    for root in find_root_files(metadata) if roots is None else roots:
+        tree[root] = {"name": root, "$ref": ids[root]} if root in ids else expand(root)
+    if roots is None:
+        # Pure cycles have no root file; start them from their first file
+        for file in sorted(metadata):
+            if file not in ids and file not in truncated:
+                tree[file] = expand(file)
+    return tree
@@ -1,20 +1,142 @@
 import os
+import sys
 import json
+import html
+from collections import defaultdict
+
+# Mermaid refuses diagrams longer than its maxTextSize (set to 90000 in the page
+# template below); each generated diagram is kept under DEFAULT_DIAGRAM_BUDGET
+MERMAID_MAX_TEXT_SIZE = 90000
+DEFAULT_DIAGRAM_BUDGET = 50000
+
+
+def iter_dependency_edges(data):
+    """Yield (file, dependency, functions) for every edge of the hierarchy JSON."""
+    for file, details in data.items():
+        for dep, dep_details in details.get('dependencies', {}).items():
+            yield file, dep, dep_details.get('functions', [])
+
+
+def _mermaid_text(text):
+    # Quoted labels may hold any character except the quote itself
+    return text.replace('"', '#quot;')
+
+
+class MermaidBuilder:
+    """Accumulates a flowchart as a list of lines and joins them once in text().
+
+    Files get short ids (n0, n1, ...) declared with their path as the label the
+    first time they are used, which keeps paths with backslashes, dots or dashes
+    valid Mermaid and every edge line short.
+    """
+
+    def __init__(self, direction='TD'):
+        self.lines = [f'graph {direction}']
+        self.size = len(self.lines[0]) + 1
+        self.ids = {}
+        self.edges = 0
+
+    def _append(self, line):
+        self.lines.append(line)
+        self.size += len(line) + 1
+
+    def node(self, name):
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = self.ids[name] = f'n{len(self.ids)}'
+            self._append(f'{node_id}["{_mermaid_text(name)}"]')
+        return node_id
+
+    def edge_size(self, source, target, functions):
+        """Characters edge() would add, including any node declarations."""
+        size = len(self._edge_line('n' * 8, 'n' * 8, functions)) + 1
+        for name in (source, target):
+            if name not in self.ids:
+                size += len(_mermaid_text(name)) + 13
+        return size
+
+    def _edge_line(self, source_id, target_id, functions):
+        if functions:
+            return f'{source_id} -->|"{_mermaid_text(", ".join(functions))}"| {target_id}'
+        return f'{source_id} --> {target_id}'
+
+    def edge(self, source, target, functions=()):
+        source_id = self.node(source)
+        target_id = self.node(target)
+        self._append(self._edge_line(source_id, target_id, functions))
+        self.edges += 1
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
 
 # Function to convert the JSON data to Mermaid syntax for a flowchart
 def convert_to_mermaid_syntax(data):
-    diagram = 'graph TD\n'  # Mermaid syntax for flowchart
+    """Return the whole hierarchy as one diagram (see split_mermaid_diagrams for large ones)."""
+    builder = MermaidBuilder()
+    for file, dep, functions in iter_dependency_edges(data):
+        builder.edge(file, dep, functions)
+    return builder.text()
+
+
+def _directory(path):
+    return os.path.dirname(path.replace('\\', '/')) or '/'
+
+
+def _component_groups(data):
+    """Group edges by weakly connected component (union-find over the files)."""
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    edges = list(iter_dependency_edges(data))
+    for file, dep, _ in edges:
+        parent[find(file)] = find(dep)
+    groups = defaultdict(list)
+    for edge in edges:
+        groups[find(edge[0])].append(edge)
+    # Name each component after its first file so the titles mean something
+    return {min(edge[0] for edge in group): group for group in groups.values()}
+
+
+def split_mermaid_diagrams(data, budget=DEFAULT_DIAGRAM_BUDGET, group_by='directory'):
+    """Split the hierarchy into diagrams of at most budget characters each.
+
+    group_by='directory' puts each edge with the directory of the file it starts
+    from; group_by='component' keeps connected files together. A group larger
+    than the budget is continued in further parts. Returns [(title, syntax, edge count)].
+    """
+    if budget > MERMAID_MAX_TEXT_SIZE:
+        raise ValueError(f"budget {budget} exceeds Mermaid's maxTextSize of {MERMAID_MAX_TEXT_SIZE}")
+    if group_by == 'directory':
+        groups = defaultdict(list)
+        for edge in iter_dependency_edges(data):
+            groups[_directory(edge[0])].append(edge)
+    elif group_by == 'component':
+        groups = _component_groups(data)
+    else:
+        raise ValueError(f"group_by must be 'directory' or 'component', not {group_by!r}")
+
+    diagrams = []
+    for group in sorted(groups):
+        parts = []
+        builder = MermaidBuilder()
+        for file, dep, functions in groups[group]:
+            if builder.edges and builder.size + builder.edge_size(file, dep, functions) > budget:
+                parts.append(builder)
+                builder = MermaidBuilder()
+            builder.edge(file, dep, functions)
+        parts.append(builder)
+        for number, part in enumerate(parts, start=1):
+            title = group if len(parts) == 1 else f'{group} ({number}/{len(parts)})'
+            diagrams.append((title, part.text(), part.edges))
+    return diagrams
 
-    # Loop through the data to create nodes and links
-    for file, details in data.items():
-        dependencies = details.get('dependencies', {})
-        # Loop through the dependencies of each file
-        for dep, dep_details in dependencies.items():
-            functions = dep_details.get('functions', [])
-            # Create edges between files, and show the functions being called
-            diagram += f"{file.replace('\\', '\\\\')} -->|{', '.join(functions)}| {dep.replace('\\', '\\\\')}\n"
-    
-    return diagram
 
 # Function to generate HTML content with the Mermaid diagram
 def generate_html(file_name, mermaid_syntax):
@@ -38,14 +160,14 @@ def generate_html(file_name, mermaid_syntax):
         <script src="https://bumbu.me/svg-pan-zoom/dist/svg-pan-zoom.min.js"></script>
         <script type="module">
             import mermaid from 'https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.esm.min.js';
-            mermaid.initialize({
+            mermaid.initialize({{
                 startOnLoad: false,
-                maxTextSize: 90000
-            });
+                maxTextSize: {MERMAID_MAX_TEXT_SIZE}
+            }});
 
             const drawDiagram = async function () {{
                 const element = document.querySelector('#classDiv');
-                const diagramSyntax = `{mermaid_syntax}`;
+                const diagramSyntax = `{_template_literal(mermaid_syntax)}`;
 
                 const {{ svg }} = await mermaid.render('mySvgId', diagramSyntax);
 
@@ -100,25 +222,54 @@ def generate_html(file_name, mermaid_syntax):
     with open(file_name, 'w') as file:
         file.write(html_template)
 
-# Directory containing your JSON files
-json_folder = 'path_to_your_json_folder'
-
-# Iterate over each JSON file in the directory
-for json_filename in os.listdir(json_folder):
-    if json_filename.endswith('.json'):
-        json_file_path = os.path.join(json_folder, json_filename)
-        
-        # Read the JSON file
-        with open(json_file_path, 'r') as f:
-            data = json.load(f)
-
-        # Convert JSON data to Mermaid syntax
-        mermaid_syntax = convert_to_mermaid_syntax(data)
-        
-        # Create an HTML file name from the JSON file name
-        html_filename = os.path.splitext(json_filename)[0] + '.html'
-        html_file_path = os.path.join(json_folder, html_filename)
-        
-        # Generate HTML file
-        generate_html(html_file_path, mermaid_syntax)
-        print(f"Generated HTML file: {html_file_path}")
+def _template_literal(text):
+    # The diagram is embedded in a JS `...` string
+    return text.replace('\\', '\\\\').replace('`', '\\`').replace('${', '\\${')
+
+
+def generate_index_html(file_name, title, pages):
+    """Write a plain HTML page linking to every diagram page; pages is [(href, title, edge count)]."""
+    parts = [
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8">\n',
+        f'<title>{html.escape(title)}</title>\n</head>\n<body>\n<h1>{html.escape(title)}</h1>\n<ul>\n',
+    ]
+    for href, page_title, edges in pages:
+        parts.append(f'<li><a href="{html.escape(href)}">{html.escape(page_title)}</a> ({edges} edges)</li>\n')
+    parts.append('</ul>\n</body>\n</html>\n')
+    with open(file_name, 'w') as file:
+        file.write(''.join(parts))
+
+
+def write_diagram_pages(data, output_dir, name, budget=DEFAULT_DIAGRAM_BUDGET, group_by='directory'):
+    """Write one HTML page per diagram plus {name}.html indexing them; returns the index path."""
+    os.makedirs(output_dir, exist_ok=True)
+    pages = []
+    for number, (title, mermaid_syntax, edges) in enumerate(split_mermaid_diagrams(data, budget, group_by)):
+        href = f'{name}_{number}.html'
+        generate_html(os.path.join(output_dir, href), mermaid_syntax)
+        pages.append((href, title, edges))
+    index_path = os.path.join(output_dir, name + '.html')
+    generate_index_html(index_path, f'{name} dependency diagrams', pages)
+    return index_path
+
+
+if __name__ == "__main__":
+    # python eachindexdiagram.py [json_folder] [budget] [directory|component]
+    # Directory containing your JSON files
+    json_folder = sys.argv[1] if len(sys.argv) > 1 else 'path_to_your_json_folder'
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DIAGRAM_BUDGET
+    group_by = sys.argv[3] if len(sys.argv) > 3 else 'directory'
+
+    # Iterate over each JSON file in the directory
+    for json_filename in os.listdir(json_folder):
+        if json_filename.endswith('.json'):
+            json_file_path = os.path.join(json_folder, json_filename)
+
+            # Read the JSON file
+            with open(json_file_path, 'r') as f:
+                data = json.load(f)
+
+            # One page per subdiagram, and an index page named after the JSON file
+            name = os.path.splitext(json_filename)[0]
+            index_path = write_diagram_pages(data, json_folder, name, budget, group_by)
+            print(f"Generated HTML file: {index_path}")
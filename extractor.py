@@ -0,0 +1,689 @@
+from tree_sitter import Language, Parser, Query, QueryCursor
+import tree_sitter_javascript as tsj
+import tree_sitter_typescript as tts
+import os
+import threading
+import time
+from functools import partial
+from multiprocessing import Pool
+from instrumentation import emit
+from sourcewalker import SourceWalker
+
+
+JAVASCRIPT_LANGUAGE = Language(tsj.language())
+TYPESCRIPT_LANGUAGE = Language(tts.language_typescript())
+TSX_LANGUAGE = Language(tts.language_tsx())
+
+LANGUAGES = {
+    "javascript": JAVASCRIPT_LANGUAGE,
+    "typescript": TYPESCRIPT_LANGUAGE,
+    "tsx": TSX_LANGUAGE,
+}
+
+# Grammar used for each source extension; anything else falls back to javascript
+LANGUAGE_BY_EXTENSION = {
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "tsx",
+}
+
+DEFAULT_CHUNKSIZE = 16
+
+# Captures of ENTITY_QUERY that produce records, and the record lists of a file_metadata
+ENTITY_CAPTURES = ('import', 'export', 'function', 'call', 'arrow', 'jsx', 'binding', 'function_variable',
+                   'commonjs_export')
+ENTITY_LISTS = ("imports", "exports", "functions", "function_calls", "arrow_functions", "jsx_elements")
+
+# One capture per entity kind. Matching runs inside tree-sitter, so Python only
+# ever sees the nodes we extract instead of visiting every node of the tree.
+ENTITY_QUERY = """
+(import_statement) @import
+(export_statement) @export
+(function_declaration) @function
+(call_expression) @call
+(arrow_function) @arrow
+(variable_declarator
+  name: (_)
+  value: (call_expression function: (identifier) @_require (#eq? @_require "require"))) @binding
+"""
+
+# The plain typescript grammar has no JSX nodes, so this part is only added for the others
+JSX_QUERY = """
+(jsx_element) @jsx
+"""
+
+# Definitions that go into the "symbols" list (function_declaration comes from @function)
+SYMBOL_QUERY = """
+(generator_function_declaration) @generator
+(class_declaration) @class
+(variable_declarator value: [(arrow_function) (function_expression)]) @function_variable
+(assignment_expression
+  left: (member_expression) @_exports (#match? @_exports "^(module\\\\.)?exports(\\\\.|$)")) @commonjs_export
+"""
+
+# The ENTITY_QUERY captures collect_symbols() needs besides SYMBOL_QUERY
+SYMBOL_DEFINITION_QUERY = """
+(export_statement) @export
+(function_declaration) @function
+"""
+
+# Only the typescript grammars have abstract classes
+TS_SYMBOL_QUERY = """
+(abstract_class_declaration) @class
+"""
+
+# Parsers and compiled queries are not safe to share between threads, so each
+# thread (and each pool worker process) builds its own on first use and reuses them.
+_local = threading.local()
+
+# Per-language counters: {language: {"files", "bytes", "parse_seconds", "extract_seconds"}}
+_parse_stats = {}
+_parse_stats_lock = threading.Lock()
+
+
+def language_for_file(filepath):
+    """Return the LANGUAGES key used to parse filepath."""
+    extension = os.path.splitext(filepath)[1].lower()
+    return LANGUAGE_BY_EXTENSION.get(extension, "javascript")
+
+
+def get_parser(language="javascript"):
+    """Return this thread's parser for language, creating it on first use."""
+    parsers = _local.__dict__.setdefault("parsers", {})
+    parser = parsers.get(language)
+    if parser is None:
+        parser = parsers[language] = Parser(LANGUAGES[language])
+    return parser
+
+
+def get_entity_query(language="javascript"):
+    """Return this thread's compiled entity query for language."""
+    queries = _local.__dict__.setdefault("queries", {})
+    query = queries.get(language)
+    if query is None:
+        source = ENTITY_QUERY + SYMBOL_QUERY
+        if language != "javascript":
+            source += TS_SYMBOL_QUERY
+        if language != "typescript":
+            source += JSX_QUERY
+        query = queries[language] = Query(LANGUAGES[language], source)
+    return query
+
+
+def get_symbol_query(language="javascript"):
+    """Return this thread's compiled query for just the captures collect_symbols() reads."""
+    queries = _local.__dict__.setdefault("symbol_queries", {})
+    query = queries.get(language)
+    if query is None:
+        source = SYMBOL_DEFINITION_QUERY + SYMBOL_QUERY
+        if language != "javascript":
+            source += TS_SYMBOL_QUERY
+        query = queries[language] = Query(LANGUAGES[language], source)
+    return query
+
+
+def record_parse_stats(language, nbytes, parse_seconds, extract_seconds):
+    with _parse_stats_lock:
+        stats = _parse_stats.setdefault(language, {
+            "files": 0, "bytes": 0, "parse_seconds": 0.0, "extract_seconds": 0.0,
+        })
+        stats["files"] += 1
+        stats["bytes"] += nbytes
+        stats["parse_seconds"] += parse_seconds
+        stats["extract_seconds"] += extract_seconds
+
+
+def get_parse_stats():
+    """Return a copy of the per-language timing counters collected in this process."""
+    with _parse_stats_lock:
+        return {language: dict(stats) for language, stats in _parse_stats.items()}
+
+
+def reset_parse_stats():
+    with _parse_stats_lock:
+        _parse_stats.clear()
+
+
+def format_parse_stats(stats=None):
+    """Render the per-language counters as a small text table."""
+    stats = get_parse_stats() if stats is None else stats
+    lines = [f"{'language':<12}{'files':>8}{'MB':>10}{'parse s':>10}{'extract s':>11}"]
+    for language, counters in sorted(stats.items()):
+        lines.append(
+            f"{language:<12}{counters['files']:>8}{counters['bytes'] / 1e6:>10.2f}"
+            f"{counters['parse_seconds']:>10.2f}{counters['extract_seconds']:>11.2f}"
+        )
+    return "\n".join(lines)
+
+
+def capture_entities(root_node, language="javascript", byte_range=None, query=None):
+    """Run the entity query and return {capture name: nodes in document order}.
+
+    Document order is the order a pre-order walk of the tree would visit the
+    nodes: by start byte, with enclosing nodes before the nodes they contain.
+    byte_range=(start, end) limits the matches to nodes that intersect it;
+    query replaces the entity query (e.g. get_symbol_query()).
+    """
+    cursor = QueryCursor(query or get_entity_query(language))
+    if byte_range is not None:
+        cursor.set_byte_range(*byte_range)
+    captures = cursor.captures(root_node)
+    for nodes in captures.values():
+        nodes.sort(key=lambda node: (node.start_byte, -node.end_byte))
+    return captures
+
+
+def _record_file_stats(file_stats):
+    """Add one file's stats to the per-language counters and pass them to the instrumentation hooks."""
+    record_parse_stats(file_stats["language"], file_stats["bytes"],
+                       file_stats["parse_seconds"], file_stats["extract_seconds"])
+    emit("on_file_parsed", file_stats)
+
+
+def extract_metadata(filepath, compact=False):
+    """Parse a JavaScript/TypeScript file and extract metadata with more comprehensive details.
+
+    With compact=True entities carry a "span" instead of their text; see SourceSpans.
+    """
+    file_metadata, file_stats = _extract_metadata(filepath, compact)
+    _record_file_stats(file_stats)
+    return file_metadata
+
+
+def read_source(filepath):
+    """Return the UTF-8 bytes that spans of filepath are measured against."""
+    # Read in text mode like the extractor does, so newline handling matches the offsets
+    with open(filepath, 'r') as f:
+        return bytes(f.read(), "utf8")
+
+
+def node_span(node):
+    """Return [start_byte, end_byte, start_row, start_col, end_row, end_col] for node."""
+    start_row, start_col = node.start_point
+    end_row, end_col = node.end_point
+    return [node.start_byte, node.end_byte, start_row, start_col, end_row, end_col]
+
+
+def metadata_json_options(compact):
+    """json.dump() keyword arguments for metadata files; compact ones are written unindented."""
+    if compact:
+        return {"separators": (',', ':')}
+    return {"indent": 4}
+
+
+def span_text(source, span):
+    return source[span[0]:span[1]].decode('utf-8')
+
+
+# String node types a require()/import() argument can be
+_STRING_TYPES = ('string', 'template_string')
+
+
+def module_reference(call_node):
+    """Return (kind, specifier node) for require("x") / import("x") calls, else None."""
+    function = call_node.child_by_field_name('function')
+    if function is None:
+        return None
+    if function.type == 'import':
+        kind = "dynamic_import"
+    elif function.type == 'identifier' and function.text == b'require':
+        kind = "require"
+    else:
+        return None
+    arguments = call_node.child_by_field_name('arguments')
+    if arguments is None or not arguments.named_children:
+        return None
+    specifier = arguments.named_children[0]
+    if specifier.type not in _STRING_TYPES:
+        return None
+    if any(child.type == 'template_substitution' for child in specifier.named_children):
+        return None  # import(`./locale/${name}`) has no single target
+    return kind, specifier
+
+
+def _symbol(name, kind, node, exported=False):
+    return {"name": name, "kind": kind, "exported": exported, "span": node_span(node)}
+
+
+# Values an exported name is a function for
+_FUNCTION_TYPES = ('function_expression', 'arrow_function')
+
+
+def commonjs_exports(node, node_text):
+    """Yield (exported name, value node, entry node) for a module.exports/exports assignment.
+
+    exports.fn = value and module.exports.fn = value export fn; module.exports =
+    { a, b: value } exports each property; module.exports = value is "default".
+    """
+    left = node.child_by_field_name('left')
+    value = node.child_by_field_name('right')
+    if value is None:
+        return
+    if node_text(left) not in ('exports', 'module.exports'):
+        if node_text(left.child_by_field_name('object')) in ('exports', 'module.exports'):
+            yield node_text(left.child_by_field_name('property')), value, node
+        return
+    if value.type != 'object':
+        yield "default", value, node
+        return
+    for child in value.named_children:
+        if child.type == 'shorthand_property_identifier':
+            yield node_text(child), child, child
+        elif child.type == 'pair':
+            key = child.child_by_field_name('key')
+            if key is not None and key.type == 'property_identifier':
+                yield node_text(key), child.child_by_field_name('value'), child
+
+
+def collect_symbols(captures, node_text):
+    """Return the names a file defines or exports, for the symbol index.
+
+    Each entry is {"name", "kind", "exported", "span"} where kind is "function",
+    "class", "variable" (an exported non-function binding), "type" (an exported
+    TypeScript interface/type/enum) or "export" (a re-export or renamed export
+    with no local definition of that name). CommonJS exports (see
+    commonjs_exports) count as exports. Entries are in document order.
+    """
+    symbols = []
+    by_start = {}  # definition node start byte -> symbol, to mark exports
+
+    def define(node, name_node, kind):
+        if name_node is not None:
+            entry = _symbol(node_text(name_node), kind, node)
+            symbols.append(entry)
+            by_start[node.start_byte] = entry
+
+    for node in captures.get('function', []) + captures.get('generator', []):
+        define(node, node.child_by_field_name('name'), "function")
+    for node in captures.get('function_variable', []):
+        name_node = node.child_by_field_name('name')
+        if name_node is not None and name_node.type == 'identifier':
+            define(node, name_node, "function")
+    for node in captures.get('class', []):
+        define(node, node.child_by_field_name('name'), "class")
+
+    local_names = {}
+    for entry in symbols:
+        local_names.setdefault(entry["name"], entry)
+
+    for node in captures.get('export', []):
+        declaration = node.child_by_field_name('declaration')
+        if declaration is not None:
+            if declaration.type in ('lexical_declaration', 'variable_declaration'):
+                for declarator in declaration.named_children:
+                    name_node = declarator.child_by_field_name('name')
+                    if declarator.type != 'variable_declarator' or name_node is None or name_node.type != 'identifier':
+                        continue
+                    if declarator.start_byte in by_start:
+                        by_start[declarator.start_byte]["exported"] = True
+                    else:
+                        symbols.append(_symbol(node_text(name_node), "variable", declarator, True))
+            elif declaration.start_byte in by_start:
+                by_start[declaration.start_byte]["exported"] = True
+            else:
+                name_node = declaration.child_by_field_name('name')
+                if name_node is not None:
+                    symbols.append(_symbol(node_text(name_node), "type", declaration, True))
+            continue
+
+        value = node.child_by_field_name('value')
+        if value is not None:
+            # export default <expression>: an anonymous function/class, or a local name
+            if value.start_byte in by_start:
+                by_start[value.start_byte]["exported"] = True
+            elif value.type == 'identifier' and node_text(value) in local_names:
+                local_names[node_text(value)]["exported"] = True
+            elif value.type in ('function_expression', 'arrow_function', 'class'):
+                kind = "class" if value.type == 'class' else "function"
+                symbols.append(_symbol("default", kind, value, True))
+            continue
+
+        for child in node.named_children:
+            if child.type == 'identifier' and node_text(child) in local_names:
+                # export default foo;
+                local_names[node_text(child)]["exported"] = True
+            elif child.type == 'export_clause':
+                re_export = node.child_by_field_name('source') is not None
+                for specifier in child.named_children:
+                    name_node = specifier.child_by_field_name('name')
+                    alias_node = specifier.child_by_field_name('alias')
+                    if name_node is None:
+                        continue
+                    name = node_text(name_node)
+                    if alias_node is None and not re_export and name in local_names:
+                        local_names[name]["exported"] = True
+                    else:
+                        exported_name = node_text(alias_node) if alias_node is not None else name
+                        symbols.append(_symbol(exported_name, "export", specifier, True))
+
+    for node in captures.get('commonjs_export', []):
+        for name, value, entry in commonjs_exports(node, node_text):
+            if value is None:
+                continue
+            local = node_text(value) if value.type in ('identifier', 'shorthand_property_identifier') else None
+            if local in local_names and (local == name or name == "default"):
+                local_names[local]["exported"] = True
+            elif value.type in _FUNCTION_TYPES:
+                symbols.append(_symbol(name, "function", entry, True))
+            elif value.type == 'class':
+                symbols.append(_symbol(name, "class", entry, True))
+            else:
+                symbols.append(_symbol(name, "export" if local else "variable", entry, True))
+
+    symbols.sort(key=lambda entry: entry["span"][0])
+    return symbols
+
+
+def capture_records(capture, node, node_text, compact=False):
+    """Return the (list name, record) pairs one captured node adds to a file record.
+
+    Every record is derived from the node and its children alone, so a changed
+    region of a file can be re-extracted without touching the rest of it.
+    """
+    def located(node):
+        # Compact records point into the source instead of copying it
+        if compact:
+            return {"span": node_span(node)}
+        return {"content": node_text(node)}
+
+    records = []
+    if capture == 'import':
+        source_node = node.child_by_field_name('source')
+        if source_node:
+            records.append(("imports", {"module": node_text(source_node), **located(node)}))
+            # import * as ns from "x": ns.fn() calls a function of that module; named imports
+            # bind single functions of it; a default import is the module object of a CommonJS module
+            module = node_text(source_node)
+            for clause in node.named_children:
+                if clause.type != 'import_clause':
+                    continue
+                for child in clause.named_children:
+                    if child.type == 'namespace_import' and child.named_children:
+                        records.append(("bindings", {"name": node_text(child.named_children[0]), "module": module}))
+                    elif child.type == 'identifier':
+                        records.append(("bindings", {"name": node_text(child), "module": module,
+                                                     "imported": "default"}))
+                    elif child.type == 'named_imports':
+                        for specifier in child.named_children:
+                            name_node = specifier.child_by_field_name('name')
+                            alias_node = specifier.child_by_field_name('alias')
+                            if name_node is None:
+                                continue
+                            records.append(("bindings", {"name": node_text(alias_node if alias_node is not None else name_node),
+                                                         "module": module, "imported": node_text(name_node)}))
+    elif capture == 'export':
+        # Identify exported names
+        export_source = node.child_by_field_name('source')
+        if export_source:
+            records.append(("requires", {"module": node_text(export_source), "kind": "reexport"}))
+        declaration = node.child_by_field_name('declaration')
+        if declaration:
+            # Named export or default export; the "name" is the whole declaration text
+            if compact:
+                records.append(("exports", {"export_span": node_span(declaration), **located(node)}))
+            else:
+                records.append(("exports", {"export": node_text(declaration), **located(node)}))
+        else:
+            # Handle cases like "export default foo;"
+            for child in node.children:
+                if child.type == 'identifier':
+                    records.append(("exports", {"export": node_text(child), **located(node)}))
+    elif capture == 'function':
+        name_node = node.child_by_field_name('name')
+        if name_node:
+            records.append(("functions", {"function": node_text(name_node), **located(node)}))
+    elif capture == 'call':
+        function_call = node.child_by_field_name('function')
+        if function_call:
+            records.append(("function_calls", {"function": node_text(function_call), **located(node)}))
+        reference = module_reference(node)
+        if reference:
+            records.append(("requires", {"module": node_text(reference[1]), "kind": reference[0]}))
+    elif capture == 'arrow':
+        records.append(("arrow_functions", {"function": "arrow_function", **located(node)}))
+    elif capture == 'jsx':
+        records.append(("jsx_elements", {"element": "jsx_element", **located(node)}))
+    elif capture == 'binding':
+        # const m = require("x"): m.fn() calls a function of that module;
+        # const { fn, other: alias } = require("x") binds single functions of it
+        reference = module_reference(node.child_by_field_name('value'))
+        if reference and reference[0] == "require":
+            module = node_text(reference[1])
+            name_node = node.child_by_field_name('name')
+            if name_node.type == 'identifier':
+                records.append(("bindings", {"name": node_text(name_node), "module": module}))
+            elif name_node.type == 'object_pattern':
+                for child in name_node.named_children:
+                    if child.type == 'shorthand_property_identifier_pattern':
+                        records.append(("bindings", {"name": node_text(child), "module": module,
+                                                     "imported": node_text(child)}))
+                    elif child.type == 'pair_pattern':
+                        key, value = child.child_by_field_name('key'), child.child_by_field_name('value')
+                        if key.type == 'property_identifier' and value.type == 'identifier':
+                            records.append(("bindings", {"name": node_text(value), "module": module,
+                                                         "imported": node_text(key)}))
+    elif capture == 'function_variable':
+        # const fn = () => ...: a function like a declaration, named after the variable
+        name_node = node.child_by_field_name('name')
+        if name_node is not None and name_node.type == 'identifier':
+            records.append(("functions", {"function": node_text(name_node), **located(node)}))
+    elif capture == 'commonjs_export':
+        # exports.fn = function () {...}: the function is only named by the export
+        for name, value, entry in commonjs_exports(node, node_text):
+            if value is not None and value.type in _FUNCTION_TYPES and name != "default":
+                records.append(("functions", {"function": name, **located(entry)}))
+    return records
+
+
+def _extract_metadata(filepath, compact=False):
+    """Return (file_metadata, file stats) for filepath; see PipelineHooks.on_file_parsed for the stats."""
+    read_started = time.perf_counter()
+    with open(filepath, 'r') as f:
+        code = f.read()
+
+    language = language_for_file(filepath)
+    source = bytes(code, "utf8")
+    started = time.perf_counter()
+    tree = get_parser(language).parse(source)
+    parsed = time.perf_counter()
+    captures = capture_entities(tree.root_node, language)
+
+    def node_text(node):
+        return source[node.start_byte:node.end_byte].decode('utf-8')
+
+    # Lists to hold the individual items with their content
+    entities = {key: [] for key in ENTITY_LISTS}
+    # Lists several captures feed, sorted into document order below: functions come from
+    # declarations, function variables and CommonJS exports; "requires" are module
+    # specifiers outside import statements (require(), import(), export ... from) and
+    # "bindings" are names bound to a module or to a function of one
+    ordered = {"functions": [], "requires": [], "bindings": []}
+    for capture in ENTITY_CAPTURES:
+        for node in captures.get(capture, []):
+            for key, record in capture_records(capture, node, node_text, compact):
+                if key in ordered:
+                    ordered[key].append(((node.start_byte, -node.end_byte), record))
+                else:
+                    entities[key].append(record)
+    for key, entries in ordered.items():
+        entities[key] = [record for _, record in sorted(entries, key=lambda item: item[0])]
+    imports, exports, functions, function_calls, arrow_functions, jsx_elements = (
+        entities[key] for key in ENTITY_LISTS
+    )
+    requires, bindings = entities["requires"], entities["bindings"]
+
+    # Symbols always carry spans (not text) in both modes
+    symbols = collect_symbols(captures, node_text)
+
+    file_stats = {
+        "file": filepath,
+        "language": language,
+        "bytes": len(source),
+        "read_seconds": started - read_started,
+        "parse_seconds": parsed - started,
+        "extract_seconds": time.perf_counter() - parsed,
+        "nodes": tree.root_node.descendant_count,
+        "entities": {
+            "imports": len(imports),
+            "exports": len(exports),
+            "functions": len(functions),
+            "function_calls": len(function_calls),
+            "arrow_functions": len(arrow_functions),
+            "jsx_elements": len(jsx_elements),
+            "symbols": len(symbols),
+            "requires": len(requires),
+            "bindings": len(bindings),
+        },
+    }
+
+    if compact:
+        file_metadata = {
+            "file": filepath,
+            "compact": True,
+            "imports": imports,
+            "exports": exports,
+            "functions": functions,
+            "function_calls": function_calls,
+            "arrow_functions": arrow_functions,
+            "jsx_elements": jsx_elements,
+            "symbols": symbols,
+            "requires": requires,
+            "bindings": bindings,
+        }
+    else:
+        file_metadata = _full_metadata(
+            filepath, imports, exports, functions, function_calls, arrow_functions, jsx_elements, code, symbols,
+            requires, bindings,
+        )
+    return file_metadata, file_stats
+
+
+def _full_metadata(filepath, imports, exports, functions, function_calls, arrow_functions, jsx_elements, code, symbols,
+                   requires, bindings):
+    # Return metadata with separated content for each item
+    return {
+        "file": filepath,
+        "imports": imports,
+        "exports": exports,
+        "functions": functions,
+        "function_calls": function_calls,
+        "arrow_functions": arrow_functions,
+        "jsx_elements": jsx_elements,
+        "imports_content": [entry['content'] for entry in imports],
+        "exports_content": [entry['content'] for entry in exports],
+        "functions_content": [entry['content'] for entry in functions],
+        "function_calls_content": [entry['content'] for entry in function_calls],
+        "arrow_functions_content": [entry['content'] for entry in arrow_functions],
+        "jsx_content": [entry['content'] for entry in jsx_elements],
+        "code_content": code,
+        "symbols": symbols,
+        "requires": requires,
+        "bindings": bindings,
+    }
+
+
+class SourceSpans:
+    """Text access for a compact file_metadata record.
+
+    The file is read once, on the first call that needs text, and every entity
+    is sliced out of that single buffer.
+    """
+
+    def __init__(self, file_metadata, source=None):
+        self.file_metadata = file_metadata
+        self._source = source
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = read_source(self.file_metadata["file"])
+        return self._source
+
+    @property
+    def code(self):
+        return self.source.decode('utf-8')
+
+    def text(self, entry):
+        """Return the content of an entity (or the text of a raw span)."""
+        if isinstance(entry, dict):
+            if "span" not in entry:
+                return entry["content"]
+            entry = entry["span"]
+        return span_text(self.source, entry)
+
+    def export_name(self, entry):
+        if "export_span" in entry:
+            return span_text(self.source, entry["export_span"])
+        return entry["export"]
+
+    def materialize(self):
+        """Return the full (non-compact) record, as extract_metadata(filepath) would."""
+        file_metadata = self.file_metadata
+        if not file_metadata.get("compact"):
+            return file_metadata
+
+        def with_content(entries, key):
+            return [{key: entry[key], "content": self.text(entry)} for entry in entries]
+
+        exports = [
+            {"export": self.export_name(entry), "content": self.text(entry)}
+            for entry in file_metadata["exports"]
+        ]
+        return _full_metadata(
+            file_metadata["file"],
+            with_content(file_metadata["imports"], "module"),
+            exports,
+            with_content(file_metadata["functions"], "function"),
+            with_content(file_metadata["function_calls"], "function"),
+            with_content(file_metadata["arrow_functions"], "function"),
+            with_content(file_metadata["jsx_elements"], "element"),
+            self.code,
+            file_metadata.get("symbols", []),
+            file_metadata.get("requires", []),
+            file_metadata.get("bindings", []),
+        )
+
+
+def _init_worker():
+    """Drop any parsers inherited from the parent so each worker builds its own."""
+    _local.__dict__.clear()
+
+
+def iter_extracted_metadata(filepaths, workers=1, chunksize=DEFAULT_CHUNKSIZE, compact=False):
+    """Yield extract_metadata() results for filepaths, in input order.
+
+    With workers > 1 the files are parsed in a process pool and handed back to
+    the caller, which stays the single writer for the DB and JSON outputs.
+    Results come back in the same order as filepaths, so the output does not
+    depend on the worker count.
+    """
+    filepaths = list(filepaths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(filepaths) <= 1:
+        for filepath in filepaths:
+            yield extract_metadata(filepath, compact)
+        return
+
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        # imap keeps input order while workers pick up chunks as they free up.
+        # Workers hand their stats back so the counters and hooks run here.
+        extract = partial(_extract_metadata, compact=compact)
+        for file_metadata, file_stats in pool.imap(extract, filepaths, chunksize=chunksize):
+            _record_file_stats(file_stats)
+            yield file_metadata
+
+
+def walk_source_files(root_dir, skipped=None, **options):
+    """Walk root_dir and return (relative_dir, [(file_name, file_path), ...]) per directory.
+
+    Dependencies, build output and ignored, oversized or minified files are left
+    out; options go to sourcewalker.SourceWalker. Pass a list as skipped to
+    collect what was left out and why.
+    """
+    walker = SourceWalker(root_dir, **options)
+    source_dirs = walker.walk()
+    if skipped is not None:
+        skipped.extend(walker.skipped)
+    return source_dirs
@@ -1,10 +1,11 @@
 import subprocess
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from tqdm import tqdm
 import json
 import os
+from deptree import build_dependency_hierarchy, find_root_files
 def readFile(filepath):
     with open(filepath,"r",encoding="utf8") as f:
         content=f.read()
@@ -15,28 +16,13 @@ def read_dependency_data(file_path: str) -> Dict[str, List[Dict[str, str]]]:
     with open(file_path, 'r') as file:
         return json.load(file)
 
-def build_dependency_tree(metadata: Dict[str, List[Dict[str, str]]], root: str) -> Dict:
-    """Recursively build the dependency tree."""
-    tree = {root: []}
-    for dependency in metadata.get(root, []):
-        dep_name = dependency["name"]
-        tree[root].append(build_dependency_tree(metadata, dep_name))
-    return tree
+def build_dependency_tree(metadata: Dict[str, List[Dict[str, str]]], root: str, max_depth: Optional[int] = None) -> Dict:
+    """Build the dependency tree of root; shared and cyclic dependencies appear as $ref nodes (see deptree)."""
+    return build_dependency_hierarchy(metadata, [root], max_depth)
 
-def find_root_files(metadata: Dict[str, List[Dict[str, str]]]) -> List[str]:
-    """Find files that are not dependencies of any other file."""
-    all_files = set(metadata.keys())
-    dependent_files = {dep["name"] for deps in metadata.values() for dep in deps}
-    root_files = list(all_files - dependent_files)
-    return root_files
-
-def build_hierarchical_dependency_tree(metadata: Dict[str, List[Dict[str, str]]]) -> Dict:
+def build_hierarchical_dependency_tree(metadata: Dict[str, List[Dict[str, str]]], max_depth: Optional[int] = None) -> Dict:
     """Build a full hierarchical dependency tree for all root files."""
-    root_files = find_root_files(metadata)
-    tree = {}
-    for root in root_files:
-        tree.update(build_dependency_tree(metadata, root))
-    return tree
+    return build_dependency_hierarchy(metadata, max_depth=max_depth)
 
 dependency_data=readFile("./metadata/dependency_metadata_using_madge.json")
 if isinstance(dependency_data, str):
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import networkx as nx
+# Figure + the Agg canvas render without pyplot, so no display or global backend is needed
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from importresolver import ImportResolver
+from instrumentation import timed_stage
+
+LAYOUT_CACHE_NAME = 'layout_cache.json'
+
+# Past this many nodes labels are left off; they only overlap into a grey block
+MAX_LABELLED_NODES = 150
+
+
+@timed_stage("file_graph")
+def build_file_graph(metadata, root_dir=None, symbol_index=None):
+    """DiGraph of files: an edge for every import that resolves to an indexed file.
+
+    With a symbolindex.SymbolIndex, calls to functions defined in another file
+    add an edge too. Package imports (react, lodash, ...) are not nodes.
+    """
+    metadata = list(metadata)
+    resolver = ImportResolver([file_data["file"] for file_data in metadata], root_dir=root_dir)
+    G = nx.DiGraph()
+    for file_data in metadata:
+        file_name = file_data["file"]
+        G.add_node(file_name)
+        for imp in file_data.get("imports", []) + file_data.get("requires", []):
+            dependency = resolver.resolve(file_name, imp["module"])
+            if dependency and dependency != file_name:
+                G.add_edge(file_name, dependency)
+        if symbol_index is not None:
+            for func_call in file_data.get("function_calls", []):
+                definition = symbol_index.resolve(func_call["function"], file_name)
+                if definition and definition["file"] != file_name:
+                    G.add_edge(file_name, definition["file"])
+    return G
+
+
+def file_directories(files, project_structure=None):
+    """Return {file: directory} using project_structure, falling back to each file's dirname."""
+    directory_of = {
+        entry["file_path"]: relative_dir
+        for relative_dir, entries in (project_structure or {}).items()
+        for entry in entries
+    }
+    return {file_name: directory_of.get(file_name) or os.path.dirname(file_name) for file_name in files}
+
+
+def aggregate_by_directory(G, project_structure):
+    """Collapse a file graph into one node per directory of project_structure.
+
+    Nodes get a "files" count and edges a "weight" (the number of file-level
+    edges between the two directories); edges inside a directory are dropped.
+    Files missing from project_structure are grouped under their own dirname.
+    """
+    directory_of = file_directories(G.nodes, project_structure)
+    D = nx.DiGraph()
+    for file_name in G.nodes:
+        directory = directory_of[file_name]
+        if directory in D:
+            D.nodes[directory]["files"] += 1
+        else:
+            D.add_node(directory, files=1)
+    for source, target in G.edges:
+        source_dir = directory_of[source]
+        target_dir = directory_of[target]
+        if source_dir == target_dir:
+            continue
+        if D.has_edge(source_dir, target_dir):
+            D[source_dir][target_dir]["weight"] += 1
+        else:
+            D.add_edge(source_dir, target_dir, weight=1)
+    return D
+
+
+def focus_subgraph(G, node, hops=1):
+    """The nodes within hops edges of node, in either direction, and the edges between them."""
+    return nx.ego_graph(G, node, radius=hops, undirected=True)
+
+
+def _graph_key(G):
+    digest = hashlib.sha1()
+    for node in sorted(G.nodes):
+        digest.update(node.encode('utf-8') + b'\0')
+    digest.update(b'\1')
+    for source, target in sorted(G.edges):
+        digest.update(source.encode('utf-8') + b'\0' + target.encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+def compute_layout(G, cache_path=None, seed=42):
+    """Return {node: (x, y)} for G, reusing a layout cached for the same nodes and edges.
+
+    The cache is a JSON file keyed by a hash of the graph, so re-rendering an
+    unchanged graph (or one rendered before, e.g. a focus view) skips the layout.
+    """
+    key = _graph_key(G)
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        if key in cache:
+            return {node: tuple(xy) for node, xy in cache[key].items()}
+
+    if G.number_of_nodes() == 0:
+        pos = {}
+    else:
+        # Spring layout is O(n^2) per iteration; fewer iterations keep big graphs bearable
+        iterations = 50 if G.number_of_nodes() <= 500 else 15
+        pos = nx.spring_layout(G, seed=seed, iterations=iterations, weight="weight")
+
+    if cache_path:
+        cache[key] = {node: [float(x), float(y)] for node, (x, y) in pos.items()}
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f)
+    return {node: tuple(xy) for node, xy in pos.items()}
+
+
+def _label(node):
+    return os.path.basename(node.rstrip('/\\')) or node
+
+
+@timed_stage("render_graph")
+def render_graph(G, output_path, pos=None, title=None, cache_path=None, highlight=None):
+    """Draw G to output_path; the format (svg, png, pdf) comes from the extension.
+
+    Node size follows the "files" attribute of directory graphs, edge width the
+    "weight" attribute. highlight is a node to draw in a different colour (the
+    focus of a focus_subgraph view).
+    """
+    if pos is None:
+        pos = compute_layout(G, cache_path)
+    size = min(40, 8 + G.number_of_nodes() ** 0.5)
+    fig = Figure(figsize=(size, size))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_axis_off()
+    if title:
+        ax.set_title(title)
+
+    node_sizes = [300 + 100 * G.nodes[node].get("files", 1) ** 0.5 for node in G.nodes]
+    node_colors = ["orange" if node == highlight else "skyblue" for node in G.nodes]
+    widths = [0.5 + G[source][target].get("weight", 1) ** 0.5 for source, target in G.edges]
+    nx.draw_networkx_nodes(G, pos, ax=ax, node_size=node_sizes, node_color=node_colors)
+    nx.draw_networkx_edges(G, pos, ax=ax, width=widths, alpha=0.5, arrows=True)
+    if G.number_of_nodes() <= MAX_LABELLED_NODES:
+        nx.draw_networkx_labels(G, pos, ax=ax, labels={node: _label(node) for node in G.nodes}, font_size=8)
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fig.savefig(output_path, bbox_inches="tight")
+    return output_path
@@ -0,0 +1,107 @@
+import json
+import os
+import subprocess
+import sys
+from importresolver import ImportResolver
+from instrumentation import timed_stage
+
+# Written next to the other dependency outputs; same {file: [deps]} shape madge --json prints
+IMPORT_GRAPH_NAME = 'dependency_graph.json'
+
+
+def module_specifiers(file_metadata):
+    """Every module specifier a file record refers to: import statements, require(), import(), re-exports."""
+    for entry in file_metadata.get("imports", []):
+        yield entry["module"]
+    for entry in file_metadata.get("requires", []):
+        yield entry["module"]
+
+
+def _relative(filepath, root_dir):
+    return os.path.relpath(filepath, root_dir).replace(os.sep, '/')
+
+
+@timed_stage("import_graph")
+def build_import_graph(metadata, root_dir, resolver=None):
+    """Return {file: [files it depends on]} for the extracted metadata of root_dir.
+
+    Matches the output of `madge --json root_dir`: paths are relative to
+    root_dir with forward slashes, only files of the codebase appear (packages
+    and unresolvable specifiers are dropped), every indexed file is a key, and
+    keys and dependency lists are sorted.
+    """
+    metadata = list(metadata)
+    if resolver is None:
+        resolver = ImportResolver([file_data["file"] for file_data in metadata], root_dir=root_dir)
+    graph = {}
+    for file_data in metadata:
+        graph[_relative(file_data["file"], root_dir)] = file_dependencies(file_data, root_dir, resolver)
+    return dict(sorted(graph.items()))
+
+
+def file_dependencies(file_metadata, root_dir, resolver):
+    """Sorted root-relative paths of the codebase files one file record depends on."""
+    filepath = file_metadata["file"]
+    dependencies = set()
+    for module in module_specifiers(file_metadata):
+        resolved = resolver.resolve(filepath, module)
+        if resolved and resolved != filepath:
+            dependencies.add(_relative(resolved, root_dir))
+    return sorted(dependencies)
+
+
+def run_madge(root_dir, madge_cli, extensions=None):
+    """Run madge on root_dir and return its --json output, for compare_with_madge()."""
+    command = ["node", str(madge_cli), "--json"]
+    if extensions:
+        command += ["--extensions", ",".join(extensions)]
+    result = subprocess.run(command + [root_dir], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def compare_with_madge(graph, madge_graph):
+    """Return the differences between build_import_graph() and madge output (empty lists when they agree)."""
+    report = {
+        "missing_files": sorted(set(madge_graph) - set(graph)),
+        "extra_files": sorted(set(graph) - set(madge_graph)),
+        "missing_edges": {},
+        "extra_edges": {},
+    }
+    for filepath in sorted(set(graph) & set(madge_graph)):
+        ours, theirs = set(graph[filepath]), set(madge_graph[filepath])
+        if theirs - ours:
+            report["missing_edges"][filepath] = sorted(theirs - ours)
+        if ours - theirs:
+            report["extra_edges"][filepath] = sorted(ours - theirs)
+    return report
+
+
+def is_compatible(report, ignore_extra_files=True):
+    """True when the graphs agree on every file madge reports.
+
+    Files madge did not visit (other extensions, excluded directories) are
+    ignored unless ignore_extra_files is False.
+    """
+    return not (
+        report["missing_files"] or report["missing_edges"] or report["extra_edges"]
+        or (report["extra_files"] and not ignore_extra_files)
+    )
+
+
+if __name__ == "__main__":
+    # python importgraph.py <root_dir> <madge.json | path/to/madge/bin/cli.js>
+    # Compatibility check: extract root_dir, build the graph and diff it against madge.
+    from extractor import iter_extracted_metadata, walk_source_files
+
+    root_dir, madge_source = sys.argv[1], sys.argv[2]
+    filepaths = [filepath for _, files in walk_source_files(root_dir) for _, filepath in files]
+    graph = build_import_graph(iter_extracted_metadata(filepaths, workers=os.cpu_count(), compact=True), root_dir)
+    if madge_source.endswith('.json'):
+        with open(madge_source, 'r') as f:
+            madge_graph = json.load(f)
+    else:
+        madge_graph = run_madge(root_dir, madge_source, extensions=["js", "jsx", "ts", "tsx"])
+    report = compare_with_madge(graph, madge_graph)
+    print(json.dumps(report, indent=4))
+    print("compatible" if is_compatible(report) else "differences found")
+    sys.exit(0 if is_compatible(report) else 1)
@@ -0,0 +1,100 @@
+import json
+import os
+import re
+
+# Probed in this order for extensionless imports, both as "<path><ext>" and "<path>/index<ext>"
+RESOLVE_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx')
+
+
+def path_key(path):
+    """Normalize a path for lookups, whichever separator the metadata was written with."""
+    return os.path.normcase(os.path.normpath(path.replace('\\', '/')))
+
+
+def _load_jsonc(path):
+    """Load a tsconfig-style JSON file, which may contain comments and trailing commas."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    # Drop // and /* */ comments but leave string contents (e.g. "src/*") alone
+    text = re.sub(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', lambda m: m.group(1) or '', text, flags=re.S)
+    text = re.sub(r',(\s*[}\]])', r'\1', text)
+    return json.loads(text)
+
+
+class ImportResolver:
+    """Maps import specifiers to files of the indexed codebase with dict lookups.
+
+    Built once per run from the list of indexed file paths. Resolution tries the
+    specifier as written, then with each of RESOLVE_EXTENSIONS, then as a
+    directory with an index file; bare specifiers go through tsconfig
+    "paths"/"baseUrl" when root_dir has a tsconfig.json (or jsconfig.json).
+    Anything else (packages, assets) resolves to None.
+    """
+
+    def __init__(self, files, root_dir=None, tsconfig_path=None):
+        self.files = {path_key(filepath): filepath for filepath in files}
+        self.base_url = None
+        self.exact_aliases = {}
+        self.wildcard_aliases = []
+        if tsconfig_path is None and root_dir is not None:
+            for name in ('tsconfig.json', 'jsconfig.json'):
+                candidate = os.path.join(root_dir, name)
+                if os.path.exists(candidate):
+                    tsconfig_path = candidate
+                    break
+        if tsconfig_path:
+            self._load_tsconfig(tsconfig_path)
+
+    def _load_tsconfig(self, tsconfig_path):
+        options = _load_jsonc(tsconfig_path).get('compilerOptions', {})
+        config_dir = os.path.dirname(tsconfig_path)
+        if 'baseUrl' in options:
+            self.base_url = os.path.join(config_dir, options['baseUrl'])
+        # "paths" targets are relative to baseUrl, or to the tsconfig directory without one
+        paths_base = self.base_url or config_dir
+        for pattern, targets in options.get('paths', {}).items():
+            targets = [os.path.join(paths_base, target) for target in targets]
+            if '*' in pattern:
+                prefix, suffix = pattern.split('*', 1)
+                self.wildcard_aliases.append((prefix, suffix, targets))
+            else:
+                self.exact_aliases[pattern] = targets
+        # Like TypeScript, prefer the pattern with the longest matching prefix
+        self.wildcard_aliases.sort(key=lambda alias: len(alias[0]), reverse=True)
+
+    def _probe(self, candidate):
+        key = path_key(candidate)
+        found = self.files.get(key)
+        if found:
+            return found
+        for extension in RESOLVE_EXTENSIONS:
+            found = self.files.get(key + extension)
+            if found:
+                return found
+        for extension in RESOLVE_EXTENSIONS:
+            found = self.files.get(os.path.join(key, 'index' + extension))
+            if found:
+                return found
+        return None
+
+    def _alias_targets(self, module):
+        if module in self.exact_aliases:
+            return self.exact_aliases[module]
+        for prefix, suffix, targets in self.wildcard_aliases:
+            if module.startswith(prefix) and module.endswith(suffix) and len(module) >= len(prefix) + len(suffix):
+                matched = module[len(prefix):len(module) - len(suffix)]
+                return [target.replace('*', matched, 1) for target in targets]
+        return []
+
+    def resolve(self, importer, module):
+        """Return the indexed file that `module` (as written in `importer`) refers to, or None."""
+        module = module.strip("'\"`")
+        if module.startswith('.'):
+            return self._probe(os.path.join(os.path.dirname(importer.replace('\\', '/')), module))
+        for target in self._alias_targets(module):
+            found = self._probe(target)
+            if found:
+                return found
+        if self.base_url:
+            return self._probe(os.path.join(self.base_url, module))
+        return None
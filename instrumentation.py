@@ -0,0 +1,226 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class PipelineHooks:
+    """Receives instrumentation events from the indexing pipeline.
+
+    Subclass and override the events you care about, then register an instance
+    with add_hook(). Events are delivered in the process that writes the index,
+    including for files parsed in pool workers.
+    """
+
+    def on_file_parsed(self, stats):
+        """stats: {"file", "language", "bytes", "read_seconds", "parse_seconds",
+        "extract_seconds", "nodes", "entities": {kind: count}} for one file."""
+
+    def on_db_flush(self, rows, seconds):
+        """A BulkWriter batch of rows was written and committed in seconds."""
+
+    def on_stage(self, name, seconds):
+        """A pipeline stage (graph build, JSON output, ...) finished."""
+
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    with _hooks_lock:
+        _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def emit(event, *args):
+    """Call event (e.g. "on_db_flush") on every registered hook."""
+    for hook in list(_hooks):
+        getattr(hook, event)(*args)
+
+
+@contextmanager
+def stage(name):
+    """Time the with-block and report it as an on_stage event."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit("on_stage", name, time.perf_counter() - started)
+
+
+def timed_stage(name):
+    """Decorator form of stage()."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsCollector(PipelineHooks):
+    """Default hook: aggregates every event into counters.
+
+    Export with to_dict()/to_prometheus(), or write() to a .json or
+    .prom/.txt file. keep_slowest keeps that many of the slowest files
+    (by parse + extract time) for the JSON output.
+    """
+
+    def __init__(self, keep_slowest=20):
+        self.lock = threading.Lock()
+        self.keep_slowest = keep_slowest
+        self.languages = {}
+        self.entities = {}
+        self.slowest_files = []
+        self.db = {"flushes": 0, "rows": 0, "seconds": 0.0, "max_seconds": 0.0}
+        self.stages = {}
+
+    def on_file_parsed(self, stats):
+        with self.lock:
+            language = self.languages.setdefault(stats["language"], {
+                "files": 0, "bytes": 0, "nodes": 0,
+                "read_seconds": 0.0, "parse_seconds": 0.0, "extract_seconds": 0.0,
+            })
+            language["files"] += 1
+            for key in ("bytes", "nodes", "read_seconds", "parse_seconds", "extract_seconds"):
+                language[key] += stats[key]
+            for kind, count in stats["entities"].items():
+                self.entities[kind] = self.entities.get(kind, 0) + count
+            if self.keep_slowest:
+                seconds = stats["parse_seconds"] + stats["extract_seconds"]
+                self.slowest_files.append((seconds, stats))
+                if len(self.slowest_files) > 2 * self.keep_slowest:
+                    self.slowest_files.sort(key=lambda item: item[0], reverse=True)
+                    del self.slowest_files[self.keep_slowest:]
+
+    def on_db_flush(self, rows, seconds):
+        with self.lock:
+            self.db["flushes"] += 1
+            self.db["rows"] += rows
+            self.db["seconds"] += seconds
+            self.db["max_seconds"] = max(self.db["max_seconds"], seconds)
+
+    def on_stage(self, name, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "last_seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["last_seconds"] = seconds
+
+    def to_dict(self):
+        with self.lock:
+            slowest = sorted(self.slowest_files, key=lambda item: item[0], reverse=True)[:self.keep_slowest]
+            return {
+                "languages": {name: dict(values) for name, values in self.languages.items()},
+                "entities": dict(self.entities),
+                "db": dict(self.db),
+                "stages": {name: dict(values) for name, values in self.stages.items()},
+                "slowest_files": [stats for _, stats in slowest],
+            }
+
+    def to_prometheus(self, prefix="treesitter"):
+        """Render the counters in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+        languages = data["languages"]
+        metric("files_parsed_total", "counter", "Files parsed.",
+               [({"language": name}, values["files"]) for name, values in languages.items()])
+        metric("bytes_read_total", "counter", "Source bytes read.",
+               [({"language": name}, values["bytes"]) for name, values in languages.items()])
+        metric("ast_nodes_total", "counter", "Syntax tree nodes produced by the parser.",
+               [({"language": name}, values["nodes"]) for name, values in languages.items()])
+        for phase in ("read", "parse", "extract"):
+            metric(f"{phase}_seconds_total", "counter", f"Time spent in the {phase} step of extraction.",
+                   [({"language": name}, values[f"{phase}_seconds"]) for name, values in languages.items()])
+        metric("entities_total", "counter", "Entities extracted, by kind.",
+               [({"kind": kind}, count) for kind, count in data["entities"].items()])
+        metric("db_flushes_total", "counter", "BulkWriter batches committed.", [({}, data["db"]["flushes"])])
+        metric("db_rows_total", "counter", "Rows written by BulkWriter batches.", [({}, data["db"]["rows"])])
+        metric("db_flush_seconds_total", "counter", "Time spent writing and committing batches.",
+               [({}, data["db"]["seconds"])])
+        metric("db_flush_seconds_max", "gauge", "Slowest single batch.", [({}, data["db"]["max_seconds"])])
+        metric("stage_seconds_total", "counter", "Time spent in each pipeline stage.",
+               [({"stage": name}, values["seconds"]) for name, values in data["stages"].items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics as JSON, or as Prometheus text for .prom/.txt paths."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            if path.endswith(('.prom', '.txt')):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=4)
+        return path
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@contextmanager
+def profiling(output_dir, cpu=True, memory=True, top=30):
+    """Profile the with-block into output_dir.
+
+    cpu writes profile.prof (load with pstats or snakeviz) plus a cumulative-time
+    summary in profile.txt; memory runs tracemalloc and writes the top allocation
+    sites to memory.txt. Both slow the run down noticeably, so they are opt-in.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = cProfile.Profile() if cpu else None
+    started_tracemalloc = memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(output_dir, 'profile.prof'))
+            with open(os.path.join(output_dir, 'profile.txt'), 'w') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(top)
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            with open(os.path.join(output_dir, 'memory.txt'), 'w') as f:
+                f.write(f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n")
+                for statistic in snapshot.statistics('lineno')[:top]:
+                    f.write(f"{statistic}\n")
+
+
+def profile_option(function):
+    """Give function a profile=<output dir> keyword that runs it under profiling()."""
+    @functools.wraps(function)
+    def wrapper(*args, profile=None, **kwargs):
+        if not profile:
+            return function(*args, **kwargs)
+        with profiling(profile):
+            return function(*args, **kwargs)
+    return wrapper
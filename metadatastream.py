@@ -0,0 +1,102 @@
+import json
+import os
+
+COMBINED_JSONL_NAME = 'combined_metadata.jsonl'
+
+# The subset of a file record the dependency/graph code in appmain actually reads
+GRAPH_FIELDS = ("file", "imports", "function_calls", "symbols", "requires")
+
+
+class JsonlWriter:
+    """Append-only writer for one compact JSON record per line.
+
+    Every record is flushed as soon as it is written, so an interrupted run
+    leaves all finished files on disk. append=True continues an existing file,
+    dropping a half-written last line first.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if append:
+            _drop_partial_line(path)
+        self.f = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record):
+        self.f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _drop_partial_line(path):
+    """Cut a trailing line that has no newline (a write interrupted mid-record)."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+def _project(record, fields):
+    if fields is None:
+        return record
+    return {key: record[key] for key in fields if key in record}
+
+
+def iter_jsonl(path, fields=None):
+    """Yield the records of a JSONL file one at a time.
+
+    fields keeps only those keys of each record (e.g. GRAPH_FIELDS), so callers
+    that need a few keys never hold the entity text. A truncated last line from
+    an interrupted run is skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            yield _project(json.loads(line), fields)
+
+
+class JsonlReader:
+    """Lookup of JSONL records by their "file" key without keeping them in memory.
+
+    One pass over the file records the byte offset of each record; a lookup then
+    seeks straight to it. If a file appears twice the later record wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self.offsets[json.loads(line)["file"]] = offset
+                offset += len(line)
+
+    def __contains__(self, filepath):
+        return filepath in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, filepath):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[filepath])
+            return json.loads(f.readline())
+
+    def files(self):
+        return list(self.offsets)
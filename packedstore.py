@@ -0,0 +1,148 @@
+import json
+import mmap
+import os
+import struct
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; records fall back to compact JSON
+    msgpack = None
+
+PACK_NAME = 'metadata.pack'
+
+# Each record is a 4-byte big-endian length followed by that many payload bytes
+_LENGTH = struct.Struct('>I')
+
+
+def _encode(record, codec):
+    if codec == 'msgpack':
+        return msgpack.packb(record, use_bin_type=True)
+    return json.dumps(record, separators=(',', ':')).encode('utf-8')
+
+
+def _decode(payload, codec):
+    if codec == 'msgpack':
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def _index_path(pack_path):
+    return pack_path + '.idx'
+
+
+class PackedStoreWriter:
+    """Append-only store of per-file metadata records in a single data file.
+
+    Records are length-prefixed and encoded with msgpack (or JSON if msgpack is
+    not installed). A sidecar "<pack>.idx" JSON file maps each source path to
+    the offset and length of its latest record; it is rewritten on close().
+    Re-adding a path appends a new record and repoints the index; the old bytes
+    stay behind until compact_store() is called.
+    """
+
+    def __init__(self, pack_path, append=True):
+        self.pack_path = pack_path
+        directory = os.path.dirname(pack_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.codec = 'msgpack' if msgpack else 'json'
+        self.offsets = {}
+        if append and os.path.exists(pack_path) and os.path.exists(_index_path(pack_path)):
+            index = _read_index(pack_path)
+            # Keep writing in the codec the existing file was written with
+            self.codec = index["codec"]
+            self.offsets = index["files"]
+            self.f = open(pack_path, 'ab')
+            # Drop anything written after the last index save (an interrupted run)
+            self.f.truncate(index["size"])
+            self.f.seek(index["size"])
+        else:
+            self.f = open(pack_path, 'wb')
+
+    def add(self, filepath, record):
+        payload = _encode(record, self.codec)
+        offset = self.f.tell()
+        self.f.write(_LENGTH.pack(len(payload)))
+        self.f.write(payload)
+        self.offsets[filepath] = [offset, len(payload)]
+
+    def remove(self, filepath):
+        self.offsets.pop(filepath, None)
+
+    def close(self):
+        self.f.flush()
+        size = self.f.tell()
+        self.f.close()
+        tmp_path = _index_path(self.pack_path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"codec": self.codec, "size": size, "files": self.offsets}, f)
+        os.replace(tmp_path, _index_path(self.pack_path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _read_index(pack_path):
+    with open(_index_path(pack_path), 'r') as f:
+        return json.load(f)
+
+
+class PackedStoreReader:
+    """Memory-mapped reader: get(filepath) decodes only that file's record."""
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        index = _read_index(pack_path)
+        self.codec = index["codec"]
+        self.offsets = index["files"]
+        self.f = open(pack_path, 'rb')
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) if index["size"] else None
+
+    def __contains__(self, filepath):
+        return filepath in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def files(self):
+        return list(self.offsets)
+
+    def get(self, filepath, default=None):
+        location = self.offsets.get(filepath)
+        if location is None:
+            return default
+        offset, length = location
+        start = offset + _LENGTH.size
+        return _decode(self.mm[start:start + length], self.codec)
+
+    def __getitem__(self, filepath):
+        if filepath not in self.offsets:
+            raise KeyError(filepath)
+        return self.get(filepath)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def compact_store(pack_path):
+    """Rewrite the store keeping only the records the index points to."""
+    tmp_path = pack_path + '.compact'
+    with PackedStoreReader(pack_path) as reader, PackedStoreWriter(tmp_path, append=False) as writer:
+        writer.codec = reader.codec
+        for filepath in reader.files():
+            writer.add(filepath, reader.get(filepath))
+    os.replace(tmp_path, pack_path)
+    os.replace(_index_path(tmp_path), _index_path(pack_path))
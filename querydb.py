@@ -0,0 +1,211 @@
+import sqlite3
+import sys
+import time
+from db.createdb import connect_db, DB_PATH, setUpDataBase, BulkWriter
+from blobstore import load_blob
+
+# Every query here is written so SQLite can answer it from one of the indexes
+# created by createdb.SCHEMA_MIGRATIONS instead of scanning metadata; text
+# search goes through the metadata_fts full-text index.
+
+ENTITY_COLUMNS = "m.id, m.name, m.type, f.filepath"
+
+
+def _rows(cursor):
+    return [
+        {"id": row[0], "name": row[1], "type": row[2], "filepath": row[3]}
+        for row in cursor.fetchall()
+    ]
+
+
+def find_symbol(conn, name, type='function_declaration'):
+    """Return the entities called name of the given type (any type if type is None)."""
+    if type is None:
+        cursor = conn.execute(f'''
+            SELECT {ENTITY_COLUMNS} FROM metadata m JOIN files f ON m.fileId = f.id
+            WHERE m.name = ?
+        ''', (name,))
+    else:
+        cursor = conn.execute(f'''
+            SELECT {ENTITY_COLUMNS} FROM metadata m JOIN files f ON m.fileId = f.id
+            WHERE m.name = ? AND m.type = ?
+        ''', (name, type))
+    return _rows(cursor)
+
+
+def get_file_entities(conn, filepath, type=None):
+    """Return the entities extracted from filepath, optionally only those of one type."""
+    if type is None:
+        cursor = conn.execute(f'''
+            SELECT {ENTITY_COLUMNS} FROM files f JOIN metadata m ON m.fileId = f.id
+            WHERE f.filepath = ?
+            ORDER BY m.id
+        ''', (filepath,))
+    else:
+        cursor = conn.execute(f'''
+            SELECT {ENTITY_COLUMNS} FROM files f JOIN metadata m ON m.fileId = f.id
+            WHERE f.filepath = ? AND m.type = ?
+            ORDER BY m.id
+        ''', (filepath, type))
+    return _rows(cursor)
+
+
+def find_call_sites(conn, name):
+    """Return every function_call entity whose callee text is name."""
+    return find_symbol(conn, name, 'function_call')
+
+
+def get_callees(conn, metadata_id):
+    """Return the entities that metadata_id references (referencesTable id1 -> id2)."""
+    cursor = conn.execute(f'''
+        SELECT {ENTITY_COLUMNS} FROM referencesTable r
+        JOIN metadata m ON m.id = r.id2
+        JOIN files f ON m.fileId = f.id
+        WHERE r.id1 = ?
+    ''', (metadata_id,))
+    return _rows(cursor)
+
+
+def get_callers(conn, metadata_id):
+    """Return the entities that reference metadata_id (referencesTable id2 -> id1)."""
+    cursor = conn.execute(f'''
+        SELECT {ENTITY_COLUMNS} FROM referencesTable r
+        JOIN metadata m ON m.id = r.id1
+        JOIN files f ON m.fileId = f.id
+        WHERE r.id2 = ?
+    ''', (metadata_id,))
+    return _rows(cursor)
+
+
+def get_file_code(conn, filepath):
+    """Return the source text stored for filepath, or None if it is not indexed."""
+    row = conn.execute('SELECT blobhash FROM files WHERE filepath = ?', (filepath,)).fetchone()
+    if row is None or row[0] is None:
+        return None
+    return load_blob(conn, row[0])
+
+
+def find_definition(conn, name):
+    """Return where name is declared or exported, from the symbols table (exported first)."""
+    cursor = conn.execute('''
+        SELECT s.name, s.kind, s.exported, f.filepath, s.start_row, s.start_col, s.end_row, s.end_col
+        FROM symbols s JOIN files f ON s.fileId = f.id
+        WHERE s.name = ?
+        ORDER BY s.exported DESC, s.id
+    ''', (name,))
+    return [
+        {"name": row[0], "kind": row[1], "exported": bool(row[2]), "filepath": row[3], "range": list(row[4:])}
+        for row in cursor.fetchall()
+    ]
+
+
+# bm25 weights of the metadata_fts columns: a hit in an entity's name ranks above one in its code
+SEARCH_WEIGHTS = (10.0, 1.0)
+
+
+def _fts_phrase(text):
+    # Quote the text as one FTS5 phrase so operators and punctuation in it are matched literally
+    return '"' + text.replace('"', '""') + '"'
+
+
+def search_code(conn, text, type=None, limit=20, names_only=False):
+    """Return entities whose name or code contains text, best match first.
+
+    Answered from the metadata_fts trigram index; each hit is
+    {"id", "name", "type", "filepath", "score", "snippet"} where a lower score
+    is a better bm25 match and snippet shows the text around the first hit.
+    Texts shorter than 3 characters have no trigrams, so they fall back to a
+    LIKE scan of metadata (unranked).
+    """
+    if len(text) < 3:
+        return _search_like(conn, text, type, limit, names_only)
+    match = ('name : ' if names_only else '') + _fts_phrase(text)
+    type_filter = 'AND m.type = ?' if type is not None else ''
+    cursor = conn.execute(f'''
+        SELECT {ENTITY_COLUMNS}, bm25(metadata_fts, ?, ?) AS score,
+               snippet(metadata_fts, -1, '[', ']', '...', 16)
+        FROM metadata_fts
+        JOIN metadata m ON m.id = metadata_fts.rowid
+        JOIN files f ON m.fileId = f.id
+        WHERE metadata_fts MATCH ? {type_filter}
+        ORDER BY score
+        LIMIT ?
+    ''', (*SEARCH_WEIGHTS, match, *((type,) if type is not None else ()), limit))
+    return [
+        {"id": row[0], "name": row[1], "type": row[2], "filepath": row[3], "score": row[4], "snippet": row[5]}
+        for row in cursor.fetchall()
+    ]
+
+
+def _search_like(conn, text, type, limit, names_only):
+    pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    where = "m.name LIKE ? ESCAPE '\\'"
+    params = [pattern]
+    if not names_only:
+        where = f"({where} OR m.codecontent LIKE ? ESCAPE '\\')"
+        params.append(pattern)
+    if type is not None:
+        where += ' AND m.type = ?'
+        params.append(type)
+    cursor = conn.execute(f'''
+        SELECT {ENTITY_COLUMNS} FROM metadata m JOIN files f ON m.fileId = f.id
+        WHERE {where}
+        LIMIT ?
+    ''', (*params, limit))
+    return [{**row, "score": None, "snippet": None} for row in _rows(cursor)]
+
+
+def benchmark(db_path, rows=1_000_000, lookups=1000):
+    """Fill db_path with synthetic rows and time each query; returns {query: ms per call}."""
+    setUpDataBase(db_path)
+    conn = connect_db(db_path, bulk_load=True)
+    files = max(1, rows // 50)
+    with BulkWriter(conn, batch_size=50_000) as writer:
+        for i in range(files):
+            file_id = writer.add_file(f"file{i}.js", f"src/file{i}.js", ".js")
+            for j in range(rows // files):
+                kind = ('function_declaration', 'function_call', 'import_statement')[j % 3]
+                name = f"fn{(i * 7 + j) % (rows // 10)}"
+                writer.add_metadata(file_id, name, kind, f"{name}(arg{j});")
+        # Link each call to a declaration so the reference lookups have something to find
+        for k in range(1, rows, 3):
+            writer.add_reference(k + 1, k)
+    conn.execute('ANALYZE')
+
+    timings = {}
+    queries = {
+        "find_symbol": lambda i: find_symbol(conn, f"fn{i}"),
+        "get_file_entities": lambda i: get_file_entities(conn, f"src/file{i % files}.js"),
+        "find_call_sites": lambda i: find_call_sites(conn, f"fn{i}"),
+        "get_callees": lambda i: get_callees(conn, i * 3 + 2),
+        "get_callers": lambda i: get_callers(conn, i * 3 + 1),
+        "search_code": lambda i: search_code(conn, f"fn{i}(", limit=10),
+    }
+    for label, query in queries.items():
+        start = time.perf_counter()
+        for i in range(lookups):
+            query(i)
+        timings[label] = (time.perf_counter() - start) * 1000 / lookups
+    conn.close()
+    return timings
+
+
+if __name__ == "__main__":
+    # python querydb.py bench [rows] [db_path]
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+        db_path = sys.argv[3] if len(sys.argv) > 3 else "querybench.db"
+        for label, ms in benchmark(db_path, rows).items():
+            print(f"{label}: {ms:.3f} ms")
+    elif len(sys.argv) > 2 and sys.argv[1] == "search":
+        # python querydb.py search <text> [type]
+        conn = connect_db(DB_PATH)
+        for hit in search_code(conn, sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None):
+            print(f"{hit['filepath']}  {hit['type']}  {hit['name']}  {hit['snippet'] or ''}")
+        conn.close()
+    else:
+        conn = connect_db(DB_PATH)
+        for name in sys.argv[1:]:
+            for entity in find_symbol(conn, name, None):
+                print(entity)
+        conn.close()
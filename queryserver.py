@@ -0,0 +1,420 @@
+import argparse
+import gc
+import http.client
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+from urllib.request import pathname2url
+
+from db.createdb import DB_PATH
+from depgraph import DependencyGraph
+from deptree import build_dependency_hierarchy
+from importresolver import path_key
+from querydb import find_symbol, get_callers, search_code
+from symbolindex import load_symbol_index
+
+DEFAULT_PORT = 8765
+
+
+class QueryError(Exception):
+    """A request the index cannot answer; status is the HTTP status to reply with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def connect_read_only(db_path):
+    """Open db_path read-only; the connection may be used from any thread (one at a time)."""
+    uri = 'file:' + pathname2url(os.path.abspath(db_path)) + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute('PRAGMA query_only=ON')
+    conn.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+    return conn
+
+
+class IndexSnapshot:
+    """What the server keeps in memory: import graph, its transitive closure and the symbol index.
+
+    Built once from the DB and never modified, so request threads read it
+    without locks; QueryIndex.reload() swaps in a new one.
+    """
+
+    def __init__(self, conn):
+        self.files = [row[0] for row in conn.execute('SELECT filepath FROM files ORDER BY filepath')]
+        self.paths = {path_key(filepath): filepath for filepath in self.files}
+        graph = {filepath: [] for filepath in self.files}
+        dependents = {filepath: [] for filepath in self.files}
+        cursor = conn.execute('''
+            SELECT f.filepath, g.filepath FROM fileimports i
+            JOIN files f ON f.id = i.fileId
+            JOIN files g ON g.id = i.importedFileId
+            ORDER BY f.filepath, g.filepath
+        ''')
+        for importer, imported in cursor:
+            graph[importer].append(imported)
+            dependents[imported].append(importer)
+        for importers in dependents.values():
+            importers.sort()
+        self.graph = graph
+        self.dependents = dependents
+        self.dependency_graph = DependencyGraph(self.files, graph)
+        self.symbol_index = load_symbol_index(conn)
+        self.hierarchies = OrderedDict()  # (file, max_depth) -> tree, least recently used first
+        self.hierarchies_lock = threading.Lock()
+        self.loaded_at = time.time()
+
+
+class QueryIndex:
+    """Answers dependency, symbol, hierarchy and search queries for one index DB.
+
+    Graph and symbol queries are served from an IndexSnapshot loaded once;
+    caller and text-search queries run on a pool of read-only connections
+    (pool_size of them, shared by all request threads). Up to hierarchy_cache
+    hierarchy trees are kept, since building one walks everything below its
+    root.
+    """
+
+    def __init__(self, db_path=DB_PATH, pool_size=8, hierarchy_cache=256):
+        self.db_path = db_path
+        self.hierarchy_cache = hierarchy_cache
+        self.pool = queue.Queue()
+        for _ in range(pool_size):
+            self.pool.put(connect_read_only(db_path))
+        self.snapshot = None
+        self.reload()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the with-block."""
+        conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    def reload(self):
+        """Re-read the DB, e.g. after an index run; requests in flight finish on the old snapshot."""
+        with self.connection() as conn:
+            snapshot = IndexSnapshot(conn)
+        gc.unfreeze()
+        self.snapshot = snapshot
+        # The snapshot lives until the next reload: move it out of the collector's reach, or
+        # every full collection walks all of its objects and stalls whichever request triggered it
+        gc.collect()
+        gc.freeze()
+        return self.stats()
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get().close()
+
+    def _file(self, snapshot, filepath):
+        if not filepath:
+            raise QueryError(400, "missing parameter: file")
+        found = snapshot.paths.get(path_key(filepath))
+        if found is None:
+            raise QueryError(404, f"file not indexed: {filepath}")
+        return found
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "db": self.db_path,
+            "files": len(snapshot.files),
+            "import_edges": sum(len(deps) for deps in snapshot.graph.values()),
+            "symbols": len(snapshot.symbol_index),
+            "loaded_at": snapshot.loaded_at,
+        }
+
+    def dependencies(self, filepath, transitive=False):
+        """Files filepath imports and files importing it; transitive adds everything it depends on."""
+        snapshot = self.snapshot
+        filepath = self._file(snapshot, filepath)
+        result = {
+            "file": filepath,
+            "dependencies": snapshot.graph[filepath],
+            "dependents": snapshot.dependents[filepath],
+        }
+        if transitive:
+            result["transitive_dependencies"] = snapshot.dependency_graph.transitive_dependencies(filepath)
+            result["in_cycle"] = snapshot.dependency_graph.in_cycle(filepath)
+        return result
+
+    def symbol(self, name, filepath=None):
+        """Every definition of name; with filepath, also the one a call from that file resolves to."""
+        if not name:
+            raise QueryError(400, "missing parameter: name")
+        snapshot = self.snapshot
+        result = {"name": name, "definitions": snapshot.symbol_index.lookup(name)}
+        if filepath:
+            result["resolved"] = snapshot.symbol_index.resolve(name, self._file(snapshot, filepath))
+        return result
+
+    def callers(self, name):
+        """The function declarations called name, each with the call sites resolved to it."""
+        if not name:
+            raise QueryError(400, "missing parameter: name")
+        with self.connection() as conn:
+            definitions = find_symbol(conn, name)
+            for definition in definitions:
+                definition["callers"] = get_callers(conn, definition["id"])
+        return {"name": name, "definitions": definitions}
+
+    def hierarchy(self, filepath, max_depth=None):
+        """The dependency tree below filepath, in the build_dependency_hierarchy() node format."""
+        snapshot = self.snapshot
+        filepath = self._file(snapshot, filepath)
+        key = (filepath, max_depth)
+        with snapshot.hierarchies_lock:
+            tree = snapshot.hierarchies.get(key)
+            if tree is not None:
+                snapshot.hierarchies.move_to_end(key)
+                return tree
+        # Built outside the lock; two threads asking for the same tree at once both build it
+        tree = build_dependency_hierarchy(snapshot.graph, roots=[filepath], max_depth=max_depth)[filepath]
+        with snapshot.hierarchies_lock:
+            snapshot.hierarchies[key] = tree
+            while len(snapshot.hierarchies) > self.hierarchy_cache:
+                snapshot.hierarchies.popitem(last=False)
+        return tree
+
+    def search(self, text, type=None, limit=20, names_only=False):
+        if not text:
+            raise QueryError(400, "missing parameter: q")
+        with self.connection() as conn:
+            return {"query": text, "hits": search_code(conn, text, type, limit, names_only)}
+
+
+def _int(params, name, default=None):
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(400, f"{name} must be an integer")
+
+
+def _flag(params, name):
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+# path -> function(index, query parameters) returning the JSON body
+ROUTES = {
+    "/stats": lambda index, params: index.stats(),
+    "/dependencies": lambda index, params: index.dependencies(params.get("file"), _flag(params, "transitive")),
+    "/symbol": lambda index, params: index.symbol(params.get("name"), params.get("file")),
+    "/callers": lambda index, params: index.callers(params.get("name")),
+    "/hierarchy": lambda index, params: index.hierarchy(params.get("file"), _int(params, "depth")),
+    "/search": lambda index, params: index.search(params.get("q"), params.get("type"), _int(params, "limit", 20),
+                                                  _flag(params, "names_only")),
+}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET <route>?<params> returns JSON; POST /reload re-reads the DB."""
+
+    # Keep-alive: clients reuse one connection instead of a TCP handshake per query
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle's algorithm the body waits
+    # for the client's delayed ACK (~40 ms) on every keep-alive response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._reply(404, {"error": f"unknown endpoint: {url.path}", "endpoints": sorted(ROUTES)})
+            return
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            self._reply(200, route(self.server.index, params))
+        except QueryError as error:
+            self._reply(error.status, {"error": str(error)})
+        except Exception as error:
+            # e.g. an unlimited hierarchy too deep for json.dumps; the server keeps running
+            self._reply(500, {"error": f"{type(error).__name__}: {error}"})
+
+    def do_POST(self):
+        # Drain any body so the next request on this keep-alive connection starts cleanly
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlsplit(self.path).path != "/reload":
+            self._reply(404, {"error": f"unknown endpoint: {self.path}"})
+            return
+        self._reply(200, self.server.index.reload())
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen() backlog; with the default of 5, clients connecting at once lose SYNs and retry after 1 s
+    request_queue_size = 128
+
+
+def make_server(db_path=DB_PATH, host="127.0.0.1", port=DEFAULT_PORT, pool_size=8, verbose=False):
+    """Load db_path and return a QueryServer for it (call serve_forever() to run it).
+
+    port=0 picks a free port; read it back from server.server_address.
+    """
+    index = QueryIndex(db_path, pool_size=pool_size)
+    server = QueryServer((host, port), QueryHandler)
+    server.index = index
+    server.verbose = verbose
+    return server
+
+
+def run_load_test(host, port, paths, requests=5000, concurrency=8, rate=None):
+    """GET random paths requests times in total from concurrency keep-alive clients.
+
+    Without rate every client sends its next request as soon as the previous
+    one is answered, which measures the throughput limit. With rate, requests
+    go out on a fixed schedule of rate per second (spread over the clients)
+    and each latency counts from its scheduled time, so a stalled server shows
+    up in the percentiles instead of just slowing the schedule down.
+
+    Returns {"requests", "errors", "seconds", "per_second", "p50_ms", "p99_ms", "max_ms"}.
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_client = requests // concurrency
+    interval = concurrency / rate if rate else 0.0
+
+    def client(seed, first):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(host, port)
+        mine = []
+        failed = 0
+        for n in range(per_client):
+            path = rng.choice(paths)
+            if rate:
+                started = first + n * interval
+                delay = started - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                started = time.perf_counter()
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - started)
+            if response.status >= 500:
+                failed += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    started = time.perf_counter()
+    # Clients are staggered so a fixed rate arrives evenly rather than in bursts of concurrency
+    threads = [threading.Thread(target=client, args=(n, started + n * interval / concurrency))
+               for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "seconds": seconds,
+        "per_second": len(latencies) / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def sample_paths(index, count=200, seed=0):
+    """A mix of request paths over the files and symbols of index, for run_load_test()."""
+    rng = random.Random(seed)
+    snapshot = index.snapshot
+    files = snapshot.files
+    names = list(snapshot.symbol_index.by_name)
+    paths = []
+    for _ in range(count):
+        filepath = quote(rng.choice(files)) if files else ''
+        name = quote(rng.choice(names)) if names else ''
+        paths.extend([
+            f"/dependencies?file={filepath}",
+            f"/dependencies?file={filepath}&transitive=1",
+            f"/hierarchy?file={filepath}&depth=3",
+            f"/symbol?name={name}",
+            f"/callers?name={name}",
+            f"/search?q={name}&limit=10",
+        ])
+    return paths
+
+
+def _serve_in_process(db_path, pool_size, ports):
+    server = make_server(db_path, port=0, pool_size=pool_size)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve queries over an index DB from memory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve")
+    serve.add_argument("db", nargs="?", default=DB_PATH)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--pool-size", type=int, default=8)
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+    bench = subparsers.add_parser("bench", help="serve db on a free port and load-test it")
+    bench.add_argument("db", nargs="?", default=DB_PATH)
+    bench.add_argument("--requests", type=int, default=5000)
+    bench.add_argument("--concurrency", type=int, default=8)
+    bench.add_argument("--pool-size", type=int, default=8)
+    bench.add_argument("--rate", type=float, help="requests per second (default: as fast as answered)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = make_server(args.db, args.host, args.port, args.pool_size, args.verbose)
+        print(f"Serving {args.db} ({server.index.stats()['files']} files) on "
+              f"http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            server.index.close()
+    else:
+        # The server gets its own process so the clients do not compete with it for the GIL
+        ports = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_serve_in_process, args=(args.db, args.pool_size, ports),
+                                          daemon=True)
+        process.start()
+        port = ports.get(timeout=600)
+        index = QueryIndex(args.db, pool_size=1)
+        try:
+            results = run_load_test("127.0.0.1", port, sample_paths(index), args.requests, args.concurrency,
+                                    args.rate)
+        finally:
+            index.close()
+            process.terminate()
+        for key, value in results.items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
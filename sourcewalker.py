@@ -0,0 +1,257 @@
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+SOURCE_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx')
+
+# Directories pruned by name wherever they appear: dependencies, build output, caches, VCS data
+DEFAULT_EXCLUDED_DIRS = frozenset({
+    '.git', '.hg', '.svn', 'node_modules', 'bower_components', 'jspm_packages',
+    'dist', 'build', 'coverage', '.next', '.nuxt', '.cache', '.turbo',
+})
+
+# Larger source files are almost always generated (bundles, vendored builds, fixtures)
+DEFAULT_MAX_FILE_SIZE = 1 << 20  # 1 MiB
+
+# File names bundlers and minifiers produce
+MINIFIED_NAME = re.compile(r'[.-]min\.[jt]sx?$|\.(?:bundle|chunk)\.[jt]sx?$', re.IGNORECASE)
+# A file whose first MINIFIED_SAMPLE_BYTES average more than MINIFIED_LINE_LENGTH
+# characters per line is treated as minified; hand-written code stays far below
+MINIFIED_SAMPLE_BYTES = 8192
+MINIFIED_LINE_LENGTH = 300
+
+SKIP_REPORT_NAME = 'skipped_files.json'
+
+
+def _glob_regex(pattern):
+    """Translate one gitignore glob (no leading "!" or trailing "/") to a regex over '/'-separated paths."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i):
+                if pattern.startswith('**/', i):
+                    out.append('(?:.*/)?')  # zero or more leading directories
+                    i += 3
+                else:
+                    out.append('.*')
+                    i += 2
+                continue
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            # A "]" right after "[" (or "[!") is part of the class, as in fnmatch
+            end = pattern.find(']', i + 3 if pattern.startswith(('[!', '[^'), i) else i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        elif c == '\\' and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+class IgnoreRule:
+    """One gitignore line: a compiled glob plus its negation and directory-only flags."""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.negate = pattern.startswith('!')
+        glob = pattern[1:] if self.negate else pattern
+        self.dir_only = glob.endswith('/')
+        glob = glob.rstrip('/')
+        # A slash anywhere but the end anchors the pattern to the ignore file's directory;
+        # otherwise it matches a name at any depth below it
+        anchored = '/' in glob
+        regex = _glob_regex(glob.lstrip('/'))
+        self.regex = re.compile(regex if anchored else '(?:.*/)?' + regex)
+
+    def matches(self, path, is_dir):
+        return (is_dir or not self.dir_only) and self.regex.fullmatch(path) is not None
+
+
+def parse_ignore_patterns(lines):
+    """Return the IgnoreRules of gitignore-syntax lines (blank lines and comments dropped)."""
+    rules = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.endswith(' ') and not line.endswith('\\ '):
+            line = line.rstrip(' ')
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith(('\\#', '\\!')):
+            line = line[1:]
+        rules.append(IgnoreRule(line))
+    return rules
+
+
+def _ignored_by(rulesets, relative_path, is_dir):
+    """The (source, pattern) that ignores relative_path, or None; the last matching rule decides."""
+    decision = None
+    for base, source, rules in rulesets:
+        if base:
+            if not relative_path.startswith(base + '/'):
+                continue
+            path = relative_path[len(base) + 1:]
+        else:
+            path = relative_path
+        for rule in rules:
+            if rule.matches(path, is_dir):
+                decision = None if rule.negate else (source, rule.pattern)
+    return decision
+
+
+def is_minified(filepath, name=None):
+    """Name or first-bytes heuristic for bundler/minifier output; returns the reason or None."""
+    if MINIFIED_NAME.search(name or os.path.basename(filepath)):
+        return "minified file name"
+    with open(filepath, 'rb') as f:
+        sample = f.read(MINIFIED_SAMPLE_BYTES)
+    if len(sample) >= 1024 and len(sample) / (sample.count(b'\n') + 1) > MINIFIED_LINE_LENGTH:
+        return f"average line over {MINIFIED_LINE_LENGTH} characters"
+    return None
+
+
+class SourceWalker:
+    """Finds the source files of root_dir, leaving out dependencies, build output and generated code.
+
+    Directories are pruned before they are entered: names in exclude_dirs
+    and directories matched by a .gitignore (each one applies below its own
+    directory, like git) or by the extra ignore globs (gitignore syntax,
+    relative to root_dir). Source files are then skipped when ignored, larger
+    than max_file_size, or minified (see is_minified). Every skip is recorded
+    in self.skipped as {"path", "kind", "reason", "detail"}; a pruned
+    directory is one entry, whatever it contains.
+
+    walk() can be called again to rescan; the minified check is only redone
+    for files whose size or mtime changed.
+    """
+
+    def __init__(self, root_dir, ignore=(), use_gitignore=True, exclude_dirs=DEFAULT_EXCLUDED_DIRS,
+                 max_file_size=DEFAULT_MAX_FILE_SIZE, skip_minified=True, extensions=SOURCE_EXTENSIONS):
+        self.root_dir = root_dir
+        self.use_gitignore = use_gitignore
+        self.exclude_dirs = exclude_dirs
+        self.max_file_size = max_file_size
+        self.skip_minified = skip_minified
+        self.extensions = tuple(extensions)
+        self.base_rules = [('', 'ignore option', parse_ignore_patterns(ignore))] if ignore else []
+        self.skipped = []
+        self.minified = {}  # file path -> ((size, mtime_ns), is_minified() verdict)
+
+    def _skip(self, relative_path, kind, reason, detail=None):
+        self.skipped.append({"path": relative_path, "kind": kind, "reason": reason, "detail": detail})
+
+    def _read_gitignore(self, directory, relative_dir):
+        path = os.path.join(directory, '.gitignore')
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                rules = parse_ignore_patterns(f)
+        except OSError:
+            return None
+        source = (relative_dir + '/.gitignore') if relative_dir else '.gitignore'
+        return (relative_dir, source, rules) if rules else None
+
+    def walk(self):
+        """Return (relative_dir, [(file_name, file_path), ...]) per directory, like os.walk top-down."""
+        self.skipped = []
+        source_dirs = []
+        # (directory, root-relative path with '/' separators, ignore rulesets in force)
+        stack = [(self.root_dir, '', self.base_rules)]
+        while stack:
+            directory, relative_dir, rulesets = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            if self.use_gitignore and any(entry.name == '.gitignore' for entry in entries):
+                gitignore = self._read_gitignore(directory, relative_dir)
+                if gitignore:
+                    rulesets = rulesets + [gitignore]
+
+            source_files = []
+            subdirs = []
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if entry.name in self.exclude_dirs:
+                        self._skip(relative_path, "directory", "excluded_dir", entry.name)
+                        continue
+                    ignored = _ignored_by(rulesets, relative_path, True)
+                    if ignored:
+                        self._skip(relative_path, "directory", "ignored", f"{ignored[0]}: {ignored[1]}")
+                        continue
+                    subdirs.append((entry.path, relative_path))
+                    continue
+                if not entry.name.endswith(self.extensions):
+                    continue
+                ignored = _ignored_by(rulesets, relative_path, False)
+                if ignored:
+                    self._skip(relative_path, "file", "ignored", f"{ignored[0]}: {ignored[1]}")
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if self.max_file_size is not None and stat.st_size > self.max_file_size:
+                    self._skip(relative_path, "file", "too_large", stat.st_size)
+                    continue
+                if self.skip_minified:
+                    key = (stat.st_size, stat.st_mtime_ns)
+                    cached = self.minified.get(entry.path)
+                    if cached is None or cached[0] != key:
+                        try:
+                            cached = self.minified[entry.path] = (key, is_minified(entry.path, entry.name))
+                        except OSError:
+                            continue
+                    if cached[1]:
+                        self._skip(relative_path, "file", "minified", cached[1])
+                        continue
+                source_files.append((entry.name, entry.path))
+
+            source_dirs.append((relative_dir.replace('/', os.sep) or "/", source_files))
+            # Reversed so subdirectories come off the stack in listing order, as with os.walk
+            for path, relative_path in reversed(subdirs):
+                stack.append((path, relative_path, rulesets))
+        return source_dirs
+
+
+def skip_summary(skipped):
+    """{reason: count} of SourceWalker.skipped entries."""
+    return dict(Counter(entry["reason"] for entry in skipped))
+
+
+def write_skip_report(skipped, path):
+    """Write the skip entries and their per-reason counts as JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"counts": skip_summary(skipped), "skipped": skipped}, f, indent=4)
+    return path
+
+
+if __name__ == "__main__":
+    # python sourcewalker.py <root_dir> [ignore glob ...]
+    # Lists what an index run of root_dir would parse and what it would skip.
+    walker = SourceWalker(sys.argv[1], ignore=sys.argv[2:])
+    files = sum(len(files) for _, files in walker.walk())
+    for entry in walker.skipped:
+        print(f"{entry['reason']:<14}{entry['kind']:<10}{entry['path']}  {entry['detail'] or ''}")
+    print(f"{files} source files, skipped: {skip_summary(walker.skipped)}")
@@ -1,191 +1,301 @@
-from tree_sitter import Language, Parser
-import tree_sitter_javascript as tsj
-import tree_sitter_typescript as tts 
 import os
 import json
 import sqlite3
+import hashlib
 from db.createdb import connect_db,DB_PATH,insert_file,insert_metadata,insert_reference,setUpDataBase, get_file_id
+from db.createdb import get_file_manifest, update_file_stat, BulkWriter
+from metadatastream import JsonlWriter, JsonlReader, iter_jsonl, COMBINED_JSONL_NAME
+from packedstore import PackedStoreWriter, PACK_NAME
+from blobstore import detach_code, DEFAULT_COMPRESSION
+from sourcewalker import write_skip_report, DEFAULT_MAX_FILE_SIZE, SKIP_REPORT_NAME
+from importgraph import build_import_graph
+from importresolver import ImportResolver
+from callresolver import store_file_imports, resolve_references
+from instrumentation import add_hook, profile_option, stage, MetricsCollector
+from deptree import build_dependency_hierarchy, find_root_files
+from extractor import extract_metadata, iter_extracted_metadata, walk_source_files, metadata_json_options, format_parse_stats, SourceSpans, DEFAULT_CHUNKSIZE
 
+PER_FILE_JSON_DIR = os.path.join('metadata', 'files')
 
-JAVASCRIPT_LANGUAGE = Language(tsj.language())
-TYPESCRIPT_LANGUAGE = Language(tts.language_typescript())
 
-# Initialize parser
-parser = Parser(JAVASCRIPT_LANGUAGE)
+def file_fingerprint(filepath):
+    """Return (size, mtime, sha256 hex digest) of a file on disk."""
+    stat = os.stat(filepath)
+    with open(filepath, 'rb') as f:
+        contenthash = hashlib.sha256(f.read()).hexdigest()
+    return stat.st_size, stat.st_mtime, contenthash
 
-def parse_file(filepath,conn):
-    """Parse a JavaScript/TypeScript file and extract metadata with more comprehensive details."""
+
+def metadata_rows(file_metadata, spans):
+    """Yield the (name, type, codecontent) metadata rows of a file's entities, code_content aside."""
+    for entry in file_metadata["imports"]:
+        yield entry['module'], 'import_statement', spans.text(entry)
+
+    for entry in file_metadata["functions"]:
+        yield entry['function'], 'function_declaration', spans.text(entry)
+
+    for entry in file_metadata["function_calls"]:
+        yield entry['function'], 'function_call', spans.text(entry)
+
+    for entry in file_metadata["arrow_functions"]:
+        yield 'lambda', 'arrow_function', spans.text(entry)
+
+    for entry in file_metadata["jsx_elements"]:
+        yield 'jsx', 'jsx_content', spans.text(entry)
+
+
+def store_file_metadata(writer, file_metadata, fingerprint=(None, None, None), source=None):
+    """Queue a file row and its extracted metadata on a BulkWriter.
+
+    source is the file's bytes when the caller already has them (compact records only).
+    """
+    filepath = file_metadata["file"]
     filename = os.path.basename(filepath)
     filetype = os.path.splitext(filepath)[1]
-    insert_file(conn, filename, filepath, filetype)
-    with open(filepath, 'r') as f:
-        code = f.read()
-
-    tree = parser.parse(bytes(code, "utf8"))
-    root_node = tree.root_node
-
-    # Lists to hold the individual items with their content
-    imports = []
-    exports = []
-    functions = []
-    function_calls = []
-    arrow_functions = []
-    jsx_elements = []
-
-    # Separate lists to hold the code content
-    imports_content = []
-    exports_content = []
-    functions_content = []
-    function_calls_content = []
-    arrow_functions_content = []
-    jsx_content = []
-
-    def traverse(node):
-        """Recursive function to traverse the AST and extract details."""
-        if node.type == 'import_statement':
-            import_path = node.child_by_field_name('source').text.decode('utf-8')
-            imports.append({"module": import_path, "content": code[node.start_byte:node.end_byte]})
-        
-        if node.type == 'export_statement':
-            export_content = code[node.start_byte:node.end_byte]
-            exports_content.append(export_content)
-
-            # Identify exported names
-            declaration = node.child_by_field_name('declaration')
-            if declaration:
-                # Named export or default export
-                export_name = declaration.text.decode('utf-8')
-                exports.append({"export": export_name, "content": export_content})
-            else:
-                # Handle cases like "export { foo, bar };"
-                named_exports = [
-                    child.text.decode('utf-8')
-                    for child in node.children
-                    if child.type == 'identifier'
-                ]
-                for named_export in named_exports:
-                    exports.append({"export": named_export, "content": export_content})
-
-        if node.type == 'function_declaration':
-            function_name = node.child_by_field_name('name').text.decode('utf-8')
-            functions.append({"function": function_name, "content": code[node.start_byte:node.end_byte]})
-        
-        if node.type == 'call_expression':
-            function_call = node.child_by_field_name('function')
-            if function_call:
-                function_name = function_call.text.decode('utf-8')
-                function_calls.append({"function": function_name, "content": code[node.start_byte:node.end_byte]})
-
-        if node.type == 'arrow_function':
-            arrow_function_content = code[node.start_byte:node.end_byte]
-            arrow_functions.append({"function": "arrow_function", "content": arrow_function_content})
-        
-        if node.type == 'jsx_element':
-            jsx_element_content = code[node.start_byte:node.end_byte]
-            jsx_elements.append({"element": "jsx_element", "content": jsx_element_content})
-
-        for child in node.children:
-            traverse(child)
-
-    traverse(root_node)
-
-    file_id = get_file_id(conn, filepath)
-
-    if not file_id:
-        print(f"File path {filepath} not found in files table.")
-        fileId=747474
-    #print(filepath,"  --  ",fileId)
+    filesize, mtime, contenthash = fingerprint
+    # Compact records only hold spans; the text is sliced from one read of the file
+    spans = SourceSpans(file_metadata, source)
+    # The file text is stored once per distinct content; the files row and the
+    # code_content row point at its blob (see blobstore)
+    code = spans.code if file_metadata.get("compact") else file_metadata["code_content"]
+    blobhash = writer.add_blob(code)
+    file_id = writer.add_file(filename, filepath, filetype, filesize, mtime, contenthash, blobhash)
+
     # Insert metadata using the helper function
-    for entry in imports:
-        insert_metadata(conn, file_id, entry['module'], 'import_statement', entry['content'], 0, None)
+    for name, type, codecontent in metadata_rows(file_metadata, spans):
+        writer.add_metadata(file_id, name, type, codecontent, 0, None)
+
+    # Insert raw code content
+    writer.add_metadata(file_id, 'jscontent', 'code_content', None, 0, None, blobhash)
 
-    for entry in functions:
-        insert_metadata(conn, file_id, entry['function'], 'function_declaration', entry['content'], 0, None)
+    # Persist the file's symbols so symbolindex.load_symbol_index() needs no re-parse
+    for symbol in file_metadata.get("symbols", []):
+        writer.add_symbol(file_id, symbol["name"], symbol["kind"], symbol["exported"], symbol["span"])
+    return file_id
 
-    for entry in function_calls:
-        insert_metadata(conn, file_id, entry['function'], 'function_call', entry['content'], 0, None)
 
-    for entry in arrow_functions:
-        insert_metadata(conn, file_id, 'lambda', 'arrow_function', entry['content'], 0, None)
+def parse_file(filepath,conn):
+    """Parse a JavaScript/TypeScript file, store its metadata and return it."""
+    fingerprint = file_fingerprint(filepath)
+    file_metadata = extract_metadata(filepath)
+    with BulkWriter(conn) as writer:
+        writer.delete_file(filepath)
+        store_file_metadata(writer, file_metadata, fingerprint)
+    return file_metadata
 
-    for entry in jsx_elements:
-        insert_metadata(conn, file_id, 'jsx', 'jsx_content', entry['content'], 0, None)
 
-    # Insert raw code content
-    insert_metadata(conn, file_id, 'jscontent', 'code_content', code, 0, None)
-
-
-    # Return metadata with separated content for each item
-    return {
-        "file": filepath,
-        "imports": imports,
-        "exports": exports,
-        "functions": functions,
-        "function_calls": function_calls,
-        "arrow_functions": arrow_functions,
-        "jsx_elements": jsx_elements,
-        "imports_content": [entry['content'] for entry in imports],
-        "exports_content": [entry['content'] for entry in exports],
-        "functions_content": [entry['content'] for entry in functions],
-        "function_calls_content": [entry['content'] for entry in function_calls],
-        "arrow_functions_content": [entry['content'] for entry in arrow_functions],
-        "jsx_content": [entry['content'] for entry in jsx_elements],
-        "code_content": code
-    }
-
-
-def process_codebase(root_dir,conn):
-    """Process all JavaScript/TypeScript files in the codebase and save project structure."""
+def load_previous_metadata(combined_metadata_path):
+    """Return {filepath: file_metadata} from an earlier run's combined metadata, or {} if there is none."""
+    if not os.path.exists(combined_metadata_path):
+        return {}
+    with open(combined_metadata_path, 'r') as f:
+        return {file_metadata["file"]: file_metadata for file_metadata in json.load(f)}
+
+
+def is_under_root(filepath, root_dir):
+    root = os.path.normpath(root_dir)
+    return os.path.normpath(filepath).startswith(root + os.sep)
+
+
+def per_file_json_path(filepath, root_dir):
+    """metadata/files/<filepath relative to root_dir>.json, the per-file record of a source file.
+
+    Named after the path rather than the file's position in the walk, so a file
+    keeps its JSON across runs however many files are added or removed around it.
+    """
+    return os.path.join(PER_FILE_JSON_DIR, os.path.relpath(filepath, root_dir) + '.json')
+
+
+@profile_option
+def process_codebase(root_dir,conn,workers=1,chunksize=DEFAULT_CHUNKSIZE,incremental=False,batch_size=5000,compact=False,stream=False,resume=False,per_file_output="json",blob_compression=DEFAULT_COMPRESSION,ignore=(),max_file_size=DEFAULT_MAX_FILE_SIZE,use_gitignore=True):
+    """Process all JavaScript/TypeScript files in the codebase and save project structure.
+
+    workers > 1 parses files in a process pool; the output is the same for any worker count.
+
+    With incremental=True only files whose size/mtime and content hash differ from the
+    files table are re-parsed; unchanged files keep their rows and are taken from the
+    previous combined metadata, and rows of files deleted from root_dir are purged.
+
+    DB rows are written through a BulkWriter, committing once per batch_size rows.
+
+    Each file's source text is kept once, in the blobs table (compressed with
+    blob_compression, see blobstore). The returned and JSON records carry its
+    "code_hash" instead of "code_content"; blobstore.load_blob() reads it back.
+
+    compact=True keeps byte/point spans instead of text in the returned and JSON
+    metadata (see extractor.SourceSpans); the DB rows still get the full text.
+
+    stream=True appends one record per file to combined_metadata.jsonl(.partial) as
+    soon as its DB rows are committed, instead of collecting everything for one
+    combined_metadata.json at the end, and returns a generator over the JSONL file.
+    resume=True continues an interrupted streaming run, skipping the files it finished.
+
+    Once every file is stored, function calls are resolved to the declarations they
+    call (see callresolver) and written to referencesTable.
+
+    per_file_output="packed" writes the per-file records into metadata/metadata.pack
+    (see packedstore) instead of one metadata/files/<relative path>.json per source
+    file (see per_file_json_path).
+
+    Directories such as node_modules and dist, paths matched by a .gitignore (unless
+    use_gitignore=False) or by the ignore globs (gitignore syntax), files over
+    max_file_size bytes and minified bundles are not indexed (see
+    sourcewalker.SourceWalker); what was left out and why is written to
+    metadata/skipped_files.json. Watch the tree with the same options (see
+    watchmode.WatchIndex), or it indexes what this run left out.
+
+    profile="<dir>" runs it under instrumentation.profiling(): cProfile and tracemalloc
+    output for this process (pool workers are not profiled) is written to that directory.
+    """
     metadata = []
     project_structure = {}
-    a = 0
-
-    for subdir, _, files in os.walk(root_dir):
-        # Get relative directory path from root
-        relative_dir = os.path.relpath(subdir, root_dir)
-        if relative_dir == ".":
-            relative_dir = "/"
 
+    combined_metadata_path = os.path.join('metadata', 'combined_metadata.json')
+    stream_path = os.path.join('metadata', COMBINED_JSONL_NAME)
+    partial_path = stream_path + '.partial'
+    manifest = get_file_manifest(conn)
+    previous_metadata = {}
+    done = {}
+    pending = []
+    if stream:
+        if incremental and os.path.exists(stream_path):
+            previous_metadata = JsonlReader(stream_path)
+        if resume and os.path.exists(partial_path):
+            # Records only reach the partial file after their rows were committed
+            done = JsonlReader(partial_path)
+        stream_writer = JsonlWriter(partial_path, append=bool(done))
+    elif incremental:
+        previous_metadata = load_previous_metadata(combined_metadata_path)
+
+    def write_pending():
+        for record in pending:
+            stream_writer.write(record)
+        pending.clear()
+
+    pack_writer = None
+    if per_file_output == 'packed':
+        # Earlier records stay valid for files this run does not rewrite
+        pack_writer = PackedStoreWriter(os.path.join('metadata', PACK_NAME), append=incremental or resume)
+        if done:
+            # The pack index is only saved by close(), so an interrupted run loses the pack
+            # records of the files it finished; the partial JSONL still has every one of them
+            for record in iter_jsonl(partial_path):
+                pack_writer.add(record["file"], record)
+
+    skipped = []
+    with stage("walk"):
+        source_dirs = walk_source_files(root_dir, skipped, ignore=ignore, max_file_size=max_file_size,
+                                        use_gitignore=use_gitignore)
+    write_skip_report(skipped, os.path.join('metadata', SKIP_REPORT_NAME))
+    source_files = []
+    for relative_dir, files in source_dirs:
         # Initialize the directory in the project structure
         if relative_dir not in project_structure:
             project_structure[relative_dir] = []
-
-        for file in files:
-            filetype = os.path.splitext(file)[1][1:] 
-            if file.endswith(('.js', '.jsx', '.ts', '.tsx')):
-                filepath = os.path.join(subdir, file)
-                file_metadata = parse_file(filepath,conn)
-                
-                metadata.append(file_metadata)
-                # Add file to the project structure
-                project_structure[relative_dir].append({
-                    "file_name": file,
-                    "file_path": filepath
-                })
+        source_files.extend((relative_dir, file, filepath) for file, filepath in files)
+
+    # Work out which files need parsing; unchanged ones are reused as-is
+    fingerprints = {}
+    for _, _, filepath in source_files:
+        if filepath in done:
+            continue
+        indexed = manifest.get(filepath)
+        if incremental and indexed and filepath in previous_metadata:
+            file_id, filesize, mtime, contenthash = indexed
+            stat = os.stat(filepath)
+            if (stat.st_size, stat.st_mtime) == (filesize, mtime):
+                continue
+            fingerprint = file_fingerprint(filepath)
+            if fingerprint[2] == contenthash:
+                # Touched but not modified: just refresh the stat so the next run is cheap
+                update_file_stat(conn, file_id, fingerprint[0], fingerprint[1])
+                continue
+        else:
+            fingerprint = file_fingerprint(filepath)
+        fingerprints[filepath] = fingerprint
+
+    # Workers only parse; this process is the single writer for the DB and JSON outputs
+    filepaths = [filepath for _, _, filepath in source_files if filepath in fingerprints]
+    results = iter_extracted_metadata(filepaths, workers=workers, chunksize=chunksize, compact=compact)
+    with BulkWriter(conn, batch_size=batch_size, on_commit=write_pending if stream else None,
+                    blob_compression=blob_compression) as writer:
+        for relative_dir, file, filepath in source_files:
+            # Add file to the project structure
+            project_structure[relative_dir].append({
+                "file_name": file,
+                "file_path": filepath
+            })
+            if filepath in done:
+                continue
+
+            if filepath in fingerprints:
+                file_metadata = next(results)
+                # Replace whatever an earlier run stored for this path
+                if filepath in manifest:
+                    writer.delete_file(filepath)
+                store_file_metadata(writer, file_metadata, fingerprints[filepath])
+                file_metadata = detach_code(file_metadata)
 
                 # Save individual file metadata
-                a += 1
-                output_path = os.path.join('metadata', f"{file}{a}.json")
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                with open(output_path, 'w') as f:
-                    json.dump(file_metadata, f, indent=4)
+                if pack_writer:
+                    pack_writer.add(filepath, file_metadata)
+                else:
+                    output_path = per_file_json_path(filepath, root_dir)
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    with open(output_path, 'w') as f:
+                        json.dump(file_metadata, f, **metadata_json_options(compact))
+            else:
+                file_metadata = previous_metadata[filepath]
 
-    # Save combined metadata
-    combined_metadata_path = os.path.join('metadata', 'combined_metadata.json')
-    with open(combined_metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=4)
+            if stream:
+                pending.append(file_metadata)
+            else:
+                metadata.append(file_metadata)
+
+        # Purge rows for files that were deleted from root_dir since the last run
+        seen = {filepath for _, _, filepath in source_files}
+        for filepath in manifest:
+            if filepath not in seen and is_under_root(filepath, root_dir):
+                writer.delete_file(filepath)
+                if pack_writer:
+                    pack_writer.remove(filepath)
+                else:
+                    try:
+                        os.remove(per_file_json_path(filepath, root_dir))
+                    except FileNotFoundError:
+                        pass
+
+    if pack_writer:
+        pack_writer.close()
 
     # Save project structure
     project_structure_path = os.path.join('metadata', 'project_structure.json')
+    os.makedirs(os.path.dirname(project_structure_path), exist_ok=True)
     with open(project_structure_path, 'w') as f:
         json.dump(project_structure, f, indent=4)
 
+    if stream:
+        stream_writer.close()
+        os.replace(partial_path, stream_path)
+
+    # Calls resolve against the declarations and imports of every file, so this waits for all rows
+    resolver = ImportResolver([filepath for _, _, filepath in source_files], root_dir=root_dir)
+    store_file_imports(conn, iter_jsonl(stream_path) if stream else metadata, resolver)
+    resolve_references(conn)
+
+    if stream:
+        return iter_jsonl(stream_path)
+
+    # Save combined metadata
+    with stage("json_output"), open(combined_metadata_path, 'w') as f:
+        json.dump(metadata, f, **metadata_json_options(compact))
+
     return metadata
 
 
 import subprocess
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from tqdm import tqdm
 BASE_DIR: Path= Path(__name__).resolve().parent
@@ -196,38 +306,30 @@ class Reference(BaseModel):
     code_content: str= Field(description="code content")
     description: str = Field(description="Description of code")
 
-def get_dependency_tree(filepath:str):
-    try:
-        result=subprocess.run(
-            [
-                "node",
-                f"{BASE_DIR}/node_modules/madge/bin/cli.js",
-                "--json",
-                filepath,
-            ],
-            capture_output=True,
-            text=True
-        )
-        return json.loads(result.stdout)
-    except Exception as e:
-        raise e
+def get_dependency_tree(filepath:str, metadata=None):
+    """Return the madge-style {file: [deps]} graph of the codebase at filepath.
+
+    Built in-process from the extracted imports/require()/import() specifiers
+    (see importgraph). Pass the metadata process_codebase returned so the files
+    are not parsed a second time.
+    """
+    if metadata is None:
+        filepaths = [path for _, files in walk_source_files(filepath) for _, path in files]
+        metadata = iter_extracted_metadata(filepaths, workers=os.cpu_count(), compact=True)
+    return build_import_graph(metadata, filepath)
 def readFile(filepath):
     with open(filepath,"r",encoding="latin1") as f:
         content=f.read()
     return content
-def create_proj_dep_metadata(reppath:str):
-    depTree: Dict= get_dependency_tree(reppath)
+def create_proj_dep_metadata(reppath:str, metadata=None):
+    depTree: Dict= get_dependency_tree(reppath, metadata)
     keys:list[str]=sorted(depTree,key=lambda k : len(depTree[k]))
     meta_data:Dict ={}
     for key in tqdm(keys,"Creating dependency"):
-        file_path=os.path.join(reppath,key.replace("/","\\"))
         depends_on:list[str] = depTree[key]
-        code_content=readFile(file_path)
         data: List[Reference]=[]
 
         for depend_on in depends_on:
-            depend_on_file_path=os.path.join(reppath,depend_on.replace("/","\\"))
-            depends_on_content=readFile(depend_on_file_path)
             data.append(
                 {
                     "name":depend_on,
@@ -236,51 +338,40 @@ def create_proj_dep_metadata(reppath:str):
                 }
             )
         meta_data[key]=data
-    print("saving depenedencydata using madge")
+    print("saving dependency data in madge format")
     madge_dep_path=os.path.join('metadata',"dependency_metadata_using_madge.json")
     with open(madge_dep_path,'w') as f:
         json.dump(meta_data,f,indent=4)
-    print("created madge")
+    print("created dependency data")
 # Read the JSON file
 def read_dependency_data(file_path: str) -> Dict[str, List[Dict[str, str]]]:
     """Read the dependency data from a JSON file and return as a dictionary."""
     with open(file_path, 'r') as file:
         return json.load(file)
 
-def build_dependency_tree(metadata: Dict[str, List[Dict[str, str]]], root: str) -> Dict:
-    """Recursively build the dependency tree."""
-    tree = {root: []}
-    for dependency in metadata.get(root, []):
-        dep_name = dependency["name"]
-        tree[root].append(build_dependency_tree(metadata, dep_name))
-    return tree
-
-def find_root_files(metadata: Dict[str, List[Dict[str, str]]]) -> List[str]:
-    """Find files that are not dependencies of any other file."""
-    all_files = set(metadata.keys())
-    dependent_files = {dep["name"] for deps in metadata.values() for dep in deps}
-    root_files = list(all_files - dependent_files)
-    return root_files
-
-def build_hierarchical_dependency_tree(metadata: Dict[str, List[Dict[str, str]]]) -> Dict:
+def build_dependency_tree(metadata: Dict[str, List[Dict[str, str]]], root: str, max_depth: Optional[int] = None) -> Dict:
+    """Build the dependency tree of root; shared and cyclic dependencies appear as $ref nodes (see deptree)."""
+    return build_dependency_hierarchy(metadata, [root], max_depth)
+
+def build_hierarchical_dependency_tree(metadata: Dict[str, List[Dict[str, str]]], max_depth: Optional[int] = None) -> Dict:
     """Build a full hierarchical dependency tree for all root files."""
-    root_files = find_root_files(metadata)
-    tree = {}
-    for root in root_files:
-        tree.update(build_dependency_tree(metadata, root))
-    return tree
+    return build_dependency_hierarchy(metadata, max_depth=max_depth)
 
 
 if __name__ == "__main__":
     root_dir = "./testcodebases/react-weather-forecast-master"
     setUpDataBase(DB_PATH)
-    conn = connect_db()
-    metadata = process_codebase(root_dir,conn)
+    conn = connect_db(bulk_load=True)
+    metrics = add_hook(MetricsCollector())
+    metadata = process_codebase(root_dir,conn,workers=os.cpu_count(),incremental=True)
+    print(format_parse_stats())
+    metrics.write(os.path.join('metadata', 'metrics.json'))
+    metrics.write(os.path.join('metadata', 'metrics.prom'))
     # json_file = './metadata/combined_metadata.json'  # Path to your JSON file
 
     # populate_metadata_table(json_file, conn)
     conn.close()
-    create_proj_dep_metadata(root_dir)
+    create_proj_dep_metadata(root_dir, metadata)
     dependency_data=readFile("./metadata/dependency_metadata_using_madge.json")
     if isinstance(dependency_data, str):
         dependency_data = json.loads(dependency_data)
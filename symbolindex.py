@@ -0,0 +1,87 @@
+SYMBOL_FIELDS = ("name", "kind", "exported", "span")
+
+
+class SymbolIndex:
+    """Maps declared and exported names to the files (and spans) that define them.
+
+    Built from the "symbols" list extraction adds to every file record, or
+    loaded from the symbols table of the DB. Lookups are single dict accesses,
+    so resolving every call site of a codebase is linear in the call sites.
+    """
+
+    def __init__(self):
+        self.by_name = {}  # name -> [{"file", "name", "kind", "exported", "span"}]
+        self.by_file = {}  # file -> names it defines, so a changed file can be dropped
+
+    def add(self, filepath, symbol):
+        entry = {"file": filepath, **{key: symbol[key] for key in SYMBOL_FIELDS}}
+        self.by_name.setdefault(entry["name"], []).append(entry)
+        self.by_file.setdefault(filepath, set()).add(entry["name"])
+
+    def add_file(self, file_metadata):
+        filepath = file_metadata["file"]
+        self.remove_file(filepath)
+        for symbol in file_metadata.get("symbols", []):
+            self.add(filepath, symbol)
+
+    def remove_file(self, filepath):
+        for name in self.by_file.pop(filepath, ()):
+            remaining = [entry for entry in self.by_name[name] if entry["file"] != filepath]
+            if remaining:
+                self.by_name[name] = remaining
+            else:
+                del self.by_name[name]
+
+    def lookup(self, name):
+        """Return every definition of name (possibly empty)."""
+        return self.by_name.get(name, [])
+
+    def files_for(self, name):
+        """Return the files that define name, in index order, without repeats."""
+        return list(dict.fromkeys(entry["file"] for entry in self.lookup(name)))
+
+    def resolve(self, name, caller_file=None):
+        """Return the definition a call to name most likely refers to, or None.
+
+        name is the callee text as extracted. A definition in caller_file wins,
+        then an exported one, then any other.
+        """
+        definitions = self.lookup(name)
+        if not definitions:
+            return None
+        if caller_file is not None:
+            for entry in definitions:
+                if entry["file"] == caller_file:
+                    return entry
+        for entry in definitions:
+            if entry["exported"]:
+                return entry
+        return definitions[0]
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __len__(self):
+        return len(self.by_name)
+
+
+def build_symbol_index(metadata):
+    """Build a SymbolIndex from file records (a list, or a generator such as iter_jsonl)."""
+    index = SymbolIndex()
+    for file_metadata in metadata:
+        index.add_file(file_metadata)
+    return index
+
+
+def load_symbol_index(conn):
+    """Build a SymbolIndex from the symbols table written by an earlier index run."""
+    index = SymbolIndex()
+    cursor = conn.execute('''
+        SELECT f.filepath, s.name, s.kind, s.exported, s.start_byte, s.end_byte,
+               s.start_row, s.start_col, s.end_row, s.end_col
+        FROM symbols s JOIN files f ON s.fileId = f.id
+        ORDER BY s.id
+    ''')
+    for row in cursor:
+        index.add(row[0], {"name": row[1], "kind": row[2], "exported": bool(row[3]), "span": list(row[4:])})
+    return index
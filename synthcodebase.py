@@ -0,0 +1,90 @@
+import os
+import random
+import sys
+
+
+def _directories(depth, branching):
+    """Relative directory paths of a tree depth levels deep with branching children each."""
+    directories = ['src']
+    level = ['src']
+    for _ in range(depth):
+        level = [f'{parent}/pkg{i}' for parent in level for i in range(branching)]
+        directories.extend(level)
+    return directories
+
+
+def _import_path(importer, target):
+    relative = os.path.relpath(os.path.splitext(target)[0], os.path.dirname(importer)).replace(os.sep, '/')
+    return relative if relative.startswith('.') else './' + relative
+
+
+def generate_codebase(output_dir, files=200, depth=3, branching=3, fanout=3, cycle_ratio=0.05,
+                      jsx_ratio=0.3, ts_ratio=0.3, functions_per_file=4, seed=0):
+    """Write a synthetic JavaScript/TypeScript codebase under output_dir and return its file paths.
+
+    files are spread over a directory tree depth levels deep (branching
+    subdirectories per level). Each file exports functions_per_file functions
+    and imports about fanout earlier files, calling one function from each;
+    with probability cycle_ratio an import points at a later file instead,
+    which creates import cycles. jsx_ratio of the files render JSX (.jsx/.tsx)
+    and ts_ratio are TypeScript. The same arguments always give the same tree.
+    """
+    rng = random.Random(seed)
+    directories = _directories(depth, branching)
+    plan = []
+    for n in range(files):
+        jsx = rng.random() < jsx_ratio
+        ts = rng.random() < ts_ratio
+        extension = ('.tsx' if jsx else '.ts') if ts else ('.jsx' if jsx else '.js')
+        plan.append((f'{rng.choice(directories)}/module{n}{extension}', jsx, ts))
+
+    paths = []
+    for n, (relative_path, jsx, ts) in enumerate(plan):
+        targets = set()
+        for _ in range(fanout):
+            if n + 1 < files and rng.random() < cycle_ratio:
+                targets.add(rng.randrange(n + 1, files))
+            elif n:
+                targets.add(rng.randrange(n))
+        annotation = ': number' if ts else ''
+
+        lines = []
+        if jsx:
+            lines.append("import React from 'react';")
+        for target in sorted(targets):
+            names = ', '.join(f'fn{target}_{k}' for k in range(functions_per_file))
+            lines.append(f"import {{ {names} }} from '{_import_path(relative_path, plan[target][0])}';")
+        lines.append('')
+        for k in range(functions_per_file):
+            lines.append(f'export function fn{n}_{k}(value{annotation}){annotation} {{')
+            lines.append(f'    const doubled = [value, value + {k}].map((item) => item * 2);')
+            for target in sorted(targets):
+                if rng.random() < 0.5:
+                    lines.append(f'    fn{target}_{rng.randrange(functions_per_file)}(doubled[0]);')
+            lines.append('    return doubled.reduce((a, b) => a + b, 0);')
+            lines.append('}')
+            lines.append('')
+        if jsx:
+            lines.append(f'export default function Component{n}() {{')
+            lines.append('    return (')
+            lines.append(f'        <div className="module{n}">')
+            for k in range(functions_per_file):
+                lines.append(f'            <span title="fn{n}_{k}">{{fn{n}_{k}({k})}}</span>')
+            lines.append('        </div>')
+            lines.append('    );')
+            lines.append('}')
+            lines.append('')
+
+        path = os.path.join(output_dir, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    # python synthcodebase.py <output_dir> [files]
+    output_dir = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print(f"Generated {len(generate_codebase(output_dir, files=count))} files in {output_dir}")
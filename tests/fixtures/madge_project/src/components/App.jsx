@@ -0,0 +1,6 @@
+import { title } from '../utils';
+import { Header } from './Header';
+
+export function App(name) {
+    return <Header text={title(name)} />;
+}
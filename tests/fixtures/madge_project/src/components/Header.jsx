@@ -0,0 +1,5 @@
+import { App } from './App';
+
+export function Header({ text }) {
+    return <h1 data-app={App.name}>{text}</h1>;
+}
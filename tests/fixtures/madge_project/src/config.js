@@ -0,0 +1 @@
+module.exports = { name: 'fixture' };
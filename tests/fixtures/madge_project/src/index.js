@@ -0,0 +1,9 @@
+import React from 'react';
+import { App } from './components/App';
+import * as format from './utils/format';
+
+const config = require('./config');
+
+export function main() {
+    return App(format.title(config.name));
+}
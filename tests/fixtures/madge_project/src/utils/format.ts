@@ -0,0 +1,5 @@
+import lodash from 'lodash';
+
+export function title(text: string): string {
+    return lodash.capitalize(text);
+}
@@ -0,0 +1,2 @@
+export * from './format';
+export { slug } from './slug';
@@ -0,0 +1,81 @@
+import os
+
+from db.createdb import connect_db, setUpDataBase
+from startapp import process_codebase
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def _references(conn):
+    """{(calling file, call name): declaration file} of every referencesTable row."""
+    rows = conn.execute('''
+        SELECT cf.filepath, c.name, df.filepath FROM referencesTable r
+        JOIN metadata c ON c.id = r.id1 JOIN files cf ON cf.id = c.fileId
+        JOIN metadata d ON d.id = r.id2 JOIN files df ON df.id = d.fileId
+    ''')
+    return {(os.path.basename(caller), name): os.path.basename(declared) for caller, name, declared in rows}
+
+
+def test_member_calls_only_match_the_module_their_receiver_is_bound_to(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / 'project')
+    _write(os.path.join(root, 'utils.js'),
+           'function map(items) { return items; }\n'
+           'function get(key) { return key; }\n'
+           'module.exports = { map, get };\n')
+    _write(os.path.join(root, 'lib.js'), 'export function parse(text) { return text; }\n')
+    _write(os.path.join(root, 'app.js'),
+           "import * as lib from './lib';\n"
+           "const utils = require('./utils');\n"
+           "[1, 2].map(x => x);\n"
+           "res.get('key');\n"
+           "utils.map([]);\n"
+           "lib.parse('');\n"
+           "get('key');\n")
+    setUpDataBase('index.db')
+    conn = connect_db('index.db')
+    process_codebase(root, conn)
+
+    assert _references(conn) == {
+        ('app.js', 'utils.map'): 'utils.js',
+        ('app.js', 'lib.parse'): 'lib.js',
+    }
+    conn.close()
+
+
+def test_calls_resolve_through_the_names_a_file_imports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / 'project')
+    _write(os.path.join(root, 'actions.js'),
+           "export const fetchData = () => fetch('/weather');\n"
+           'export default function load() { return fetchData(); }\n'
+           'function helper() { return 1; }\n')
+    _write(os.path.join(root, 'parser.js'),
+           'exports.parse = function (text) { return text; };\n'
+           'module.exports.format = (text) => text;\n')
+    _write(os.path.join(root, 'app.js'),
+           "import load, { fetchData as getData } from './actions';\n"
+           "const { parse } = require('./parser');\n"
+           "const parser = require('./parser');\n"
+           "getData();\n"
+           "load();\n"
+           "parse('');\n"
+           "parser.format('');\n"
+           "helper();\n")
+    setUpDataBase('index.db')
+    conn = connect_db('index.db')
+    process_codebase(root, conn)
+
+    # helper() is declared in an imported file, but app.js never imports that name
+    assert _references(conn) == {
+        ('actions.js', 'fetchData'): 'actions.js',
+        ('app.js', 'getData'): 'actions.js',
+        ('app.js', 'load'): 'actions.js',
+        ('app.js', 'parse'): 'parser.js',
+        ('app.js', 'parser.format'): 'parser.js',
+    }
+    conn.close()
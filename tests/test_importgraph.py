@@ -0,0 +1,32 @@
+import json
+import os
+
+from extractor import iter_extracted_metadata, walk_source_files
+from importgraph import build_import_graph, compare_with_madge, is_compatible
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+PROJECT = os.path.join(FIXTURES, 'madge_project')
+
+
+def _madge_graph():
+    # `madge --json --extensions js,jsx,ts,tsx madge_project` output for the fixture tree
+    with open(os.path.join(FIXTURES, 'madge_project.json'), 'r') as f:
+        return json.load(f)
+
+
+def _import_graph():
+    filepaths = [filepath for _, files in walk_source_files(PROJECT) for _, filepath in files]
+    return build_import_graph(iter_extracted_metadata(filepaths, compact=True), PROJECT)
+
+
+def test_import_graph_matches_madge():
+    report = compare_with_madge(_import_graph(), _madge_graph())
+    assert is_compatible(report), report
+
+
+def test_a_missing_edge_is_reported():
+    graph = _import_graph()
+    graph["src/index.js"] = [path for path in graph["src/index.js"] if path != "src/config.js"]
+    report = compare_with_madge(graph, _madge_graph())
+    assert report["missing_edges"] == {"src/index.js": ["src/config.js"]}
+    assert not is_compatible(report)
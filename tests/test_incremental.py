@@ -0,0 +1,40 @@
+import os
+
+from db.createdb import connect_db, setUpDataBase, get_file_manifest
+from startapp import process_codebase, per_file_json_path, PER_FILE_JSON_DIR
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def _per_file_outputs():
+    outputs = set()
+    for directory, _, names in os.walk(PER_FILE_JSON_DIR):
+        outputs.update(os.path.join(directory, name) for name in names)
+    return outputs
+
+
+def test_incremental_run_keeps_per_file_json_in_step_with_the_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / 'project')
+    for name in ('a.js', 'b.js', 'lib/c.js'):
+        _write(os.path.join(root, name), f'export function {name[-4]}() {{ return 1; }}\n')
+    setUpDataBase('index.db')
+    conn = connect_db('index.db')
+
+    process_codebase(root, conn)
+    expected = {per_file_json_path(os.path.join(root, name), root) for name in ('a.js', 'b.js', 'lib/c.js')}
+    assert _per_file_outputs() == expected
+
+    # A new file sorts before the others and one is deleted: nothing else may be renamed or left behind
+    _write(os.path.join(root, '0.js'), 'export function zero() { return 0; }\n')
+    os.remove(os.path.join(root, 'b.js'))
+    process_codebase(root, conn, incremental=True)
+
+    indexed = set(get_file_manifest(conn))
+    assert indexed == {os.path.join(root, name) for name in ('0.js', 'a.js', 'lib/c.js')}
+    assert _per_file_outputs() == {per_file_json_path(filepath, root) for filepath in indexed}
+    conn.close()
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+import startapp
+from db.createdb import connect_db, setUpDataBase, get_file_manifest
+from metadatastream import iter_jsonl, COMBINED_JSONL_NAME
+from packedstore import PackedStoreReader, PACK_NAME
+from startapp import process_codebase
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resumed_packed_run_keeps_the_records_of_files_finished_before_the_crash(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = str(tmp_path / 'project')
+    os.makedirs(root)
+    for n in range(19):
+        with open(os.path.join(root, f'f{n:02}.js'), 'w') as f:
+            f.write(f'export function f{n}() {{ return g{n}(); }}\n')
+    setUpDataBase('index.db')
+    conn = connect_db('index.db')
+
+    # Crash while storing the 12th file; small batches mean earlier files were committed
+    store_file_metadata = startapp.store_file_metadata
+    stored = []
+
+    def crash_on_twelfth_file(writer, file_metadata, *args, **kwargs):
+        if len(stored) == 11:
+            raise Interrupted()
+        stored.append(file_metadata["file"])
+        return store_file_metadata(writer, file_metadata, *args, **kwargs)
+
+    monkeypatch.setattr(startapp, 'store_file_metadata', crash_on_twelfth_file)
+    with pytest.raises(Interrupted):
+        process_codebase(root, conn, stream=True, per_file_output="packed", batch_size=10)
+    monkeypatch.setattr(startapp, 'store_file_metadata', store_file_metadata)
+
+    process_codebase(root, conn, stream=True, resume=True, per_file_output="packed", batch_size=10)
+
+    records = {record["file"]: record for record in iter_jsonl(os.path.join('metadata', COMBINED_JSONL_NAME))}
+    assert set(records) == set(get_file_manifest(conn)) and len(records) == 19
+    with PackedStoreReader(os.path.join('metadata', PACK_NAME)) as pack:
+        assert sorted(pack.files()) == sorted(records)
+        for filepath, record in records.items():
+            assert pack[filepath] == record
+    conn.close()
@@ -0,0 +1,442 @@
+// Offline dependency viewer: plain DOM + SVG, no libraries, works from file://.
+// data/graph.js and every data/<dir id>.js call dependencyViewer.receive(id, payload);
+// they are added as <script> tags because browsers block fetch() on file:// pages.
+(function () {
+    'use strict';
+
+    const SVG_NS = 'http://www.w3.org/2000/svg';
+    const EDGE_LENGTH = 90;
+
+    const state = {
+        dirs: {},        // dir id -> {id, label, files}
+        dirOrder: [],
+        dirEdges: [],    // [source dir, target dir, weight] between directories
+        chunks: {},      // dir id -> {files, edges} once its script has loaded
+        open: {},        // dir id -> true while expanded into its files
+        pending: {},     // dir id -> true while its script is loading
+        files: {},       // file id -> {id, label, dir}
+        positions: {},   // visible node id -> {x, y}
+        selected: null,
+        view: {x: 0, y: 0, scale: 1},
+    };
+
+    const svg = document.getElementById('graph');
+    const viewport = document.getElementById('viewport');
+    const edgeLayer = document.getElementById('edges');
+    const nodeLayer = document.getElementById('nodes');
+    const details = document.getElementById('details');
+    const statusLine = document.getElementById('status');
+
+    function setStatus(text) {
+        statusLine.textContent = text;
+    }
+
+    function basename(path) {
+        const parts = path.split(/[\\/]/);
+        return parts[parts.length - 1] || path;
+    }
+
+    // ---- data loading -------------------------------------------------------
+
+    function receive(id, payload) {
+        if (id === 'root') {
+            payload.nodes.forEach(function (node) {
+                state.dirs[node.id] = node;
+                state.dirOrder.push(node.id);
+            });
+            state.dirEdges = payload.edges;
+            relayout();
+            fit();
+            return;
+        }
+        state.chunks[id] = payload;
+        payload.files.forEach(function (file) {
+            state.files[file.id] = {id: file.id, label: file.label, dir: id};
+        });
+        delete state.pending[id];
+        expand(id);
+    }
+
+    function load(dirId) {
+        state.pending[dirId] = true;
+        render();
+        const script = document.createElement('script');
+        script.src = 'data/' + dirId + '.js';
+        script.onerror = function () {
+            delete state.pending[dirId];
+            setStatus('Could not load data/' + dirId + '.js');
+            render();
+        };
+        document.body.appendChild(script);
+    }
+
+    // ---- expanding and collapsing -------------------------------------------
+
+    function expand(dirId) {
+        if (!state.chunks[dirId]) {
+            if (!state.pending[dirId]) {
+                load(dirId);
+            }
+            return;
+        }
+        const center = state.positions[dirId] || {x: 0, y: 0};
+        const files = state.chunks[dirId].files;
+        // Start the files in a ring where the directory was, so the layout only settles locally
+        files.forEach(function (file, i) {
+            const angle = 2 * Math.PI * i / files.length;
+            const radius = 10 + 4 * Math.sqrt(files.length);
+            state.positions[file.id] = {x: center.x + radius * Math.cos(angle), y: center.y + radius * Math.sin(angle)};
+        });
+        delete state.positions[dirId];
+        state.open[dirId] = true;
+        relayout();
+    }
+
+    function collapse(dirId) {
+        const files = state.chunks[dirId].files;
+        let x = 0, y = 0;
+        files.forEach(function (file) {
+            const position = state.positions[file.id] || {x: 0, y: 0};
+            x += position.x;
+            y += position.y;
+            delete state.positions[file.id];
+        });
+        state.positions[dirId] = {x: x / Math.max(files.length, 1), y: y / Math.max(files.length, 1)};
+        if (state.selected && state.files[state.selected] && state.files[state.selected].dir === dirId) {
+            state.selected = null;
+        }
+        delete state.open[dirId];
+        relayout();
+    }
+
+    function collapseAll() {
+        Object.keys(state.open).forEach(collapse);
+    }
+
+    // ---- what is on screen --------------------------------------------------
+
+    function representative(fileId, dirId) {
+        return state.open[dirId] ? fileId : dirId;
+    }
+
+    function visibleGraph() {
+        const nodes = [];
+        state.dirOrder.forEach(function (dirId) {
+            if (state.open[dirId]) {
+                state.chunks[dirId].files.forEach(function (file) {
+                    nodes.push({id: file.id, label: basename(file.label), title: file.label, kind: 'file'});
+                });
+            } else {
+                const dir = state.dirs[dirId];
+                nodes.push({id: dirId, label: dir.label, title: dir.label + ' (' + dir.files + ' files)', kind: 'directory', files: dir.files});
+            }
+        });
+
+        const edges = new Map();
+        function add(source, target, weight, label) {
+            if (source === target) {
+                return;
+            }
+            const key = source + '>' + target;
+            const edge = edges.get(key) || {source: source, target: target, weight: 0, labels: []};
+            edge.weight += weight;
+            if (label) {
+                edge.labels.push(label);
+            }
+            edges.set(key, edge);
+        }
+
+        state.dirEdges.forEach(function (edge) {
+            if (!state.open[edge[0]] && !state.open[edge[1]]) {
+                add(edge[0], edge[1], edge[2], '');
+            }
+        });
+        Object.keys(state.open).forEach(function (dirId) {
+            state.chunks[dirId].edges.forEach(function (edge) {
+                const sourceDir = edge[1], targetDir = edge[3];
+                // Edges between two directories are in both chunks; count each once
+                const owner = state.open[sourceDir] ? sourceDir : targetDir;
+                if (owner === dirId) {
+                    add(representative(edge[0], sourceDir), representative(edge[2], targetDir), 1, edge[4]);
+                }
+            });
+        });
+        return {nodes: nodes, edges: Array.from(edges.values())};
+    }
+
+    // ---- layout -------------------------------------------------------------
+
+    // Force-directed layout over the visible nodes only, started from the current
+    // positions so expanding one directory does not reshuffle the rest.
+    function layout(graph) {
+        const nodes = graph.nodes;
+        const n = nodes.length;
+        if (n === 0) {
+            return;
+        }
+        const index = {};
+        const x = new Float64Array(n), y = new Float64Array(n);
+        nodes.forEach(function (node, i) {
+            index[node.id] = i;
+            let position = state.positions[node.id];
+            if (!position) {
+                const angle = 2.4 * i;
+                position = {x: EDGE_LENGTH * Math.sqrt(i + 1) * Math.cos(angle), y: EDGE_LENGTH * Math.sqrt(i + 1) * Math.sin(angle)};
+            }
+            x[i] = position.x;
+            y[i] = position.y;
+        });
+        const links = graph.edges.map(function (edge) {
+            return [index[edge.source], index[edge.target]];
+        });
+
+        const k = EDGE_LENGTH;
+        // The repulsion pass is O(n^2); big views get fewer rounds
+        const iterations = n > 800 ? 30 : n > 200 ? 100 : 250;
+        let temperature = k * 2;
+        const dx = new Float64Array(n), dy = new Float64Array(n);
+        for (let iteration = 0; iteration < iterations; iteration++) {
+            dx.fill(0);
+            dy.fill(0);
+            for (let i = 0; i < n; i++) {
+                for (let j = i + 1; j < n; j++) {
+                    let ddx = x[i] - x[j], ddy = y[i] - y[j];
+                    let distance2 = ddx * ddx + ddy * ddy;
+                    if (distance2 < 0.01) {
+                        ddx = 0.1 * (i - j);
+                        ddy = 0.1;
+                        distance2 = ddx * ddx + ddy * ddy;
+                    }
+                    const force = k * k / distance2;
+                    dx[i] += ddx * force;
+                    dy[i] += ddy * force;
+                    dx[j] -= ddx * force;
+                    dy[j] -= ddy * force;
+                }
+            }
+            links.forEach(function (link) {
+                const i = link[0], j = link[1];
+                const ddx = x[i] - x[j], ddy = y[i] - y[j];
+                const distance = Math.sqrt(ddx * ddx + ddy * ddy) || 0.01;
+                const force = distance / k;
+                dx[i] -= ddx * force;
+                dy[i] -= ddy * force;
+                dx[j] += ddx * force;
+                dy[j] += ddy * force;
+            });
+            for (let i = 0; i < n; i++) {
+                // A weak pull to the middle keeps disconnected parts on screen
+                dx[i] -= x[i] * 0.01;
+                dy[i] -= y[i] * 0.01;
+                const length = Math.sqrt(dx[i] * dx[i] + dy[i] * dy[i]) || 1;
+                const step = Math.min(length, temperature);
+                x[i] += dx[i] / length * step;
+                y[i] += dy[i] / length * step;
+            }
+            temperature = Math.max(1, temperature * 0.96);
+        }
+        nodes.forEach(function (node, i) {
+            state.positions[node.id] = {x: x[i], y: y[i]};
+        });
+    }
+
+    function relayout() {
+        const graph = visibleGraph();
+        layout(graph);
+        render(graph);
+    }
+
+    // ---- drawing ------------------------------------------------------------
+
+    function element(name, attributes, parent) {
+        const node = document.createElementNS(SVG_NS, name);
+        Object.keys(attributes).forEach(function (key) {
+            node.setAttribute(key, attributes[key]);
+        });
+        if (parent) {
+            parent.appendChild(node);
+        }
+        return node;
+    }
+
+    function radius(node) {
+        return node.kind === 'directory' ? 8 + 2 * Math.sqrt(node.files) : 6;
+    }
+
+    function render(graph) {
+        graph = graph || visibleGraph();
+        edgeLayer.textContent = '';
+        nodeLayer.textContent = '';
+        const radii = {};
+        graph.nodes.forEach(function (node) {
+            radii[node.id] = radius(node);
+        });
+
+        graph.edges.forEach(function (edge) {
+            const a = state.positions[edge.source], b = state.positions[edge.target];
+            if (!a || !b) {
+                return;
+            }
+            const length = Math.hypot(b.x - a.x, b.y - a.y) || 1;
+            // Stop at the target's rim so the arrow head stays visible
+            const shorten = radii[edge.target] + 2;
+            const selected = edge.source === state.selected || edge.target === state.selected;
+            const line = element('line', {
+                'class': selected ? 'edge selected' : 'edge',
+                x1: a.x, y1: a.y,
+                x2: b.x - (b.x - a.x) * shorten / length,
+                y2: b.y - (b.y - a.y) * shorten / length,
+                'stroke-width': Math.min(1 + Math.sqrt(edge.weight - 1), 6),
+                'marker-end': 'url(#arrow)',
+            }, edgeLayer);
+            if (edge.labels.length) {
+                element('title', {}, line).textContent = edge.labels.join('; ');
+            }
+        });
+
+        graph.nodes.forEach(function (node) {
+            const position = state.positions[node.id];
+            let className = 'node ' + node.kind;
+            if (state.pending[node.id]) {
+                className += ' loading';
+            }
+            if (node.id === state.selected) {
+                className += ' selected';
+            }
+            const group = element('g', {'class': className, transform: 'translate(' + position.x + ',' + position.y + ')'}, nodeLayer);
+            element('circle', {r: radii[node.id]}, group);
+            element('text', {x: radii[node.id] + 3, y: 4}, group).textContent = node.label;
+            element('title', {}, group).textContent = node.title;
+            group.addEventListener('click', function (event) {
+                event.stopPropagation();
+                if (node.kind === 'directory') {
+                    expand(node.id);
+                } else {
+                    select(node.id);
+                }
+            });
+        });
+
+        const loaded = Object.keys(state.chunks).length;
+        setStatus(state.dirOrder.length + ' directories (' + loaded + ' loaded), ' +
+                  graph.nodes.length + ' nodes and ' + graph.edges.length + ' edges on screen');
+    }
+
+    // ---- details panel ------------------------------------------------------
+
+    function describe(fileId, dirId) {
+        if (state.files[fileId]) {
+            return state.files[fileId].label;
+        }
+        return state.dirs[dirId].label + ' (collapsed directory)';
+    }
+
+    function listSection(title, entries) {
+        const heading = document.createElement('h4');
+        heading.textContent = title + ' (' + entries.length + ')';
+        details.appendChild(heading);
+        const list = document.createElement('ul');
+        entries.forEach(function (entry) {
+            const item = document.createElement('li');
+            item.textContent = entry;
+            list.appendChild(item);
+        });
+        details.appendChild(list);
+    }
+
+    function select(fileId) {
+        state.selected = fileId;
+        const file = state.files[fileId];
+        const uses = [], usedBy = [];
+        state.chunks[file.dir].edges.forEach(function (edge) {
+            const label = edge[4] ? ' [' + edge[4] + ']' : '';
+            if (edge[0] === fileId) {
+                uses.push(describe(edge[2], edge[3]) + label);
+            }
+            if (edge[2] === fileId) {
+                usedBy.push(describe(edge[0], edge[1]) + label);
+            }
+        });
+
+        details.textContent = '';
+        const heading = document.createElement('h3');
+        heading.textContent = file.label;
+        details.appendChild(heading);
+        const button = document.createElement('button');
+        button.textContent = 'Collapse ' + state.dirs[file.dir].label;
+        button.addEventListener('click', function () {
+            collapse(file.dir);
+        });
+        details.appendChild(button);
+        listSection('Depends on', uses);
+        listSection('Used by', usedBy);
+        render();
+    }
+
+    // ---- pan and zoom -------------------------------------------------------
+
+    function applyView() {
+        const view = state.view;
+        viewport.setAttribute('transform', 'translate(' + view.x + ',' + view.y + ') scale(' + view.scale + ')');
+    }
+
+    function fit() {
+        const ids = Object.keys(state.positions);
+        if (!ids.length) {
+            return;
+        }
+        let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+        ids.forEach(function (id) {
+            const position = state.positions[id];
+            minX = Math.min(minX, position.x);
+            minY = Math.min(minY, position.y);
+            maxX = Math.max(maxX, position.x);
+            maxY = Math.max(maxY, position.y);
+        });
+        const box = svg.getBoundingClientRect();
+        const margin = 60;
+        const scale = Math.min(
+            (box.width - 2 * margin) / Math.max(maxX - minX, 1),
+            (box.height - 2 * margin) / Math.max(maxY - minY, 1),
+            2
+        );
+        state.view = {
+            scale: scale,
+            x: box.width / 2 - scale * (minX + maxX) / 2,
+            y: box.height / 2 - scale * (minY + maxY) / 2,
+        };
+        applyView();
+    }
+
+    let drag = null;
+    svg.addEventListener('mousedown', function (event) {
+        drag = {x: event.clientX, y: event.clientY};
+    });
+    window.addEventListener('mousemove', function (event) {
+        if (drag) {
+            state.view.x += event.clientX - drag.x;
+            state.view.y += event.clientY - drag.y;
+            drag = {x: event.clientX, y: event.clientY};
+            applyView();
+        }
+    });
+    window.addEventListener('mouseup', function () {
+        drag = null;
+    });
+    svg.addEventListener('wheel', function (event) {
+        event.preventDefault();
+        const box = svg.getBoundingClientRect();
+        const factor = event.deltaY < 0 ? 1.15 : 1 / 1.15;
+        const px = event.clientX - box.left, py = event.clientY - box.top;
+        // Zoom around the cursor
+        state.view.x = px - (px - state.view.x) * factor;
+        state.view.y = py - (py - state.view.y) * factor;
+        state.view.scale *= factor;
+        applyView();
+    }, {passive: false});
+
+    document.getElementById('fit').addEventListener('click', fit);
+    document.getElementById('collapse-all').addEventListener('click', collapseAll);
+
+    window.dependencyViewer = {receive: receive, expand: expand, collapse: collapse, select: select, visibleGraph: visibleGraph, state: state};
+})();
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+from graphrender import aggregate_by_directory, file_directories
+
+# index.html, viewer.js and viewer.css; copied next to the exported data
+VIEWER_ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'viewer')
+VIEWER_ASSETS = ('index.html', 'viewer.js', 'viewer.css')
+
+
+def _write_chunk(path, chunk_id, payload):
+    # Loaded with a <script> tag rather than fetch(), which browsers block on file:// pages
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'dependencyViewer.receive({json.dumps(chunk_id)}, {json.dumps(payload, separators=(",", ":"))});\n')
+
+
+def export_viewer(G, output_dir, project_structure=None):
+    """Write the offline dependency viewer for file graph G into output_dir.
+
+    data/graph.js holds only the directory-level graph, so the page opens in the
+    same time whatever the size of the repo. Each directory's files and their
+    edges go to data/<dir id>.js, which the viewer loads when that directory is
+    expanded. Edges may carry a "functions" list, shown as the edge's label.
+    Returns the path of index.html.
+    """
+    data_dir = os.path.join(output_dir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    for asset in VIEWER_ASSETS:
+        shutil.copyfile(os.path.join(VIEWER_ASSETS_DIR, asset), os.path.join(output_dir, asset))
+
+    directory_of = file_directories(G.nodes, project_structure)
+    D = aggregate_by_directory(G, project_structure)
+    dir_ids = {directory: f'd{n}' for n, directory in enumerate(sorted(D.nodes))}
+    file_ids = {file_name: f'f{n}' for n, file_name in enumerate(sorted(G.nodes))}
+
+    _write_chunk(os.path.join(data_dir, 'graph.js'), 'root', {
+        "nodes": [{"id": dir_ids[d], "label": d, "files": D.nodes[d]["files"]} for d in sorted(D.nodes)],
+        "edges": [[dir_ids[s], dir_ids[t], D[s][t]["weight"]] for s, t in sorted(D.edges)],
+    })
+
+    # Per directory: its files, and every file-level edge with an end in it
+    chunks = {dir_id: {"files": [], "edges": []} for dir_id in dir_ids.values()}
+    for file_name in sorted(G.nodes):
+        chunks[dir_ids[directory_of[file_name]]]["files"].append({
+            "id": file_ids[file_name], "label": file_name,
+        })
+    for source, target in sorted(G.edges):
+        source_dir, target_dir = dir_ids[directory_of[source]], dir_ids[directory_of[target]]
+        edge = [file_ids[source], source_dir, file_ids[target], target_dir,
+                ", ".join(G[source][target].get("functions", []))]
+        chunks[source_dir]["edges"].append(edge)
+        if target_dir != source_dir:
+            chunks[target_dir]["edges"].append(edge)
+    for dir_id, chunk in chunks.items():
+        _write_chunk(os.path.join(data_dir, f'{dir_id}.js'), dir_id, chunk)
+
+    return os.path.join(output_dir, 'index.html')
@@ -0,0 +1,456 @@
+import argparse
+import os
+import time
+from collections import Counter
+
+from db.createdb import setUpDataBase, connect_db, get_file_manifest, update_file_stat, BulkWriter, DB_PATH
+from startapp import file_fingerprint, store_file_metadata, metadata_rows
+from importgraph import file_dependencies, module_specifiers, _relative
+from importresolver import ImportResolver
+from callresolver import store_file_imports, resolve_references
+from symbolindex import SymbolIndex
+from sourcewalker import SourceWalker, DEFAULT_MAX_FILE_SIZE
+from instrumentation import emit
+from extractor import (
+    ENTITY_CAPTURES, ENTITY_LISTS, SourceSpans, capture_entities, capture_records, collect_symbols,
+    get_parser, get_symbol_query, language_for_file, node_span, read_source,
+)
+
+
+def source_edit(old, new):
+    """Return (start, old_end, new_end) of the one edit that turns old into new, or None if they are equal.
+
+    The edit is everything between the longest common prefix and suffix.
+    Both are found by binary search over slice comparisons, which run at
+    memcmp speed instead of a Python loop over every byte.
+    """
+    if old == new:
+        return None
+    old_view, new_view = memoryview(old), memoryview(new)
+    limit = min(len(old), len(new))
+
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old_view[:middle] == new_view[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = low
+
+    low, high = 0, limit - prefix
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old_view[len(old) - middle:] == new_view[len(new) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return prefix, len(old) - low, len(new) - low
+
+
+def byte_point(source, offset):
+    """The (row, column) tree-sitter uses for a byte offset of source."""
+    return source.count(b'\n', 0, offset), offset - (source.rfind(b'\n', 0, offset) + 1)
+
+
+def shift_span(span, edit):
+    """Move a span that starts at or after the edited text to its place in the new source, in place."""
+    _, old_end, new_end, old_end_point, new_end_point = edit
+    for byte_index, row_index, col_index in ((0, 2, 3), (1, 4, 5)):
+        if span[row_index] == old_end_point[0]:
+            # Only columns on the edit's last row move
+            span[col_index] += new_end_point[1] - old_end_point[1]
+        span[byte_index] += new_end - old_end
+        span[row_index] += new_end_point[0] - old_end_point[0]
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def touches(start, end, ranges):
+    """True when [start, end] overlaps or borders one of ranges."""
+    return any(start <= range_end and end >= range_start for range_start, range_end in ranges)
+
+
+class WatchedFile:
+    """What watch mode keeps per file between changes.
+
+    entities is the file's entity table: [node span, [(list name, record)]]
+    per captured node, in document order, with compact records (spans, no
+    text). A change replaces only the entries that touch the changed ranges.
+    """
+
+    def __init__(self, filepath, language, source, tree, entities, symbols, stat):
+        self.filepath = filepath
+        self.language = language
+        self.source = source
+        self.tree = tree
+        self.entities = entities
+        self.symbols = symbols
+        self.stat = stat
+        self.metadata = self.build_metadata()
+
+    def build_metadata(self):
+        """The compact file_metadata record extract_metadata(filepath, compact=True) would return."""
+        lists = {key: [] for key in ENTITY_LISTS + ("requires", "bindings")}
+        for _, records in self.entities:
+            for key, record in records:
+                lists[key].append(record)
+        return {
+            "file": self.filepath,
+            "compact": True,
+            **{key: lists[key] for key in ENTITY_LISTS},
+            "symbols": self.symbols,
+            "requires": lists["requires"],
+            "bindings": lists["bindings"],
+        }
+
+
+def _sort_entities(entities):
+    entities.sort(key=lambda entry: (entry[0][0], -entry[0][1]))
+    return entities
+
+
+def entity_table(tree, source, language, ranges=None):
+    """Entity table entries for the nodes of tree that touch ranges (all nodes without ranges)."""
+    def node_text(node):
+        return source[node.start_byte:node.end_byte].decode('utf-8')
+
+    if ranges is None:
+        found = capture_entities(tree.root_node, language)
+    else:
+        # A query byte range only matches nodes that overlap it, so widen each
+        # range by a byte and keep the ones touches() accepts, the same test
+        # that decides which old entries are dropped
+        found = {}
+        seen = set()
+        for start, end in ranges:
+            byte_range = (max(start - 1, 0), end + 1)
+            for capture, nodes in capture_entities(tree.root_node, language, byte_range).items():
+                for node in nodes:
+                    if node.id not in seen and touches(node.start_byte, node.end_byte, ranges):
+                        seen.add(node.id)
+                        found.setdefault(capture, []).append(node)
+
+    entries = []
+    for capture in ENTITY_CAPTURES:
+        for node in found.get(capture, []):
+            records = capture_records(capture, node, node_text, compact=True)
+            if records:
+                entries.append([node_span(node), records])
+    return _sort_entities(entries)
+
+
+def file_symbols(tree, source, language):
+    # Export/definition pairs can be anywhere in the file, so symbols come from
+    # a query over the whole tree; it only matches declarations and exports.
+    def node_text(node):
+        return source[node.start_byte:node.end_byte].decode('utf-8')
+
+    return collect_symbols(capture_entities(tree.root_node, language, query=get_symbol_query(language)), node_text)
+
+
+def _rows(entries, source):
+    """Counter of the metadata rows (see startapp.metadata_rows) a set of entity entries stores."""
+    record_lists = {key: [] for key in ENTITY_LISTS}
+    for _, records in entries:
+        for key, record in records:
+            if key in record_lists:
+                record_lists[key].append(record)
+    file_metadata = {"compact": True, **record_lists}
+    return Counter(metadata_rows(file_metadata, SourceSpans(file_metadata, source)))
+
+
+def _file_stats(watched, read_seconds, parse_seconds, extract_seconds):
+    metadata = watched.metadata
+    return {
+        "file": watched.filepath,
+        "language": watched.language,
+        "bytes": len(watched.source),
+        "read_seconds": read_seconds,
+        "parse_seconds": parse_seconds,
+        "extract_seconds": extract_seconds,
+        "nodes": watched.tree.root_node.descendant_count,
+        "entities": {key: len(metadata[key]) for key in ENTITY_LISTS + ("symbols", "requires", "bindings")},
+    }
+
+
+class WatchIndex:
+    """Keeps the DB, the import graph and a symbol index in step with root_dir while files change.
+
+    Every file's syntax tree is kept between changes. A changed file is diffed
+    against its previous source, the edit is applied to the old tree with
+    tree.edit() and the file is reparsed with parser.parse(new, old_tree), so
+    tree-sitter only redoes the edited part. Entities are re-extracted from the
+    edit and the tree's changed ranges; the rest of the entity table is kept
+    with its spans shifted. Only the metadata rows of the dropped and new
+    entities are deleted/inserted, the import graph entry is recomputed only
+    when the file's module specifiers or bindings changed, and only the calls of the file
+    and of its importers are re-resolved in referencesTable.
+
+    ignore, max_file_size and use_gitignore select the files as in
+    startapp.process_codebase(); pass the values the index was built with, or
+    the files that run skipped are picked up as new.
+    """
+
+    def __init__(self, root_dir, conn, batch_size=5000, ignore=(), max_file_size=DEFAULT_MAX_FILE_SIZE,
+                 use_gitignore=True):
+        self.root_dir = root_dir
+        self.conn = conn
+        self.batch_size = batch_size
+        self.files = {}  # filepath -> WatchedFile
+        self.file_ids = {}  # filepath -> files.id
+        self.specifiers = {}  # filepath -> (module specifiers, bindings) the graph entry was resolved from
+        self.graph = {}  # root-relative file -> [root-relative dependencies], as build_import_graph()
+        self.symbol_index = SymbolIndex()
+        self.resolver = None
+        # Kept between scans so minified checks are not redone for unchanged files
+        self.walker = SourceWalker(root_dir, ignore=ignore, max_file_size=max_file_size,
+                                   use_gitignore=use_gitignore)
+
+    def _source_files(self):
+        stats = {}
+        for _, files in self.walker.walk():
+            for _, filepath in files:
+                try:
+                    stat = os.stat(filepath)
+                except FileNotFoundError:
+                    continue
+                stats[filepath] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def _parse(self, filepath, stat):
+        read_started = time.perf_counter()
+        source = read_source(filepath)
+        language = language_for_file(filepath)
+        started = time.perf_counter()
+        tree = get_parser(language).parse(source)
+        parsed = time.perf_counter()
+        entities = entity_table(tree, source, language)
+        watched = WatchedFile(filepath, language, source, tree, entities, file_symbols(tree, source, language), stat)
+        emit("on_file_parsed", _file_stats(watched, started - read_started, parsed - started,
+                                           time.perf_counter() - parsed))
+        return watched
+
+    def start(self):
+        """Parse every file under root_dir and bring the DB up to date with it; returns the file count.
+
+        Files whose content hash matches the files table keep their rows.
+        """
+        manifest = get_file_manifest(self.conn)
+        stats = self._source_files()
+        with BulkWriter(self.conn, batch_size=self.batch_size) as writer:
+            for filepath, stat in sorted(stats.items()):
+                # Fingerprint before reading, so a write in between shows up on the next scan
+                fingerprint = file_fingerprint(filepath)
+                watched = self.files[filepath] = self._parse(filepath, stat)
+                indexed = manifest.get(filepath)
+                if indexed and indexed[3] == fingerprint[2]:
+                    self.file_ids[filepath] = indexed[0]
+                    continue
+                if indexed:
+                    writer.delete_file(filepath)
+                self.file_ids[filepath] = store_file_metadata(writer, watched.metadata, fingerprint, watched.source)
+            for filepath in manifest:
+                if filepath not in stats and os.path.normpath(filepath).startswith(
+                        os.path.normpath(self.root_dir) + os.sep):
+                    writer.delete_file(filepath)
+        for watched in self.files.values():
+            self.symbol_index.add_file(watched.metadata)
+        self._rebuild_graph()
+        return len(self.files)
+
+    def _rebuild_graph(self):
+        # The set of files changed, so every specifier may resolve differently
+        self.resolver = ImportResolver(list(self.files), root_dir=self.root_dir)
+        self.graph = {}
+        self.specifiers = {}
+        for filepath, watched in self.files.items():
+            self._update_graph_entry(watched)
+        store_file_imports(self.conn, (watched.metadata for watched in self.files.values()), self.resolver,
+                           self.file_ids)
+        resolve_references(self.conn)
+
+    def _update_graph_entry(self, watched):
+        # A renamed binding (const m = require() -> const n = ...) changes fileimports' bindings only
+        specifiers = (list(module_specifiers(watched.metadata)), watched.metadata["bindings"])
+        if self.specifiers.get(watched.filepath) == specifiers:
+            return False
+        self.specifiers[watched.filepath] = specifiers
+        self.graph[_relative(watched.filepath, self.root_dir)] = file_dependencies(
+            watched.metadata, self.root_dir, self.resolver)
+        return True
+
+    def import_graph(self):
+        """The current import graph, sorted like build_import_graph() output."""
+        return {filepath: self.graph[filepath] for filepath in sorted(self.graph)}
+
+    def scan(self):
+        """Check root_dir once and apply what changed; returns [(event, filepath, seconds)]."""
+        stats = self._source_files()
+        changes = []
+        added_or_removed = False
+        for filepath in sorted(self.files.keys() - stats.keys()):
+            started = time.perf_counter()
+            self.remove_file(filepath)
+            changes.append(("deleted", filepath, time.perf_counter() - started))
+            added_or_removed = True
+        for filepath, stat in sorted(stats.items()):
+            watched = self.files.get(filepath)
+            if watched is not None and watched.stat == stat:
+                continue
+            started = time.perf_counter()
+            if watched is None:
+                self.add_file(filepath, stat)
+                changes.append(("added", filepath, time.perf_counter() - started))
+                added_or_removed = True
+            elif self.update_file(filepath, stat):
+                changes.append(("modified", filepath, time.perf_counter() - started))
+        if added_or_removed:
+            self._rebuild_graph()
+        return changes
+
+    def add_file(self, filepath, stat):
+        fingerprint = file_fingerprint(filepath)
+        watched = self.files[filepath] = self._parse(filepath, stat)
+        with BulkWriter(self.conn, batch_size=self.batch_size) as writer:
+            writer.delete_file(filepath)
+            self.file_ids[filepath] = store_file_metadata(writer, watched.metadata, fingerprint, watched.source)
+        self.symbol_index.add_file(watched.metadata)
+
+    def remove_file(self, filepath):
+        with BulkWriter(self.conn, batch_size=self.batch_size) as writer:
+            writer.delete_file(filepath)
+        del self.files[filepath]
+        self.file_ids.pop(filepath, None)
+        self.specifiers.pop(filepath, None)
+        self.graph.pop(_relative(filepath, self.root_dir), None)
+        self.symbol_index.remove_file(filepath)
+
+    def update_file(self, filepath, stat):
+        """Incrementally reparse a changed file and update its rows; False if its content did not change."""
+        watched = self.files[filepath]
+        read_started = time.perf_counter()
+        # Fingerprint before reading, so a write in between shows up on the next scan
+        fingerprint = file_fingerprint(filepath)
+        source = read_source(filepath)
+        watched.stat = stat
+        edit = source_edit(watched.source, source)
+        if edit is None:
+            # Touched but not modified
+            update_file_stat(self.conn, self.file_ids[filepath], fingerprint[0], fingerprint[1])
+            return False
+
+        start, old_end, new_end = edit
+        start_point = byte_point(source, start)
+        old_end_point = byte_point(watched.source, old_end)
+        new_end_point = byte_point(source, new_end)
+        old_tree = watched.tree
+        started = time.perf_counter()
+        old_tree.edit(start, old_end, new_end, start_point, old_end_point, new_end_point)
+        tree = get_parser(watched.language).parse(source, old_tree)
+        parsed = time.perf_counter()
+
+        # The edited text itself plus whatever tree-sitter reports as structurally different
+        dirty = merge_ranges([(start, new_end)] + [
+            (changed.start_byte, changed.end_byte) for changed in old_tree.changed_ranges(tree)
+        ])
+        shift = (start, old_end, new_end, old_end_point, new_end_point)
+        kept, dropped = [], []
+        for entry in watched.entities:
+            span = entry[0]
+            if span[1] <= start:
+                new_start, new_end_byte = span[0], span[1]
+            elif span[0] >= old_end:
+                new_start, new_end_byte = span[0] + new_end - old_end, span[1] + new_end - old_end
+            else:
+                dropped.append(entry)  # contains edited text
+                continue
+            if touches(new_start, new_end_byte, dirty):
+                dropped.append(entry)
+            else:
+                kept.append(entry)
+        # Row values of the dropped entries are read from the old source before any span moves
+        removed_rows = _rows(dropped, watched.source)
+        for span, records in kept:
+            if span[0] >= old_end:
+                shift_span(span, shift)
+                for _, record in records:
+                    for key in ("span", "export_span"):
+                        if key in record:
+                            shift_span(record[key], shift)
+        added = entity_table(tree, source, watched.language, dirty)
+        added_rows = _rows(added, source)
+
+        watched.source = source
+        watched.tree = tree
+        watched.entities = _sort_entities(kept + added)
+        watched.symbols = file_symbols(tree, source, watched.language)
+        watched.metadata = watched.build_metadata()
+        emit("on_file_parsed", _file_stats(watched, started - read_started, parsed - started,
+                                           time.perf_counter() - parsed))
+
+        file_id = self.file_ids[filepath]
+        with BulkWriter(self.conn, batch_size=self.batch_size) as writer:
+            # Rows an entity had both before and after the edit stay as they are
+            for (name, type, codecontent), count in (removed_rows - added_rows).items():
+                writer.delete_metadata(file_id, name, type, codecontent, count)
+            for (name, type, codecontent), count in (added_rows - removed_rows).items():
+                for _ in range(count):
+                    writer.add_metadata(file_id, name, type, codecontent, 0, None)
+            writer.update_file_content(file_id, source.decode('utf-8'), *fingerprint)
+            writer.delete_symbols(file_id)
+            for symbol in watched.symbols:
+                writer.add_symbol(file_id, symbol["name"], symbol["kind"], symbol["exported"], symbol["span"])
+
+        self.symbol_index.add_file(watched.metadata)
+        if self._update_graph_entry(watched):
+            store_file_imports(self.conn, [watched.metadata], self.resolver, self.file_ids)
+        # Only this file's calls and those of its importers can resolve differently now
+        resolve_references(self.conn, [file_id])
+        return True
+
+    def watch(self, interval=0.5, on_change=None):
+        """Poll root_dir every interval seconds until interrupted, calling on_change(changes) after each change."""
+        while True:
+            changes = self.scan()
+            if changes and on_change:
+                on_change(changes)
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the index of root_dir up to date while its files change.")
+    parser.add_argument("root_dir")
+    parser.add_argument("db_path", nargs="?", default=DB_PATH)
+    parser.add_argument("--ignore", action="append", default=[], metavar="GLOB",
+                        help="leave out paths matching this gitignore-syntax glob (repeatable)")
+    parser.add_argument("--max-file-size", type=int, default=DEFAULT_MAX_FILE_SIZE, metavar="BYTES")
+    parser.add_argument("--no-gitignore", dest="use_gitignore", action="store_false",
+                        help="index files matched by .gitignore files too")
+    args = parser.parse_args()
+    setUpDataBase(args.db_path)
+    conn = connect_db(args.db_path, bulk_load=True)
+    index = WatchIndex(args.root_dir, conn, ignore=args.ignore, max_file_size=args.max_file_size,
+                       use_gitignore=args.use_gitignore)
+    started = time.perf_counter()
+    count = index.start()
+    print(f"Indexed {count} files in {time.perf_counter() - started:.2f}s; watching {args.root_dir} (Ctrl+C to stop)")
+
+    def report(changes):
+        for event, filepath, seconds in changes:
+            print(f"{event:<9}{seconds * 1000:>8.1f} ms  {filepath}")
+
+    try:
+        index.watch(on_change=report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()